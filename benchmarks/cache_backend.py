@@ -0,0 +1,101 @@
+"""Benchmark of the Redis cache backend against the in-process fake server: the project
+is published and loaded in pipelined batches, the images are updated one by one
+(as the events do) and the result is compared with the in-memory backend.
+
+Usage: python -m benchmarks.cache_backend [number of images] [labels per image]
+"""
+
+import random
+import sys
+import time
+from typing import List
+
+from src.backends import ImageRow, MemoryBackend, RedisBackend
+from src.features import LabelFeatures
+from src.resp import RespClient
+from tests.fake_redis import FakeRedisServer
+
+CLASS_NAMES = ("car", "road", "sign", "person")
+
+
+def make_rows(num_images: int, num_labels: int, rng: random.Random) -> List[ImageRow]:
+    """Generate the rows of the images with random rectangles.
+
+    :param num_images: The number of images.
+    :type num_images: int
+    :param num_labels: The number of labels per image.
+    :type num_labels: int
+    :param rng: The random generator.
+    :type rng: random.Random
+    :return: The rows of the images.
+    :rtype: List[ImageRow]
+    """
+    rows = []
+    for image_id in range(num_images):
+        features = []
+        for label_id in range(num_labels):
+            top, left = rng.randint(0, 900), rng.randint(0, 900)
+            bottom, right = top + rng.randint(1, 99), left + rng.randint(1, 99)
+            features.append(
+                LabelFeatures(
+                    rng.choice(CLASS_NAMES),
+                    float((bottom - top + 1) * (right - left + 1)),
+                    top,
+                    left,
+                    bottom,
+                    right,
+                    "rectangle",
+                    image_id * num_labels + label_id,
+                )
+            )
+        rows.append(ImageRow(image_id, features, "2024-01-01T00:00:00.000Z", 1, None))
+    return rows
+
+
+def main(num_images: int = 5000, num_labels: int = 20) -> None:
+    rng = random.Random(0)
+    rows = make_rows(num_images, num_labels, rng)
+    updates = [
+        ImageRow(row.image_id, make_rows(1, num_labels, rng)[0].features, "u", 1, 2)
+        for row in rng.sample(rows, min(500, num_images))
+    ]
+
+    server = FakeRedisServer().start()
+    client = RespClient(server.url)
+    backends = {"memory": MemoryBackend(), "redis": RedisBackend(client)}
+    print(f"{num_images} images x {num_labels} labels, {len(updates)} updates")
+    try:
+        results = {}
+        for name, backend in backends.items():
+            start_time = time.perf_counter()
+            backend.put_project(1, rows)
+            put_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            loaded = backend.get_project(1)
+            get_time = time.perf_counter() - start_time
+            assert sorted(loaded) == sorted(rows), "The loaded rows differ."
+
+            start_time = time.perf_counter()
+            for row in updates:
+                backend.set_images(1, [row])
+            update_time = time.perf_counter() - start_time
+
+            results[name] = backend.get_class_stats(1, CLASS_NAMES)
+            print(
+                f"{name:>6}: put {put_time:.3f} s, get {get_time:.3f} s, "
+                f"updates {update_time / len(updates) * 1000:.2f} ms each"
+            )
+        print(f"round trips: {client.round_trips}, commands: {client.commands}")
+
+        for class_name, (count, total, total_sq) in results["memory"].items():
+            redis_count, redis_total, redis_total_sq = results["redis"][class_name]
+            assert count == redis_count, "The label counts differ."
+            assert abs(total - redis_total) <= 1e-9 * total, "The sums of the areas differ."
+            assert abs(total_sq - redis_total_sq) <= 1e-9 * total_sq, "The sums differ."
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
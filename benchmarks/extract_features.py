@@ -0,0 +1,109 @@
+"""Benchmark of the feature extraction during the warm-up of the cache: the features
+are extracted from sly.Annotation (the previous path) and directly from the JSON.
+
+Usage: python -m benchmarks.extract_features [number of annotations] [labels per annotation]
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+import supervisely as sly
+
+from src.features import BitmapMemo, extract_features, extract_features_from_json
+
+
+def make_annotation_json(num_labels: int, rng: random.Random) -> dict:
+    """Generate the JSON of the annotation with rectangles, polygons with holes, points
+    and bitmaps (the bitmaps repeat, like the masks of the unchanged labels do).
+
+    :param num_labels: The number of labels.
+    :type num_labels: int
+    :param rng: The random generator.
+    :type rng: random.Random
+    :return: The JSON of the annotation.
+    :rtype: dict
+    """
+    objects = []
+    for label_id in range(num_labels):
+        x, y = rng.randint(0, 850), rng.randint(0, 850)
+        w, h = rng.randint(10, 99), rng.randint(10, 99)
+        kind = label_id % 4
+        if kind == 0:
+            class_title, geometry_type = "car", "rectangle"
+            points = {"exterior": [[x, y], [x + w, y + h]], "interior": []}
+        elif kind == 1:
+            class_title, geometry_type = "road", "polygon"
+            exterior = [[x, y], [x + w, y], [x + w, y + h], [x + w // 2, y + h + 5], [x, y + h]]
+            hole = [[x + 2, y + 2], [x + 6, y + 2], [x + 6, y + 6], [x + 2, y + 6]]
+            points = {"exterior": exterior, "interior": [hole]}
+        elif kind == 2:
+            class_title, geometry_type = "sign", "point"
+            points = {"exterior": [[x, y]], "interior": []}
+        else:
+            mask = np.zeros((64, 64), dtype=bool)
+            mask[rng.randint(0, 31):, rng.randint(0, 31):] = True
+            bitmap = sly.Bitmap(mask, origin=sly.PointLocation(y, x))
+            objects.append(
+                {"id": label_id, "classTitle": "person", "tags": [], **bitmap.to_json()}
+            )
+            continue
+        objects.append(
+            {
+                "id": label_id,
+                "classTitle": class_title,
+                "geometryType": geometry_type,
+                "tags": [],
+                "points": points,
+            }
+        )
+    return {
+        "description": "",
+        "size": {"height": 1000, "width": 1000},
+        "tags": [],
+        "objects": objects,
+    }
+
+
+def main(num_annotations: int = 1000, num_labels: int = 30) -> None:
+    rng = random.Random(0)
+    project_meta = sly.ProjectMeta(
+        obj_classes=[
+            sly.ObjClass("car", sly.Rectangle),
+            sly.ObjClass("road", sly.Polygon),
+            sly.ObjClass("sign", sly.Point),
+            sly.ObjClass("person", sly.Bitmap),
+        ]
+    )
+    class_names = {obj_class.name for obj_class in project_meta.obj_classes}
+    annotations = [make_annotation_json(num_labels, rng) for _ in range(num_annotations)]
+
+    start_time = time.perf_counter()
+    expected = [
+        extract_features(sly.Annotation.from_json(annotation, project_meta))
+        for annotation in annotations
+    ]
+    sdk_time = time.perf_counter() - start_time
+
+    print(f"{num_annotations} annotations x {num_labels} labels")
+    print(f"sly.Annotation:   {sdk_time:.3f} s")
+
+    bitmap_memo = BitmapMemo(max_size=100000)
+    for run in ("cold", "warm"):
+        start_time = time.perf_counter()
+        actual = [
+            extract_features_from_json(annotation, class_names, bitmap_memo)
+            for annotation in annotations
+        ]
+        json_time = time.perf_counter() - start_time
+
+        assert actual == expected, "The features extracted from the JSON differ."
+        print(
+            f"JSON, {run} memo: {json_time:.3f} s "
+            f"(speedup {sdk_time / json_time:.1f}x, {bitmap_memo.misses} masks decoded)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
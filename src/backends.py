@@ -0,0 +1,758 @@
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.features import LabelFeatures
+from src.resp import RespClient
+from src.stats import ProjectStats
+from src.store import COLUMNS
+
+# Number of the images written or read in one request to the backend.
+BATCH_SIZE = 500
+
+# Number of attempts of the transaction, which conflicted with other sessions.
+MAX_TRANSACTION_ATTEMPTS = 10
+
+# Names of the backends.
+MEMORY_BACKEND = "memory"
+REDIS_BACKEND = "redis"
+
+
+class ImageRow(NamedTuple):
+    """Cached label features of one image with the information needed to rebuild
+    the statistics of the project from them."""
+
+    image_id: int
+    features: List[LabelFeatures]
+    updated_at: Optional[str]
+    dataset_id: Optional[int]
+    job_id: Optional[int]
+
+
+def iter_image_rows(project: ProjectStats) -> Iterator[ImageRow]:
+    """Get the cached label features of each image of the project.
+    The read lock of the project must be held by the caller.
+
+    :param project: The statistics of the project.
+    :type project: ProjectStats
+    :return: The rows of the images.
+    :rtype: Iterator[ImageRow]
+    """
+    store = project.store
+    for image_id, updated_at in project.updated_at.items():
+        rows = store.image_rows(image_id)
+        features = [
+            LabelFeatures(
+                store.class_names[class_idx],
+                area,
+                top,
+                left,
+                bottom,
+                right,
+                store.geometry_types[geometry_idx],
+                label_id,
+            )
+            for _, class_idx, area, top, left, bottom, right, geometry_idx, label_id in zip(
+                *(rows[name].tolist() for name in COLUMNS)
+            )
+        ]
+        dataset_id, job_id = project.image_scopes.get(image_id, (None, None))
+        yield ImageRow(image_id, features, updated_at, dataset_id, job_id)
+
+
+def class_deltas(
+    old_features: Iterable[LabelFeatures], new_features: Iterable[LabelFeatures]
+) -> Dict[str, Tuple[int, float, float]]:
+    """Get the changes of the area aggregates of each class, when the old labels
+    are replaced with the new ones.
+
+    :param old_features: The features of the removed labels.
+    :type old_features: Iterable[LabelFeatures]
+    :param new_features: The features of the added labels.
+    :type new_features: Iterable[LabelFeatures]
+    :return: Class name -> changes of the number of labels, the sum of the areas
+        and the sum of the squared areas. Classes without changes are omitted.
+    :rtype: Dict[str, Tuple[int, float, float]]
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    for sign, features in ((-1, old_features), (1, new_features)):
+        for feature in features:
+            delta = deltas[feature.class_name]
+            delta[0] += sign
+            delta[1] += sign * feature.area
+            delta[2] += sign * feature.area * feature.area
+    return {
+        class_name: (count, total, total_sq)
+        for class_name, (count, total, total_sq) in deltas.items()
+        if count != 0 or total != 0.0 or total_sq != 0.0
+    }
+
+
+def _encode_row(row: ImageRow) -> str:
+    """Serialize the row of the image (without the image ID, which is the key)."""
+    return json.dumps([row.features, row.updated_at, row.dataset_id, row.job_id])
+
+
+def _decode_row(image_id: int, data: Any) -> ImageRow:
+    """Deserialize the row of the image."""
+    features, updated_at, dataset_id, job_id = json.loads(data)
+    return ImageRow(
+        image_id,
+        [LabelFeatures(*feature) for feature in features],
+        updated_at,
+        dataset_id,
+        job_id,
+    )
+
+
+class CacheBackend(ABC):
+    """Storage of the cache outside of the process, so several sessions of the app
+    share the project metas and infos, the IDs of the issues, the label features
+    of the images and the area aggregates of the classes. The session, which downloads
+    the project, publishes its rows, the other sessions build their statistics from them.
+    The area aggregates are changed incrementally with each update of the image,
+    so all the sessions compare the labels with the same averages.
+
+    Methods:
+    - get_meta: Get the JSON of the project meta.
+    - set_meta: Save the JSON of the project meta.
+    - get_project_info: Get the information about the project.
+    - set_project_info: Save the information about the project.
+    - get_issue_id: Get the ID of the issue.
+    - set_issue_id: Save the ID of the issue.
+    - delete_issue_id: Delete the ID of the issue.
+    - try_lock_project: Take the lock for publishing the project.
+    - unlock_project: Release the lock of the project.
+    - put_project: Publish the rows of all the images of the project.
+    - get_project: Get the rows of all the images of the published project.
+    - set_images: Replace the rows of the images and update the aggregates.
+    - remove_images: Remove the rows of the images and update the aggregates.
+    - get_class_stats: Get the area aggregates of the classes.
+    - drop_project: Delete all the data of the project.
+    - metrics: Get the counters of the backend.
+    """
+
+    @abstractmethod
+    def get_meta(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Get the JSON of the project meta.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :return: The JSON of the project meta, None if it is not saved.
+        :rtype: Optional[Dict[str, Any]]
+        """
+
+    @abstractmethod
+    def set_meta(self, project_id: int, meta: Dict[str, Any]) -> None:
+        """Save the JSON of the project meta.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param meta: The JSON of the project meta.
+        :type meta: Dict[str, Any]
+        """
+
+    @abstractmethod
+    def get_project_info(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Get the information about the project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :return: The fields of sly.ProjectInfo, None if they are not saved.
+        :rtype: Optional[Dict[str, Any]]
+        """
+
+    @abstractmethod
+    def set_project_info(self, project_id: int, info: Dict[str, Any]) -> None:
+        """Save the information about the project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param info: The fields of sly.ProjectInfo.
+        :type info: Dict[str, Any]
+        """
+
+    @abstractmethod
+    def get_issue_id(self, team_id: int, issue_name: str) -> Optional[int]:
+        """Get the ID of the issue of the team.
+
+        :param team_id: The ID of the team.
+        :type team_id: int
+        :param issue_name: The name of the issue.
+        :type issue_name: str
+        :return: The ID of the issue, None if it is not saved.
+        :rtype: Optional[int]
+        """
+
+    @abstractmethod
+    def set_issue_id(self, team_id: int, issue_name: str, issue_id: int) -> None:
+        """Save the ID of the issue of the team.
+
+        :param team_id: The ID of the team.
+        :type team_id: int
+        :param issue_name: The name of the issue.
+        :type issue_name: str
+        :param issue_id: The ID of the issue.
+        :type issue_id: int
+        """
+
+    @abstractmethod
+    def delete_issue_id(self, team_id: int, issue_name: str) -> None:
+        """Delete the ID of the issue of the team.
+
+        :param team_id: The ID of the team.
+        :type team_id: int
+        :param issue_name: The name of the issue.
+        :type issue_name: str
+        """
+
+    @abstractmethod
+    def try_lock_project(self, project_id: int, ttl: float) -> bool:
+        """Take the lock for publishing the project, so only one session downloads it.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param ttl: Time (in seconds), after which the lock expires, if it is not released.
+        :type ttl: float
+        :return: True if the lock was taken.
+        :rtype: bool
+        """
+
+    @abstractmethod
+    def unlock_project(self, project_id: int) -> None:
+        """Release the lock of the project, if it is still held by this backend.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        """
+
+    @abstractmethod
+    def put_project(self, project_id: int, rows: Iterable[ImageRow]) -> None:
+        """Publish the rows of all the images of the project, replacing its previous rows
+        and aggregates. The project is visible to other sessions only after all the rows
+        are written.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param rows: The rows of the images.
+        :type rows: Iterable[ImageRow]
+        """
+
+    @abstractmethod
+    def get_project(self, project_id: int) -> Optional[List[ImageRow]]:
+        """Get the rows of all the images of the published project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :return: The rows of the images, None if the project is not published.
+        :rtype: Optional[List[ImageRow]]
+        """
+
+    @abstractmethod
+    def set_images(self, project_id: int, rows: Sequence[ImageRow]) -> None:
+        """Replace the rows of the images and change the aggregates by the difference
+        between the new and the previous labels, atomically.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param rows: The new rows of the images.
+        :type rows: Sequence[ImageRow]
+        """
+
+    @abstractmethod
+    def remove_images(self, project_id: int, image_ids: Sequence[int]) -> None:
+        """Remove the rows of the images and subtract their labels from the aggregates,
+        atomically.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param image_ids: The IDs of the images.
+        :type image_ids: Sequence[int]
+        """
+
+    @abstractmethod
+    def get_class_stats(
+        self, project_id: int, class_names: Sequence[str]
+    ) -> Dict[str, Tuple[int, float, float]]:
+        """Get the area aggregates of the classes.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param class_names: The names of the classes.
+        :type class_names: Sequence[str]
+        :return: Class name -> number of labels, sum of the areas and sum of the squared
+            areas. Classes without labels are omitted.
+        :rtype: Dict[str, Tuple[int, float, float]]
+        """
+
+    @abstractmethod
+    def drop_project(self, project_id: int) -> None:
+        """Delete the meta, the information, the rows and the aggregates of the project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        """
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the counters of the backend.
+
+        :return: The metrics of the backend.
+        :rtype: Dict[str, Any]
+        """
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """Backend, which keeps the data in the memory of the process. It is not shared
+    between the sessions, but behaves as the external backends do."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metas: Dict[int, str] = {}
+        self._infos: Dict[int, str] = {}
+        self._issues: Dict[Tuple[int, str], int] = {}
+        # project_id -> time, when the lock of the project expires
+        self._project_locks: Dict[int, float] = {}
+        # project_id -> image_id -> serialized row
+        self._rows: Dict[int, Dict[int, str]] = {}
+        # project_id -> class name -> [count, total, total_sq]
+        self._stats: Dict[int, Dict[str, List[float]]] = {}
+
+    def get_meta(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Get the JSON of the project meta, see CacheBackend.get_meta."""
+        meta = self._metas.get(project_id)
+        return json.loads(meta) if meta is not None else None
+
+    def set_meta(self, project_id: int, meta: Dict[str, Any]) -> None:
+        """Save the JSON of the project meta, see CacheBackend.set_meta."""
+        self._metas[project_id] = json.dumps(meta)
+
+    def get_project_info(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Get the information about the project, see CacheBackend.get_project_info."""
+        info = self._infos.get(project_id)
+        return json.loads(info) if info is not None else None
+
+    def set_project_info(self, project_id: int, info: Dict[str, Any]) -> None:
+        """Save the information about the project, see CacheBackend.set_project_info."""
+        self._infos[project_id] = json.dumps(info, default=str)
+
+    def get_issue_id(self, team_id: int, issue_name: str) -> Optional[int]:
+        """Get the ID of the issue of the team, see CacheBackend.get_issue_id."""
+        return self._issues.get((team_id, issue_name))
+
+    def set_issue_id(self, team_id: int, issue_name: str, issue_id: int) -> None:
+        """Save the ID of the issue of the team, see CacheBackend.set_issue_id."""
+        self._issues[(team_id, issue_name)] = issue_id
+
+    def delete_issue_id(self, team_id: int, issue_name: str) -> None:
+        """Delete the ID of the issue of the team, see CacheBackend.delete_issue_id."""
+        self._issues.pop((team_id, issue_name), None)
+
+    def try_lock_project(self, project_id: int, ttl: float) -> bool:
+        """Take the lock, if it is free or expired, see CacheBackend.try_lock_project."""
+        with self._lock:
+            now = time.monotonic()
+            if self._project_locks.get(project_id, 0.0) > now:
+                return False
+            self._project_locks[project_id] = now + ttl
+            return True
+
+    def unlock_project(self, project_id: int) -> None:
+        """Release the lock of the project, see CacheBackend.unlock_project."""
+        with self._lock:
+            self._project_locks.pop(project_id, None)
+
+    def put_project(self, project_id: int, rows: Iterable[ImageRow]) -> None:
+        """Replace the rows and the aggregates of the project at once,
+        see CacheBackend.put_project.
+        """
+        project_rows = {}
+        stats = defaultdict(lambda: [0, 0.0, 0.0])
+        for row in rows:
+            project_rows[row.image_id] = _encode_row(row)
+            for class_name, delta in class_deltas([], row.features).items():
+                for idx, value in enumerate(delta):
+                    stats[class_name][idx] += value
+        with self._lock:
+            self._rows[project_id] = project_rows
+            self._stats[project_id] = dict(stats)
+
+    def get_project(self, project_id: int) -> Optional[List[ImageRow]]:
+        """Get the copies of the rows of the project, see CacheBackend.get_project."""
+        with self._lock:
+            project_rows = self._rows.get(project_id)
+            if project_rows is None:
+                return None
+            project_rows = dict(project_rows)
+        return [_decode_row(image_id, data) for image_id, data in project_rows.items()]
+
+    def set_images(self, project_id: int, rows: Sequence[ImageRow]) -> None:
+        """Replace the rows and apply the deltas under the lock, see CacheBackend.set_images."""
+        with self._lock:
+            project_rows = self._rows.setdefault(project_id, {})
+            old_features = []
+            for row in rows:
+                data = project_rows.get(row.image_id)
+                if data is not None:
+                    old_features.extend(_decode_row(row.image_id, data).features)
+                project_rows[row.image_id] = _encode_row(row)
+            new_features = [feature for row in rows for feature in row.features]
+            self._apply_deltas(project_id, class_deltas(old_features, new_features))
+
+    def remove_images(self, project_id: int, image_ids: Sequence[int]) -> None:
+        """Remove the rows and apply the deltas under the lock,
+        see CacheBackend.remove_images.
+        """
+        with self._lock:
+            project_rows = self._rows.get(project_id, {})
+            old_features = []
+            for image_id in image_ids:
+                data = project_rows.pop(image_id, None)
+                if data is not None:
+                    old_features.extend(_decode_row(image_id, data).features)
+            self._apply_deltas(project_id, class_deltas(old_features, []))
+
+    def _apply_deltas(
+        self, project_id: int, deltas: Dict[str, Tuple[int, float, float]]
+    ) -> None:
+        """Change the aggregates of the project, the lock must be held by the caller."""
+        stats = self._stats.setdefault(project_id, {})
+        for class_name, delta in deltas.items():
+            class_stats = stats.setdefault(class_name, [0, 0.0, 0.0])
+            for idx, value in enumerate(delta):
+                class_stats[idx] += value
+
+    def get_class_stats(
+        self, project_id: int, class_names: Sequence[str]
+    ) -> Dict[str, Tuple[int, float, float]]:
+        """Get the area aggregates of the classes, see CacheBackend.get_class_stats."""
+        with self._lock:
+            stats = self._stats.get(project_id, {})
+            return {
+                class_name: tuple(stats[class_name])
+                for class_name in class_names
+                if class_name in stats and stats[class_name][0] > 0
+            }
+
+    def drop_project(self, project_id: int) -> None:
+        """Delete all the data of the project, see CacheBackend.drop_project."""
+        with self._lock:
+            for data in (self._metas, self._infos, self._rows, self._stats):
+                data.pop(project_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the number of the projects and the images kept in the memory.
+
+        :return: The metrics of the backend.
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            return {
+                "projects": len(self._rows),
+                "images": sum(len(rows) for rows in self._rows.values()),
+            }
+
+
+class RedisBackend(CacheBackend):
+    """Backend, which keeps the data in the key-value server with the Redis protocol,
+    shared by all the sessions of the app. The keys of the project are:
+
+    - <prefix>:meta:<project_id>, <prefix>:info:<project_id>: JSON strings;
+    - <prefix>:rows:<project_id>: hash of the serialized rows by the image ID;
+    - <prefix>:stats:<project_id>: hash of the aggregates ("count:<class>",
+      "total:<class>", "total_sq:<class>"), changed only by atomic increments;
+    - <prefix>:ready:<project_id>: set, when all the rows of the project are published;
+    - <prefix>:lock:<project_id>: lock of the session, which publishes the project.
+
+    The IDs of the issues are kept in the <prefix>:issues:<team_id> hash.
+    The rows are written and read in pipelined batches. The rows and the aggregates
+    of the updated images are changed in one optimistic transaction (WATCH, MULTI, EXEC),
+    which is retried, if another session changed the rows of the project in the meantime.
+
+    :param client: The client of the server.
+    :type client: RespClient
+    :param prefix: The prefix of all the keys.
+    :type prefix: str
+    """
+
+    def __init__(self, client: RespClient, prefix: str = "rtlqc"):
+        self._client = client
+        self.prefix = prefix
+        # project_id -> token of the lock taken by this backend
+        self._tokens: Dict[int, str] = {}
+
+    def _key(self, kind: str, key_id: int) -> str:
+        """Get the key of the data.
+
+        :param kind: The kind of the data, e.g. "meta" or "rows".
+        :type kind: str
+        :param key_id: The ID of the project (or of the team for the issues).
+        :type key_id: int
+        :return: The key.
+        :rtype: str
+        """
+        return f"{self.prefix}:{kind}:{key_id}"
+
+    def get_meta(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Get the JSON string of the project meta, see CacheBackend.get_meta."""
+        meta = self._client.execute("GET", self._key("meta", project_id))
+        return json.loads(meta) if meta is not None else None
+
+    def set_meta(self, project_id: int, meta: Dict[str, Any]) -> None:
+        """Save the JSON string of the project meta, see CacheBackend.set_meta."""
+        self._client.execute("SET", self._key("meta", project_id), json.dumps(meta))
+
+    def get_project_info(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Get the JSON string of the project info, see CacheBackend.get_project_info."""
+        info = self._client.execute("GET", self._key("info", project_id))
+        return json.loads(info) if info is not None else None
+
+    def set_project_info(self, project_id: int, info: Dict[str, Any]) -> None:
+        """Save the JSON string of the project info, see CacheBackend.set_project_info."""
+        self._client.execute(
+            "SET", self._key("info", project_id), json.dumps(info, default=str)
+        )
+
+    def get_issue_id(self, team_id: int, issue_name: str) -> Optional[int]:
+        """Get the field of the issues hash of the team, see CacheBackend.get_issue_id."""
+        issue_id = self._client.execute("HGET", self._key("issues", team_id), issue_name)
+        return int(issue_id) if issue_id is not None else None
+
+    def set_issue_id(self, team_id: int, issue_name: str, issue_id: int) -> None:
+        """Set the field of the issues hash of the team, see CacheBackend.set_issue_id."""
+        self._client.execute("HSET", self._key("issues", team_id), issue_name, issue_id)
+
+    def delete_issue_id(self, team_id: int, issue_name: str) -> None:
+        """Delete the field of the issues hash of the team,
+        see CacheBackend.delete_issue_id.
+        """
+        self._client.execute("HDEL", self._key("issues", team_id), issue_name)
+
+    def try_lock_project(self, project_id: int, ttl: float) -> bool:
+        """Set the lock key with a random token (SET NX PX),
+        see CacheBackend.try_lock_project.
+        """
+        token = uuid.uuid4().hex
+        reply = self._client.execute(
+            "SET", self._key("lock", project_id), token, "NX", "PX", int(ttl * 1000)
+        )
+        if reply != "OK":
+            return False
+        self._tokens[project_id] = token
+        return True
+
+    def unlock_project(self, project_id: int) -> None:
+        """Delete the lock key in a transaction, only if it still holds the token
+        of this backend, see CacheBackend.unlock_project.
+        """
+        token = self._tokens.pop(project_id, None)
+        if token is None:
+            return
+        lock_key = self._key("lock", project_id)
+        # The lock is deleted only if it was not expired and taken by another session.
+        _, current = self._client.pipeline([("WATCH", lock_key), ("GET", lock_key)])
+        if current != token.encode("ascii"):
+            self._client.execute("UNWATCH")
+            return
+        self._client.pipeline([("MULTI",), ("DEL", lock_key), ("EXEC",)])
+
+    def put_project(self, project_id: int, rows: Iterable[ImageRow]) -> None:
+        """Write the rows and increment the aggregates in pipelined batches, then set
+        the ready key, see CacheBackend.put_project.
+        """
+        rows_key = self._key("rows", project_id)
+        stats_key = self._key("stats", project_id)
+        ready_key = self._key("ready", project_id)
+        self._client.execute("DEL", ready_key, rows_key, stats_key)
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            fields = []
+            for row in batch:
+                fields.extend((row.image_id, _encode_row(row)))
+            deltas = class_deltas([], [feature for row in batch for feature in row.features])
+            self._client.pipeline(
+                [("HSET", rows_key, *fields)] + self._increments(stats_key, deltas)
+            )
+        self._client.execute("SET", ready_key, 1)
+
+    def get_project(self, project_id: int) -> Optional[List[ImageRow]]:
+        """Read the rows in pipelined batches of HMGET, see CacheBackend.get_project."""
+        rows_key = self._key("rows", project_id)
+        ready, image_ids = self._client.pipeline(
+            [("EXISTS", self._key("ready", project_id)), ("HKEYS", rows_key)]
+        )
+        if not ready:
+            return None
+        image_ids = [int(image_id) for image_id in image_ids]
+        batches = [
+            image_ids[start:start + BATCH_SIZE]
+            for start in range(0, len(image_ids), BATCH_SIZE)
+        ]
+        replies = self._client.pipeline([("HMGET", rows_key, *batch) for batch in batches])
+        result = []
+        for batch, values in zip(batches, replies):
+            for image_id, data in zip(batch, values):
+                if data is not None:
+                    result.append(_decode_row(image_id, data))
+        return result
+
+    def set_images(self, project_id: int, rows: Sequence[ImageRow]) -> None:
+        """Replace the rows and increment the aggregates in one optimistic transaction,
+        see CacheBackend.set_images.
+        """
+        if not rows:
+            return
+        fields = []
+        for row in rows:
+            fields.extend((row.image_id, _encode_row(row)))
+        new_features = [feature for row in rows for feature in row.features]
+        self._transaction(
+            project_id,
+            [row.image_id for row in rows],
+            lambda old_features: [("HSET", self._key("rows", project_id), *fields)]
+            + self._increments(
+                self._key("stats", project_id), class_deltas(old_features, new_features)
+            ),
+        )
+
+    def remove_images(self, project_id: int, image_ids: Sequence[int]) -> None:
+        """Delete the rows and decrement the aggregates in one optimistic transaction,
+        see CacheBackend.remove_images.
+        """
+        if not image_ids:
+            return
+        self._transaction(
+            project_id,
+            image_ids,
+            lambda old_features: [("HDEL", self._key("rows", project_id), *image_ids)]
+            + self._increments(
+                self._key("stats", project_id), class_deltas(old_features, [])
+            ),
+        )
+
+    def _transaction(self, project_id: int, image_ids: Sequence[int], commands) -> None:
+        """Read the previous rows of the images and run the commands, built from their
+        labels, in one optimistic transaction, retrying it on conflicts.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param image_ids: The IDs of the images, whose rows are changed.
+        :type image_ids: Sequence[int]
+        :param commands: Builds the commands of the transaction from the previous labels.
+        :type commands: Callable[[List[LabelFeatures]], List[tuple]]
+        :raises RuntimeError: If the transaction conflicted too many times.
+        """
+        rows_key = self._key("rows", project_id)
+        for attempt in range(MAX_TRANSACTION_ATTEMPTS):
+            _, values = self._client.pipeline(
+                [("WATCH", rows_key), ("HMGET", rows_key, *image_ids)]
+            )
+            old_features = [
+                feature
+                for image_id, data in zip(image_ids, values)
+                if data is not None
+                for feature in _decode_row(image_id, data).features
+            ]
+            replies = self._client.pipeline(
+                [("MULTI",)] + commands(old_features) + [("EXEC",)]
+            )
+            if replies[-1] is not None:
+                return
+            # The rows were changed by another session, read them again.
+            time.sleep(random.uniform(0, 0.01 * 2**attempt))
+        raise RuntimeError(
+            f"Rows of project_id={project_id} were changed concurrently too many times."
+        )
+
+    @staticmethod
+    def _increments(
+        stats_key: str, deltas: Dict[str, Tuple[int, float, float]]
+    ) -> List[tuple]:
+        """Get the commands, which increment the aggregates of the classes.
+
+        :param stats_key: The key of the aggregates of the project.
+        :type stats_key: str
+        :param deltas: Class name -> changes of the count, the total and the total_sq.
+        :type deltas: Dict[str, Tuple[int, float, float]]
+        :return: The commands.
+        :rtype: List[tuple]
+        """
+        commands = []
+        for class_name, (count, total, total_sq) in deltas.items():
+            commands.append(("HINCRBY", stats_key, f"count:{class_name}", count))
+            commands.append(("HINCRBYFLOAT", stats_key, f"total:{class_name}", total))
+            commands.append(("HINCRBYFLOAT", stats_key, f"total_sq:{class_name}", total_sq))
+        return commands
+
+    def get_class_stats(
+        self, project_id: int, class_names: Sequence[str]
+    ) -> Dict[str, Tuple[int, float, float]]:
+        """Read the aggregates of the classes with one HMGET,
+        see CacheBackend.get_class_stats.
+        """
+        if not class_names:
+            return {}
+        fields = []
+        for class_name in class_names:
+            fields.extend(
+                (f"count:{class_name}", f"total:{class_name}", f"total_sq:{class_name}")
+            )
+        values = self._client.execute("HMGET", self._key("stats", project_id), *fields)
+        result = {}
+        for idx, class_name in enumerate(class_names):
+            count, total, total_sq = values[3 * idx:3 * idx + 3]
+            if count is not None and int(count) > 0:
+                result[class_name] = (int(count), float(total or 0), float(total_sq or 0))
+        return result
+
+    def drop_project(self, project_id: int) -> None:
+        """Delete all the keys of the project, see CacheBackend.drop_project."""
+        self._client.execute(
+            "DEL",
+            *(
+                self._key(kind, project_id)
+                for kind in ("ready", "rows", "stats", "meta", "info")
+            ),
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the number of the round trips and of the commands sent to the server.
+
+        :return: The metrics of the backend.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "round_trips": self._client.round_trips,
+            "commands": self._client.commands,
+        }
+
+
+def create_backend(kind: str, url: str, prefix: str) -> Optional[CacheBackend]:
+    """Create the backend of the cache.
+
+    :param kind: The kind of the backend: "memory", "redis" or empty to disable it.
+    :type kind: str
+    :param url: The URL of the server of the Redis backend.
+    :type url: str
+    :param prefix: The prefix of the keys of the Redis backend.
+    :type prefix: str
+    :raises ValueError: If the kind of the backend is unknown.
+    :return: The backend, None if it is disabled.
+    :rtype: Optional[CacheBackend]
+    """
+    if not kind:
+        return None
+    if kind == MEMORY_BACKEND:
+        return MemoryBackend()
+    if kind == REDIS_BACKEND:
+        return RedisBackend(RespClient(url), prefix)
+    raise ValueError(f"Unknown cache backend: {kind}")
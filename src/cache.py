@@ -1,50 +1,159 @@
-from collections import defaultdict
-from typing import Dict, List
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import supervisely as sly
 from supervisely.api.annotation_api import AnnotationInfo
 from supervisely.app.singleton import Singleton
 
 import src.globals as g
-from src.issues import get_or_create_issue
+from src.backends import CacheBackend, ImageRow, create_backend, iter_image_rows
+from src.features import (
+    BitmapMemo,
+    LabelFeatures,
+    extract_features,
+    extract_features_from_json,
+    extract_packed_features,
+    unpack_features,
+)
+from src.issues import create_issue, find_issue, list_issues
+from src.meta import CompiledMeta
+from src.persistence import CacheSnapshot
+from src.shared import (
+    SharedStats,
+    apply_record,
+    drop_class_record,
+    remove_image_record,
+    rename_class_record,
+    set_image_record,
+)
+from src.stats import DATASET_SCOPE, JOB_SCOPE, ProjectStats, StatsSnapshot
+from src.sync import SingleFlight
+from src.utils import diff_project_metas, get_meta_version
+
+# Minimum interval (in seconds) between the refetches of the project meta, which did not
+# change it, so the annotations broken for other reasons do not flood the server.
+META_REFRESH_COOLDOWN = 5.0
+
+# Interval (in seconds) between the checks, whether the project being downloaded by another
+# session of the app was published to the cache backend.
+BACKEND_POLL_INTERVAL = 0.5
 
 # from src.ui.settings import progress_bar
 
 
 class Cache(metaclass=Singleton):
-    """Cache class for storing the metadata of the project, project info, annotation info,
-    and issues. It also contains methods for caching and getting the cached data.
+    """Cache class for storing the metadata of the project, project info, label features
+    with statistics, and issues. It also contains methods for caching and getting the cached data.
 
     Properties:
     - project_meta: Metadata of the project.
+    - meta_versions: Versions of the cached project metas.
+    - compiled_metas: Lookup tables of the cached project metas.
     - project_info: Information about the project.
-    - annotation_infos: Information about the annotations.
-    - issues: Issues in the project.
+    - projects: Label features and statistics of the cached projects (in LRU order).
+    - warmup_throughput: Measured throughput of the last warm-up of the project.
+    - bitmap_memo: Areas and bounding boxes of the decoded bitmaps.
+    - issues: IDs of the issues of each team.
 
     Methods:
     - cache_annotation_infos: Cache the annotation information.
+    - sync_project: Synchronize the cached project with the server.
+    - sync_all: Synchronize all the cached projects with the server.
     - update_cached_annotation_info: Update the cached annotation information.
     - get_project_meta: Get the metadata of the project.
+    - refresh_project_meta: Refetch the stale metadata of the project once for all callers.
+    - get_compiled_meta: Get the lookup tables of the project meta.
     - get_project_info: Get the information about the project.
     - get_annotation: Get the annotation.
     - get_annotations: Get the annotations.
     - get_issued_id: Get the issue ID.
-    - get_labels_by_class: Get the labels by class.
-    - get_annotations_for_whole_project: Get the annotations for the whole project.
-    - group_annotations_by_class: Group the annotations by class.
+    - forget_issue: Forget the issue ID, which turned out to be invalid.
+    - get_project_stats: Get the label features and statistics of the project.
+    - get_stats_snapshot: Get the snapshot of the statistics for the given classes.
+    - metrics: Get the hit, miss and eviction counters and the memory usage of the cache.
+    - get_snapshot: Get the persistent on-disk copy of the cache.
+    - get_shared_stats: Get the statistics shared with the other processes of the app.
+    - get_backend: Get the cache backend shared with the other sessions of the app.
+    - restore: Restore the saved projects from the on-disk copy.
     """
 
     # project_id -> sly.ProjectMeta
     project_meta = defaultdict(lambda: None)
 
+    # project_id -> version (hash) of the cached sly.ProjectMeta
+    meta_versions = {}
+
+    # project_id -> CompiledMeta of the cached project meta, rebuilt when its version changes
+    compiled_metas = {}
+
+    # project_id -> time of the last refetch of the project meta, which did not change it
+    _meta_checked_at = {}
+
     # project_id -> sly.ProjectInfo
     project_info = defaultdict(lambda: None)
 
-    # project_id -> image_id -> AnnotationInfo
-    annotation_infos = defaultdict(lambda: defaultdict(lambda: None))
+    # project_id -> ProjectStats, from the least to the most recently used project.
+    # The project is added only after its warm-up is finished, so the events never
+    # see half-filled statistics. Each project is guarded by its own read/write lock.
+    # When the memory budget is exceeded, the least recently used projects are evicted
+    # and transparently loaded again on the next access.
+    projects: "OrderedDict[int, ProjectStats]" = OrderedDict()
+
+    # Guards the order and the membership of the projects.
+    _projects_lock = threading.Lock()
+
+    # Concurrent warm-ups of the same project are merged into one.
+    _loader = SingleFlight()
+
+    # Persistent on-disk copy of the cache, created on the first access.
+    _snapshot: Optional[CacheSnapshot] = None
+    _snapshot_lock = threading.Lock()
+
+    # Statistics shared with the other processes of the app, created on the first access.
+    _shared: Optional[SharedStats] = None
+
+    # Cache backend shared with the other sessions of the app, created on the first access.
+    _backend: Optional[CacheBackend] = None
+
+    # IDs of the cached projects, which are published to the cache backend, so their
+    # updates are written through to it and their aggregates are read from it.
+    _published = set()
+
+    # Counters of the project lookups.
+    hits = 0
+    misses = 0
+    evictions = 0
+
+    # project_id -> images per second of the last warm-up
+    warmup_throughput = {}
+
+    # Shared by all the projects, so the same masks are not decoded again on re-downloads.
+    bitmap_memo = BitmapMemo(g.bitmap_memo_size)
+
+    # Processes extracting the label features during warm-up, created on the first use.
+    _parse_pool: Optional[ProcessPoolExecutor] = None
+    _parse_pool_lock = threading.Lock()
+
+    # team_id -> issue_name -> issue_id
+    issues: Dict[int, Dict[str, int]] = defaultdict(dict)
+
+    # Teams, whose issues were loaded from the on-disk copy of the cache.
+    _restored_issue_teams = set()
 
-    # issue_name -> issue_id
-    issues = {}
+    # Teams, whose issues were all listed (when the server could not filter them by name),
+    # so the issues missing in the index do not exist.
+    _listed_issue_teams = set()
 
     @sly.timeit
     def cache_annotation_infos(
@@ -59,61 +168,560 @@ class Cache(metaclass=Singleton):
         :param only_labelled: Whether to cache only labelled images.
         :type only_labelled: bool
         """
-        if project_id not in self.annotation_infos or force:
-            # * We do not need to obtain a lsit of datasets, if we need only Image Infos.
-            # * But we need dataset IDs to obtain Annotation Infos.
-            # ? If those changes will be added to API/SDK, consider removing this iteration
-            # ? for speeding up the process.
-            datasets = g.spawn_api.dataset.get_list(project_id)
-            for dataset in datasets:
-                image_infos = g.spawn_api.image.get_list(
-                    dataset.id, only_labelled=only_labelled
+        if self._touch(project_id) is not None and not force:
+            sly.logger.debug(
+                "Annotation infos for project_id=%s were already cached.", project_id
+            )
+            return
+
+        with self._projects_lock:
+            Cache.misses += 1
+
+        # If the project is already being loaded by another event, wait for it
+        # instead of starting one more download of the whole project.
+        self._loader.do(project_id, self._warm_up, project_id, force, only_labelled)
+
+    def _warm_up(self, project_id: int, force: bool, only_labelled: bool) -> None:
+        """Load the label features and statistics of the project and publish them in the cache.
+        If the statistics are shared, the project is loaded from the shared statistics,
+        unless it was not built by any process of the app yet.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param force: Whether to reload the project from the server, if it is already cached.
+        :type force: bool
+        :param only_labelled: Whether to cache only labelled images.
+        :type only_labelled: bool
+        """
+        if project_id in self.projects and not force:
+            # The project was loaded by the previous flight, while this one was starting.
+            return
+
+        shared = self.get_shared_stats()
+        if shared is not None:
+            # One process of the app builds the project, the others wait and load it.
+            project_meta, project = shared.load_or_build(
+                project_id,
+                lambda: self._build_project(project_id, force, only_labelled),
+                force,
+            )
+            self.project_meta[project_id] = project_meta  # type: ignore
+            self.meta_versions[project_id] = get_meta_version(project_meta)
+        else:
+            _, project = self._build_project(project_id, force, only_labelled)
+
+        with self._projects_lock:
+            self.projects[project_id] = project
+            self.projects.move_to_end(project_id)
+        self._evict()
+
+    def _build_project(
+        self, project_id: int, force: bool, only_labelled: bool
+    ) -> Tuple[sly.ProjectMeta, ProjectStats]:
+        """Build the label features and statistics of the project.
+        The project is loaded from the cache backend, if another session of the app
+        published it, then restored from the on-disk snapshot if possible, otherwise
+        (or if the reload is forced) the annotations of the whole project are downloaded.
+        The project, which was not loaded from the backend, is published to it.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param force: Whether to download the project, even if it has a snapshot.
+        :type force: bool
+        :param only_labelled: Whether to cache only labelled images.
+        :type only_labelled: bool
+        :return: The metadata and the statistics of the project.
+        :rtype: Tuple[sly.ProjectMeta, ProjectStats]
+        """
+        project, locked = self._load_published_project(project_id, force)
+        try:
+            if project is None:
+                project = self._restore_or_download_project(
+                    project_id, force, only_labelled
+                )
+                if locked:
+                    self._publish_project(project_id, project)
+        finally:
+            if locked:
+                self._call_backend("unlock_project", project_id)
+
+        # The images were loaded in an arbitrary order, the recent statistics
+        # are rebuilt in the order of their updates.
+        project.reset_decayed(g.decay_half_life_images)
+        return self.get_project_meta(project_id), project
+
+    def _restore_or_download_project(
+        self, project_id: int, force: bool, only_labelled: bool
+    ) -> ProjectStats:
+        """Restore the project from the on-disk snapshot, or download it, if there is
+        no snapshot or the reload is forced.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param force: Whether to download the project, even if it has a snapshot.
+        :type force: bool
+        :param only_labelled: Whether to cache only labelled images.
+        :type only_labelled: bool
+        :return: The statistics of the project.
+        :rtype: ProjectStats
+        """
+        snapshot = self.get_snapshot()
+        restored = None
+        if snapshot is not None and not force:
+            try:
+                restored = snapshot.load_project(project_id)
+            except Exception as e:
+                sly.logger.warning(
+                    "Failed to restore project_id=%s from the snapshot: %s", project_id, e
                 )
-                image_ids = [image_info.id for image_info in image_infos]
-
-                # ! This code is commented because at the moment of the frontend
-                # ! the app CAN NOT has any status except "Application is started".
-                # ! But the progress bar will change the app's status and this
-                # ! will lead to error in the UI.
-                # ? Consider removing this feature on the frontend to show
-                # ? the progress bar.
-                # with progress_bar(
-                #     message="Caching annotations...", total=len(image_ids)
-                # ) as pcb:
-
-                #     def progress_cb(to_update: int) -> None:
-                #         """Progress callback for the progress bar,
-                #         required to update the progress bar in the UI.
-
-                #         :param to_update: The number of images to update.
-                #         :type to_update: int
-                #         """
-                #         pcb.update(to_update)
-
-                annotation_infos = g.spawn_api.annotation.download_batch(
-                    dataset.id,
-                    image_ids,
-                    force_metadata_for_links=False,
-                    # progress_cb=progress_cb,
+
+        if restored is not None:
+            project_meta, project = restored
+            self.project_meta[project_id] = project_meta  # type: ignore
+            self.meta_versions[project_id] = get_meta_version(project_meta)
+            return project
+
+        project = self._download_project(project_id, only_labelled)
+        if snapshot is not None:
+            try:
+                snapshot.save_project(project_id, self.get_project_meta(project_id), project)
+            except Exception as e:
+                sly.logger.warning(
+                    "Failed to save the snapshot of project_id=%s: %s", project_id, e
                 )
+        return project
 
-                for annotation_info in annotation_infos:
-                    self.annotation_infos[dataset.project_id][
-                        annotation_info.image_id
-                    ] = annotation_info  # type: ignore
+    def _load_published_project(
+        self, project_id: int, force: bool
+    ) -> Tuple[Optional[ProjectStats], bool]:
+        """Load the project published to the cache backend by another session of the app.
+        If it is not published, the lock of the project is taken, so only this session
+        builds and publishes it. While another session holds the lock, this one waits
+        for the project to be published (at most for the TTL of the lock).
 
-            sly.logger.debug(
-                "Annotation infos for project_id=%s were cached.", project_id
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param force: Whether to skip the published project and build it again.
+        :type force: bool
+        :return: The statistics of the project (None if it must be built) and whether
+            this session holds the lock of the project and must publish it.
+        :rtype: Tuple[Optional[ProjectStats], bool]
+        """
+        backend = self.get_backend()
+        if backend is None:
+            return None, False
+
+        deadline = time.monotonic() + g.cache_backend_lock_ttl
+        while True:
+            try:
+                if not force:
+                    start_time = time.perf_counter()
+                    rows = backend.get_project(project_id)
+                    if rows is not None:
+                        project = ProjectStats()
+                        for row in rows:
+                            project.set_image(*row)
+                        self._published.add(project_id)
+                        sly.logger.info(
+                            "Project with id=%s was loaded from the cache backend "
+                            "(%s images) in %.2f s.",
+                            project_id,
+                            len(rows),
+                            time.perf_counter() - start_time,
+                        )
+                        return project, False
+                if backend.try_lock_project(project_id, g.cache_backend_lock_ttl):
+                    return None, True
+            except Exception as e:
+                sly.logger.warning(
+                    "Failed to load project_id=%s from the cache backend: %s", project_id, e
+                )
+                return None, False
+            if force or time.monotonic() > deadline:
+                # The forced reload does not wait for the project published by another session.
+                return None, False
+            time.sleep(BACKEND_POLL_INTERVAL)
+
+    def _publish_project(self, project_id: int, project: ProjectStats) -> None:
+        """Publish all the images of the project to the cache backend, replacing
+        the previously published ones. The lock of the project in the backend must be
+        held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        """
+        backend = self.get_backend()
+        if backend is None:
+            return
+        start_time = time.perf_counter()
+        with project.lock.read():
+            rows = list(iter_image_rows(project))
+        try:
+            backend.put_project(project_id, rows)
+        except Exception as e:
+            self._published.discard(project_id)
+            sly.logger.warning(
+                "Failed to publish project_id=%s to the cache backend: %s", project_id, e
             )
-        else:
-            sly.logger.debug(
-                "Annotation infos for project_id=%s were already cached.", project_id
+            return
+        self._published.add(project_id)
+        sly.logger.info(
+            "Project with id=%s was published to the cache backend (%s images) in %.2f s.",
+            project_id,
+            len(rows),
+            time.perf_counter() - start_time,
+        )
+
+    def _publish_images(
+        self,
+        project_id: int,
+        project: ProjectStats,
+        images: List[Tuple[int, List[LabelFeatures], Optional[str]]],
+    ) -> None:
+        """Write the updated images of the published project through to the cache backend.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        :param images: The IDs, the features of the labels and the update times of the images.
+        :type images: List[Tuple[int, List[LabelFeatures], Optional[str]]]
+        """
+        if project_id not in self._published or not images:
+            return
+        with project.lock.read():
+            rows = [
+                ImageRow(
+                    image_id,
+                    features,
+                    updated_at,
+                    *project.image_scopes.get(image_id, (None, None)),
+                )
+                for image_id, features, updated_at in images
+            ]
+        self._call_backend("set_images", project_id, rows)
+
+    def _download_project(self, project_id: int, only_labelled: bool) -> ProjectStats:
+        """Download the annotations of the whole project and extract their features.
+        Only the downloads are pipelined: the features of each downloaded batch are merged
+        into the new statistics of the project, which are published in the cache only
+        when the whole project is downloaded.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param only_labelled: Whether to cache only labelled images.
+        :type only_labelled: bool
+        :return: The statistics of the project.
+        :rtype: ProjectStats
+        """
+        project = ProjectStats()
+
+        start_time = time.perf_counter()
+        num_images = 0
+
+        for batch in self._fetch_features(project_id, only_labelled):
+            # The batch was downloaded and parsed, merge it into the statistics.
+            for image_id, features, updated_at, dataset_id in batch:
+                project.set_image(image_id, features, updated_at, dataset_id)
+            num_images += len(batch)
+
+        elapsed = time.perf_counter() - start_time
+        throughput = num_images / elapsed if elapsed > 0 else 0.0
+        self.warmup_throughput[project_id] = throughput
+        sly.logger.info(
+            "Cached %s images of project_id=%s in %.2f s (%.1f images/s).",
+            num_images,
+            project_id,
+            elapsed,
+            throughput,
+        )
+        return project
+
+    def _fetch_features(
+        self,
+        project_id: int,
+        only_labelled: bool,
+        select: Optional[Callable[[List[sly.ImageInfo]], List[sly.ImageInfo]]] = None,
+    ) -> Iterator[List[Tuple[int, List[LabelFeatures], str, int]]]:
+        """Download the annotations of the project and extract the features of their labels.
+        Listing of the images, downloading of the annotation batches and extraction
+        of the features run in a pool of threads and overlap across datasets: the datasets
+        are listed one after another, the batches of each dataset are scheduled as soon as
+        it is listed, while the next dataset is being listed, so the downloads never wait
+        for the listings of the other datasets. The batches are yielded as soon as they arrive.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param only_labelled: Whether to download only labelled images.
+        :type only_labelled: bool
+        :param select: Receives the listed images of each dataset and returns the images,
+            which should be downloaded. If not set, all the images are downloaded.
+        :type select: Optional[Callable[[List[sly.ImageInfo]], List[sly.ImageInfo]]]
+        :return: Batches of (image ID, features of the labels of the image, update time,
+            dataset ID).
+        :rtype: Iterator[List[Tuple[int, List[LabelFeatures], str, int]]]
+        """
+        project_meta = self.get_project_meta(project_id)
+        project_info = self.get_project_info(project_id)
+        parse_pool = self._get_parse_pool(project_info)
+
+        # * We do not need to obtain a lsit of datasets, if we need only Image Infos.
+        # * But we need dataset IDs to obtain Annotation Infos.
+        # ? If those changes will be added to API/SDK, consider removing this iteration
+        # ? for speeding up the process.
+        datasets = g.spawn_api.dataset.get_list(project_id)
+
+        # ! The progress bar is not shown here, because at the moment of the frontend
+        # ! the app CAN NOT has any status except "Application is started".
+        # ! But the progress bar will change the app's status and this
+        # ! will lead to error in the UI.
+        # ? Consider removing this feature on the frontend to show
+        # ? the progress bar.
+        with ThreadPoolExecutor(max_workers=g.warmup_max_workers) as executor:
+            # future -> (stage of the pipeline, dataset ID)
+            pending = {}
+            datasets_to_list = iter(datasets)
+
+            def list_next_dataset() -> None:
+                dataset = next(datasets_to_list, None)
+                if dataset is not None:
+                    future = executor.submit(
+                        g.spawn_api.image.get_list, dataset.id, only_labelled=only_labelled
+                    )
+                    pending[future] = ("list", dataset.id)
+
+            list_next_dataset()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, dataset_id = pending.pop(future)
+                    result = future.result()
+                    if stage == "list":
+                        # The next dataset is listed before the batches of this one are
+                        # scheduled, so the listing is not queued behind the downloads.
+                        list_next_dataset()
+                        image_infos = select(result) if select is not None else result
+                        for batch in sly.batched(image_infos, g.warmup_batch_size):
+                            batch_future = executor.submit(
+                                self._download_features,
+                                dataset_id,
+                                batch,
+                                project_meta,
+                                project_info,
+                                parse_pool,
+                            )
+                            pending[batch_future] = ("batch", dataset_id)
+                    else:
+                        yield result
+
+    def _get_parse_pool(
+        self, project_info: sly.ProjectInfo
+    ) -> Optional[ProcessPoolExecutor]:
+        """Get the pool of processes to extract the label features of the project.
+        Small projects are parsed in-process, so the pool is not used for them.
+
+        :param project_info: The information about the project.
+        :type project_info: sly.ProjectInfo
+        :return: The pool, None if the features should be extracted in-process.
+        :rtype: Optional[ProcessPoolExecutor]
+        """
+        if g.warmup_parse_processes <= 0:
+            return None
+        if project_info.items_count < g.warmup_parse_min_images:
+            return None
+        with self._parse_pool_lock:
+            if Cache._parse_pool is None:
+                # The app runs threads, so the workers are spawned instead of forked.
+                Cache._parse_pool = ProcessPoolExecutor(
+                    max_workers=g.warmup_parse_processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                sly.logger.info(
+                    "Started %s processes for parsing the annotations.",
+                    g.warmup_parse_processes,
+                )
+            return Cache._parse_pool
+
+    def _download_features(
+        self,
+        dataset_id: int,
+        image_infos: List[sly.ImageInfo],
+        project_meta: sly.ProjectMeta,
+        project_info: sly.ProjectInfo,
+        parse_pool: Optional[ProcessPoolExecutor] = None,
+    ) -> List[Tuple[int, List[LabelFeatures], str, int]]:
+        """Download the batch of annotations and extract the features of their labels.
+        Only the compact features are returned, the annotations are discarded right after parsing.
+        If the pool of processes is given, the features are extracted in one of the processes,
+        which returns them as compact arrays, and only the annotations the process could not
+        parse are parsed in this thread.
+
+        :param dataset_id: The ID of the dataset.
+        :type dataset_id: int
+        :param image_infos: The information about the images in the batch.
+        :type image_infos: List[sly.ImageInfo]
+        :param project_meta: The metadata of the project.
+        :type project_meta: sly.ProjectMeta
+        :param project_info: The information about the project.
+        :type project_info: sly.ProjectInfo
+        :param parse_pool: The pool of processes to extract the features in.
+        :type parse_pool: Optional[ProcessPoolExecutor]
+        :return: List of (image ID, features of the labels of the image, update time of the image,
+            dataset ID).
+        :rtype: List[Tuple[int, List[LabelFeatures], str, int]]
+        """
+        updated_at = {image_info.id: image_info.updated_at for image_info in image_infos}
+        annotation_infos = g.spawn_api.annotation.download_batch(
+            dataset_id, list(updated_at), force_metadata_for_links=False
+        )
+        # The meta could be refreshed by the previous batches.
+        project_meta = self.get_project_meta(project_info.id)
+        compiled_meta = self.get_compiled_meta(project_info.id)
+
+        features_per_image = [None] * len(annotation_infos)
+        if parse_pool is not None:
+            try:
+                packed = parse_pool.submit(
+                    extract_packed_features,
+                    [annotation_info.annotation for annotation_info in annotation_infos],
+                    project_meta.to_json(),
+                    compiled_meta.version,
+                ).result()
+                features_per_image = unpack_features(packed)
+            except BrokenProcessPool as e:
+                sly.logger.warning(
+                    "Parsing processes failed, the batch is parsed in-process: %s", e
+                )
+                with self._parse_pool_lock:
+                    if Cache._parse_pool is parse_pool:
+                        Cache._parse_pool = None
+
+        result = []
+        for annotation_info, features in zip(annotation_infos, features_per_image):
+            if features is None:
+                # Only the features are needed, so the annotation is read from the JSON
+                # directly. sly.Annotation is built only for the labels, which the fast
+                # path does not support, and for the classes missing in the cached meta.
+                features = extract_features_from_json(
+                    annotation_info.annotation, compiled_meta.class_ids, self.bitmap_memo
+                )
+            if features is None:
+                features = extract_features(
+                    self.get_annotation(annotation_info, project_meta, project_info)
+                )
+            result.append(
+                (
+                    annotation_info.image_id,
+                    features,
+                    updated_at[annotation_info.image_id],
+                    dataset_id,
+                )
             )
+        return result
+
+    def sync_project(self, project_id: int, only_labelled: bool = True) -> None:
+        """Synchronize the cached project with the server: download only the annotations
+        of the images, which are new or were updated since they were cached (by comparing
+        the update times of the images), and drop the images, which no longer exist.
+        Does nothing if the project is not cached.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param only_labelled: Whether to cache only labelled images.
+        :type only_labelled: bool
+        """
+        project = self.projects.get(project_id)
+        if project is None:
+            return
+
+        project = self._refresh_project(project_id, project)
+        with project.lock.read():
+            known = dict(project.updated_at)
+        listed = set()
+
+        def select(image_infos: List[sly.ImageInfo]) -> List[sly.ImageInfo]:
+            listed.update(image_info.id for image_info in image_infos)
+            return [
+                image_info
+                for image_info in image_infos
+                if image_info.id not in known
+                or known[image_info.id] != image_info.updated_at
+            ]
+
+        start_time = time.perf_counter()
+        num_updated = 0
+        for batch in self._fetch_features(project_id, only_labelled, select):
+            project = self._update_project(
+                project_id,
+                project,
+                [
+                    set_image_record(image_id, features, updated_at, dataset_id)
+                    for image_id, features, updated_at, dataset_id in batch
+                ],
+            )
+            self._publish_images(
+                project_id,
+                project,
+                [
+                    (image_id, features, updated_at)
+                    for image_id, features, updated_at, _ in batch
+                ],
+            )
+            num_updated += len(batch)
+
+        removed = set(known) - listed
+        if removed:
+            project = self._update_project(
+                project_id, project, [remove_image_record(image_id) for image_id in removed]
+            )
+            if project_id in self._published:
+                self._call_backend("remove_images", project_id, list(removed))
+
+        snapshot = self.get_snapshot()
+        if snapshot is not None and (num_updated or removed):
+            try:
+                with project.lock.read():
+                    snapshot.save_project(
+                        project_id, self.get_project_meta(project_id), project
+                    )
+            except Exception as e:
+                sly.logger.warning(
+                    "Failed to save the snapshot of project_id=%s: %s", project_id, e
+                )
+
+        sly.logger.info(
+            "Project with id=%s was synchronized in %.2f s: "
+            "%s of %s images were updated, %s were removed.",
+            project_id,
+            time.perf_counter() - start_time,
+            num_updated,
+            len(listed),
+            len(removed),
+        )
+
+    def sync_all(self) -> None:
+        """Synchronize all the cached projects with the server."""
+        for project_id in list(self.projects):
+            try:
+                self._loader.do(("sync", project_id), self.sync_project, project_id)
+            except Exception as e:
+                sly.logger.warning("Failed to synchronize project_id=%s: %s", project_id, e)
 
     def update_cached_annotation_info(
-        self, project_id: int, image_id: int, annotation_info: AnnotationInfo
+        self,
+        project_id: int,
+        image_id: int,
+        annotation_info: AnnotationInfo,
+        annotation: Optional[sly.Annotation] = None,
+        updated_at: Optional[str] = None,
+        dataset_id: Optional[int] = None,
+        job_id: Optional[int] = None,
     ) -> None:
-        """Update Annotation Info in the cache with the new Annotation Info.
+        """Update the cached label features and statistics of the image
+        with the new Annotation Info. The statistics of the dataset and the labeling job
+        of the image are updated together with the project statistics.
 
         :param project_id: The ID of the project.
         :type project_id: int
@@ -121,8 +729,59 @@ class Cache(metaclass=Singleton):
         :type image_id: int
         :param annotation_info: The new Annotation Info.
         :type annotation_info: AnnotationInfo
+        :param annotation: Already parsed annotation of the Annotation Info, if available.
+        :type annotation: Optional[sly.Annotation]
+        :param updated_at: The update time of the image (sly.ImageInfo.updated_at), which is
+            compared by the delta synchronization. The update time of the annotation differs
+            from it, so if the image one is not known, the image is synchronized once more.
+        :type updated_at: Optional[str]
+        :param dataset_id: The ID of the dataset of the image.
+        :type dataset_id: Optional[int]
+        :param job_id: The ID of the labeling job, in which the image was confirmed.
+        :type job_id: Optional[int]
         """
-        self.annotation_infos[project_id][image_id] = annotation_info  # type: ignore
+        if annotation is None:
+            annotation = self.get_annotation(
+                annotation_info,
+                self.get_project_meta(project_id),
+                self.get_project_info(project_id),
+            )
+
+        project = self._touch(project_id)
+        if project is None:
+            # The project will be loaded with the actual annotation on the next access.
+            sly.logger.debug(
+                "Project with id=%s is not cached, the update is skipped.", project_id
+            )
+            return
+
+        # The previous version of the image is subtracted before adding the new one.
+        features = extract_features(annotation)
+        project = self._update_project(
+            project_id,
+            project,
+            [set_image_record(image_id, features, updated_at, dataset_id, job_id)],
+        )
+        self._publish_images(project_id, project, [(image_id, features, updated_at)])
+        with project.lock.read():
+            dataset_id, job_id = project.image_scopes.get(image_id, (None, None))
+
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            try:
+                journal_is_full = snapshot.append(
+                    project_id, image_id, features, updated_at, dataset_id, job_id
+                )
+                if journal_is_full:
+                    with project.lock.read():
+                        snapshot.save_project(
+                            project_id, self.get_project_meta(project_id), project
+                        )
+            except Exception as e:
+                sly.logger.warning("Failed to save the update to the snapshot: %s", e)
+
+        self._evict()
+
         sly.logger.debug(
             "Annotation info for project_id=%s and image_id=%s was updated.",
             project_id,
@@ -130,7 +789,8 @@ class Cache(metaclass=Singleton):
         )
 
     def get_project_meta(self, project_id: int, force: bool = False) -> sly.ProjectMeta:
-        """Get the metadata of the project from the cache (or from the server if not cached).
+        """Get the metadata of the project from the cache (or from the cache backend
+        or the server if not cached).
 
         :param project_id: The ID of the project.
         :type project_id: int
@@ -140,14 +800,163 @@ class Cache(metaclass=Singleton):
         :rtype: sly.ProjectMeta
         """
         if project_id not in self.project_meta or force:
-            self.project_meta[project_id] = sly.ProjectMeta.from_json(  # type: ignore
-                g.spawn_api.project.get_meta(project_id)
-            )
-            sly.logger.debug("Project meta for project_id=%s was updated.", project_id)
+            meta_json = None
+            if not force:
+                meta_json = self._call_backend("get_meta", project_id)
+            if meta_json is None:
+                meta_json = g.spawn_api.project.get_meta(project_id)
+                self._call_backend("set_meta", project_id, meta_json)
+            self._set_project_meta(project_id, sly.ProjectMeta.from_json(meta_json))
         return self.project_meta[project_id]  # type: ignore
 
+    def refresh_project_meta(
+        self, project_id: int, stale_meta: sly.ProjectMeta
+    ) -> sly.ProjectMeta:
+        """Refetch the project meta, which turned out to be stale. Concurrent callers
+        with the same stale meta share one request, and the meta is not refetched at all,
+        if it was already replaced by another caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param stale_meta: The metadata of the project, which failed to parse the annotation.
+        :type stale_meta: sly.ProjectMeta
+        :return: The actual metadata of the project.
+        :rtype: sly.ProjectMeta
+        """
+
+        def refresh() -> sly.ProjectMeta:
+            project_meta = self.project_meta.get(project_id)
+            if project_meta is not None and project_meta is not stale_meta:
+                return project_meta
+            checked_at = self._meta_checked_at.get(project_id)
+            if checked_at is not None and (
+                time.monotonic() - checked_at < META_REFRESH_COOLDOWN
+            ):
+                return stale_meta
+            return self.get_project_meta(project_id, force=True)
+
+        return self._loader.do(("meta", project_id), refresh)
+
+    def get_compiled_meta(self, project_id: int) -> CompiledMeta:
+        """Get the lookup tables of the project meta. They are built once per version
+        of the meta and shared by all the events of the project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :return: The compiled metadata of the project.
+        :rtype: CompiledMeta
+        """
+        # The version is read before the meta, because the meta is replaced before
+        # its version, so the compiled meta is never labeled with a newer version.
+        version = self.meta_versions.get(project_id)
+        project_meta = self.get_project_meta(project_id)
+        compiled_meta = self.compiled_metas.get(project_id)
+        if compiled_meta is None or version is None or compiled_meta.version != version:
+            compiled_meta = CompiledMeta(project_meta, version)
+            self.compiled_metas[project_id] = compiled_meta
+            sly.logger.debug(
+                "Project meta for project_id=%s was compiled (%s classes).",
+                project_id,
+                compiled_meta.num_classes,
+            )
+        return compiled_meta
+
+    def _set_project_meta(self, project_id: int, project_meta: sly.ProjectMeta) -> None:
+        """Put the new project meta into the cache. If it differs from the cached one,
+        the statistics of the renamed, removed and retyped classes are updated in bulk
+        from the cached features, without downloading any annotations.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project_meta: The new metadata of the project.
+        :type project_meta: sly.ProjectMeta
+        """
+        version = get_meta_version(project_meta)
+        old_meta = self.project_meta.get(project_id)
+        old_version = self.meta_versions.get(project_id)
+        if old_meta is not None and version == old_version:
+            # Keep the same object, so the callers holding it know it is still actual.
+            self._meta_checked_at[project_id] = time.monotonic()
+            sly.logger.debug("Project meta for project_id=%s did not change.", project_id)
+            return
+
+        self.project_meta[project_id] = project_meta  # type: ignore
+        self.meta_versions[project_id] = version
+        self._meta_checked_at.pop(project_id, None)
+        sly.logger.debug(
+            "Project meta for project_id=%s was updated to version %s.",
+            project_id,
+            version,
+        )
+
+        project = self.projects.get(project_id)
+        if old_meta is None or project is None:
+            return
+        self._apply_meta_changes(project_id, project, old_meta, project_meta)
+
+    def _apply_meta_changes(
+        self,
+        project_id: int,
+        project: ProjectStats,
+        old_meta: sly.ProjectMeta,
+        new_meta: sly.ProjectMeta,
+    ) -> None:
+        """Update the statistics of the cached project for the changes of its meta:
+        the renamed classes are renamed, the labels of the removed classes and of the
+        classes with changed geometry type are dropped. Other classes are not touched.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        :param old_meta: The previous metadata of the project.
+        :type old_meta: sly.ProjectMeta
+        :param new_meta: The new metadata of the project.
+        :type new_meta: sly.ProjectMeta
+        """
+        renamed, dropped = diff_project_metas(old_meta, new_meta)
+        if not renamed and not dropped:
+            return
+
+        records = [drop_class_record(class_name) for class_name in dropped]
+        # Rename through temporary names, so the swapped names are not merged.
+        temporary = {old_name: f"\0{old_name}" for old_name in renamed}
+        for old_name, temporary_name in temporary.items():
+            records.append(rename_class_record(old_name, temporary_name))
+        for old_name, new_name in renamed.items():
+            records.append(rename_class_record(temporary[old_name], new_name))
+        project = self._update_project(project_id, project, records)
+
+        sly.logger.info(
+            "Project meta of project_id=%s was changed: renamed classes %s, dropped classes %s.",
+            project_id,
+            renamed,
+            dropped,
+        )
+
+        # The aggregates of the backend are kept by the class names, so the project is
+        # published again, unless another session is publishing it right now.
+        if project_id in self._published and self._call_backend(
+            "try_lock_project", project_id, g.cache_backend_lock_ttl
+        ):
+            try:
+                self._publish_project(project_id, project)
+            finally:
+                self._call_backend("unlock_project", project_id)
+
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            try:
+                with project.lock.read():
+                    snapshot.save_project(project_id, new_meta, project)
+            except Exception as e:
+                sly.logger.warning(
+                    "Failed to save the snapshot of project_id=%s: %s", project_id, e
+                )
+
     def get_project_info(self, project_id: int) -> sly.ProjectInfo:
-        """Get the information about the project from the cache (or from the server if not cached).
+        """Get the information about the project from the cache (or from the cache backend
+        or the server if not cached).
 
         :param project_id: The ID of the project.
         :type project_id: int
@@ -155,9 +964,18 @@ class Cache(metaclass=Singleton):
         :rtype: sly.ProjectInfo
         """
         if project_id not in self.project_info:
-            self.project_info[project_id] = g.spawn_api.project.get_info_by_id(  # type: ignore
-                project_id
-            )
+            info = self._call_backend("get_project_info", project_id)
+            project_info = None
+            if info is not None:
+                try:
+                    project_info = sly.ProjectInfo(**info)
+                except TypeError as e:
+                    # Saved by the session with another version of the SDK.
+                    sly.logger.debug("Cached project info is not compatible: %s", e)
+            if project_info is None:
+                project_info = g.spawn_api.project.get_info_by_id(project_id)
+                self._call_backend("set_project_info", project_id, project_info._asdict())
+            self.project_info[project_id] = project_info  # type: ignore
             sly.logger.debug("Project info for project_id=%s was obtained.", project_id)
         return self.project_info[project_id]  # type: ignore
 
@@ -168,7 +986,9 @@ class Cache(metaclass=Singleton):
         project_info: sly.ProjectInfo,
     ) -> sly.Annotation:
         """Get the annotation from the annotation information.
-        If can not retrieve the annotation from the given Project Meta, try to get it from the server.
+        If the annotation can not be parsed with the given Project Meta (e.g. it contains
+        a new class), the actual Project Meta is used. It is refetched from the server
+        only once for all the annotations, which were parsed with the same stale meta.
 
         :param annotation_info: The annotation information.
         :type annotation_info: AnnotationInfo
@@ -182,21 +1002,15 @@ class Cache(metaclass=Singleton):
         try:
             return sly.Annotation.from_json(annotation_info.annotation, project_meta)
         except Exception:
-            # In case of an error, try to get the new project meta and annotation info
-            # from the server and return the annotation.
-            project_meta = self.get_project_meta(project_info.id, force=True)
-            new_annotation_info = g.spawn_api.annotation.download(
-                annotation_info.image_id, force_metadata_for_links=False
-            )
-            sly.logger.info(
-                "Obtained new Project Meta and new Annotation Info for project_id=%s and image_id=%s",
-                project_info.id,
+            actual_meta = self.refresh_project_meta(project_info.id, project_meta)
+            if actual_meta is project_meta:
+                # The meta is actual, so the annotation itself can not be parsed.
+                raise
+            sly.logger.debug(
+                "Annotation of image_id=%s was parsed with the new Project Meta.",
                 annotation_info.image_id,
             )
-
-            return sly.Annotation.from_json(
-                new_annotation_info.annotation, project_meta
-            )
+            return sly.Annotation.from_json(annotation_info.annotation, actual_meta)
 
     @sly.timeit
     def get_annotations(
@@ -221,79 +1035,404 @@ class Cache(metaclass=Singleton):
             for annotation_info in annotation_infos
         ]
 
-    def get_issued_id(self, issue_name: str) -> int:
-        """Get the issue ID from the issue name.
+    def get_issued_id(self, issue_name: str, team_id: Optional[int] = None) -> int:
+        """Get the issue ID from the issue name. The issue is looked up (or created) once
+        for all concurrent callers, so the same issue is never created twice.
 
         :param issue_name: The name of the issue.
         :type issue_name: str
+        :param team_id: The ID of the team, the team of the app session if not set.
+        :type team_id: Optional[int]
         :return: The issue ID.
         :rtype: int
         """
-        if issue_name not in self.issues:
-            self.issues[issue_name] = get_or_create_issue(issue_name)
-        return self.issues[issue_name]
+        if team_id is None:
+            team_id = g.spawn_team_id
+        issue_id = self.issues[team_id].get(issue_name)
+        if issue_id is not None:
+            return issue_id
+        return self._loader.do(
+            ("issue", team_id, issue_name), self._resolve_issue, team_id, issue_name
+        )
 
-    @sly.timeit
-    def get_labels_by_class(self, project_id: int, class_name: str) -> List[sly.Label]:
-        """Get the labels by class.
+    def _resolve_issue(self, team_id: int, issue_name: str) -> int:
+        """Find the issue in the index of the team (restored from the on-disk copy),
+        then in the cache backend, then on the server, filtering by the name. If the server
+        can not filter the issues, all the issues of the team are listed once and the index
+        is used afterwards. The issue is created, if it is not found.
+
+        :param team_id: The ID of the team.
+        :type team_id: int
+        :param issue_name: The name of the issue.
+        :type issue_name: str
+        :return: The issue ID.
+        :rtype: int
+        """
+        team_issues = self.issues[team_id]
+        snapshot = self.get_snapshot()
+        if snapshot is not None and team_id not in self._restored_issue_teams:
+            try:
+                team_issues.update(snapshot.load_issues(team_id))
+            except Exception as e:
+                sly.logger.warning("Failed to load the issues from the snapshot: %s", e)
+            self._restored_issue_teams.add(team_id)
+        issue_id = team_issues.get(issue_name)
+        if issue_id is None:
+            issue_id = self._call_backend("get_issue_id", team_id, issue_name)
+            if issue_id is not None:
+                team_issues[issue_name] = issue_id
+        if issue_id is not None:
+            return issue_id
+
+        new_issues = {}
+        if team_id not in self._listed_issue_teams:
+            try:
+                issue_id = find_issue(team_id, issue_name)
+            except Exception as e:
+                sly.logger.debug("Failed to filter the issues on the server: %s", e)
+                new_issues = list_issues(team_id)
+                self._listed_issue_teams.add(team_id)
+                issue_id = new_issues.get(issue_name)
+        if issue_id is None:
+            issue_id = create_issue(team_id, issue_name)
+        new_issues[issue_name] = issue_id
+        team_issues.update(new_issues)
+        self._call_backend("set_issue_id", team_id, issue_name, issue_id)
+
+        if snapshot is not None:
+            try:
+                snapshot.save_issues(team_id, new_issues)
+            except Exception as e:
+                sly.logger.warning("Failed to save the issues to the snapshot: %s", e)
+        return issue_id
+
+    def forget_issue(self, issue_name: str, team_id: Optional[int] = None) -> None:
+        """Forget the issue ID, which turned out to be invalid (e.g. the issue was deleted),
+        so it is looked up again on the next access.
+
+        :param issue_name: The name of the issue.
+        :type issue_name: str
+        :param team_id: The ID of the team, the team of the app session if not set.
+        :type team_id: Optional[int]
+        """
+        if team_id is None:
+            team_id = g.spawn_team_id
+        self.issues[team_id].pop(issue_name, None)
+        self._listed_issue_teams.discard(team_id)
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            try:
+                snapshot.drop_issue(team_id, issue_name)
+            except Exception as e:
+                sly.logger.warning("Failed to drop the issue from the snapshot: %s", e)
+        self._call_backend("delete_issue_id", team_id, issue_name)
+
+    def get_project_stats(self, project_id: int) -> ProjectStats:
+        """Get the label features and statistics of the project.
+        If the project is not cached (or was evicted), it is loaded first.
+        The lock of the project must be held while reading them.
 
         :param project_id: The ID of the project.
         :type project_id: int
-        :param class_name: The name of the class.
-        :type class_name: str
-        :return: The labels.
-        :rtype: List[sly.Label]
+        :return: The statistics of the project.
+        :rtype: ProjectStats
         """
-        annotation_infos = self.annotation_infos[project_id]
-        project_meta = self.get_project_meta(project_id)
+        project = self._touch(project_id)
+        while project is None:
+            self.cache_annotation_infos(project_id)
+            project = self._touch(project_id)
+        return project
 
-        annotations = self.get_annotations(
-            list(annotation_infos.values()), project_meta, self.project_info[project_id]  # type: ignore
-        )
+    def _update_project(
+        self, project_id: int, project: ProjectStats, records: List[Dict[str, Any]]
+    ) -> ProjectStats:
+        """Apply the changes to the statistics of the project. If the statistics are shared,
+        the changes are also appended to the shared log, so the other processes receive them.
 
-        labels = []
-        for annotation in annotations:
-            for label in annotation.labels:
-                if label.obj_class.name == class_name:
-                    labels.append(label)
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        :param records: The changes, created by the *_record functions of src.shared.
+        :type records: List[Dict[str, Any]]
+        :return: The changed statistics of the project (loaded again, if the given ones
+            were outdated by the other processes).
+        :rtype: ProjectStats
+        """
+        shared = self.get_shared_stats()
+        # The meta is written to the shared base, if the log is merged into it.
+        project_meta = self.get_project_meta(project_id) if shared is not None else None
+        while True:
+            with project.lock.write():
+                if shared is None:
+                    for record in records:
+                        apply_record(project, record)
+                    return project
+                if shared.append(project_id, project, records, project_meta):
+                    return project
+            project = self._reload_project(project_id, project)
 
-        return labels
+    def _refresh_project(self, project_id: int, project: ProjectStats) -> ProjectStats:
+        """Receive the changes of the statistics made by the other processes of the app.
+        Does nothing if the statistics are not shared.
 
-    @sly.timeit
-    def get_annotations_for_whole_project(
-        self, project_id: int
-    ) -> List[sly.Annotation]:
-        """Get the annotations for the whole project.
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        :return: The up to date statistics of the project.
+        :rtype: ProjectStats
+        """
+        shared = self.get_shared_stats()
+        if shared is None or shared.is_current(project_id):
+            return project
+        with project.lock.write():
+            if shared.refresh(project_id, project):
+                return project
+        return self._reload_project(project_id, project)
+
+    def _reload_project(self, project_id: int, outdated: ProjectStats) -> ProjectStats:
+        """Drop the outdated replica of the shared statistics and load the project again.
 
         :param project_id: The ID of the project.
         :type project_id: int
-        :return: The annotations.
-        :rtype: List[sly.Annotation]
+        :param outdated: The outdated statistics of the project.
+        :type outdated: ProjectStats
+        :return: The statistics of the project.
+        :rtype: ProjectStats
         """
-        annotation_infos = self.annotation_infos[project_id]
-        project_meta = self.get_project_meta(project_id)
+        with self._projects_lock:
+            if self.projects.get(project_id) is outdated:
+                del self.projects[project_id]
+                sly.logger.debug(
+                    "Shared statistics of project_id=%s are outdated, reloading.", project_id
+                )
+        return self.get_project_stats(project_id)
 
-        return self.get_annotations(
-            list(annotation_infos.values()), project_meta, self.project_info[project_id]  # type: ignore
-        )
+    def get_stats_snapshot(
+        self,
+        project_id: int,
+        compiled_meta: CompiledMeta,
+        class_ids: Iterable[int],
+        dataset_id: Optional[int] = None,
+        job_id: Optional[int] = None,
+    ) -> StatsSnapshot:
+        """Get the snapshot of the statistics of the project for the given classes.
+        Depending on the scope setting, the statistics of the labeling job or the dataset
+        are used, falling back to the parent scope, if the class has too few samples.
+        If the project is published to the cache backend, the project area statistics
+        are taken from the aggregates shared by all the sessions of the app.
 
-    @sly.timeit
-    def group_annotations_by_class(
-        self, project_id: int
-    ) -> Dict[str, List[sly.Annotation]]:
-        """Group the annotations by class.
-        Return the dictionary with the class name as the key and the list of annotations as the value.
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param compiled_meta: The compiled metadata of the project.
+        :type compiled_meta: CompiledMeta
+        :param class_ids: The IDs of the classes in the compiled meta.
+        :type class_ids: Iterable[int]
+        :param dataset_id: The ID of the dataset of the image.
+        :type dataset_id: Optional[int]
+        :param job_id: The ID of the labeling job of the image.
+        :type job_id: Optional[int]
+        :return: The snapshot of the statistics.
+        :rtype: StatsSnapshot
+        """
+        scopes = []
+        if g.stats_scope == JOB_SCOPE and job_id is not None:
+            scopes.append((JOB_SCOPE, job_id))
+        if g.stats_scope in (JOB_SCOPE, DATASET_SCOPE) and dataset_id is not None:
+            scopes.append((DATASET_SCOPE, dataset_id))
+
+        project = self._refresh_project(project_id, self.get_project_stats(project_id))
+        with project.lock.read():
+            snapshot = project.snapshot(
+                compiled_meta, class_ids, scopes, g.stats_scope_min_samples
+            )
+
+        if project_id in self._published:
+            # The project aggregates include the images confirmed in all the sessions.
+            class_ids = [
+                class_id
+                for class_id in set(class_ids)
+                if 0 <= class_id < compiled_meta.num_classes
+            ]
+            class_stats = self._call_backend(
+                "get_class_stats",
+                project_id,
+                [compiled_meta.class_names[class_id] for class_id in class_ids],
+            )
+            if class_stats:
+                snapshot.use_shared_area_stats(
+                    {
+                        class_id: class_stats[compiled_meta.class_names[class_id]]
+                        for class_id in class_ids
+                        if compiled_meta.class_names[class_id] in class_stats
+                    }
+                )
+        return snapshot
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the hit, miss and eviction counters and the memory usage of the cache.
+
+        :return: The metrics of the cache.
+        :rtype: Dict[str, Any]
+        """
+        with self._projects_lock:
+            projects = list(self.projects.items())
+        shared = self.get_shared_stats()
+        backend = self.get_backend()
+        return {
+            "hits": Cache.hits,
+            "misses": Cache.misses,
+            "evictions": Cache.evictions,
+            "projects": len(projects),
+            "nbytes": sum(project.nbytes for _, project in projects),
+            "max_projects": g.cache_max_projects,
+            "max_bytes": g.cache_max_bytes,
+            "bitmap_memo_hits": self.bitmap_memo.hits,
+            "bitmap_memo_misses": self.bitmap_memo.misses,
+            "shared": shared.metrics() if shared is not None else None,
+            "backend": backend.metrics() if backend is not None else None,
+        }
+
+    def _touch(self, project_id: int) -> Optional[ProjectStats]:
+        """Get the cached project and mark it as the most recently used.
 
         :param project_id: The ID of the project.
         :type project_id: int
-        :return: The grouped annotations.
-        :rtype: Dict[str, List[sly.Annotation]]
+        :return: The statistics of the project, None if the project is not cached.
+        :rtype: Optional[ProjectStats]
         """
-        annotations = self.get_annotations_for_whole_project(project_id)
+        with self._projects_lock:
+            project = self.projects.get(project_id)
+            if project is not None:
+                self.projects.move_to_end(project_id)
+                Cache.hits += 1
+            return project
 
-        grouped_annotations = defaultdict(list)
-        for annotation in annotations:
-            for label in annotation.labels:
-                grouped_annotations[label.obj_class.name].append(annotation)
+    def _evict(self) -> None:
+        """Evict the least recently used projects, while the cache exceeds the budget
+        (in number of projects and in bytes, zero means unlimited).
+        The most recently used project is never evicted."""
+        shared = self.get_shared_stats()
+        with self._projects_lock:
+            total_bytes = sum(project.nbytes for project in self.projects.values())
+            while len(self.projects) > 1:
+                over_projects = 0 < g.cache_max_projects < len(self.projects)
+                over_bytes = 0 < g.cache_max_bytes < total_bytes
+                if not (over_projects or over_bytes):
+                    break
 
-        return grouped_annotations
+                project_id, project = self.projects.popitem(last=False)
+                self.project_meta.pop(project_id, None)
+                self.meta_versions.pop(project_id, None)
+                self.compiled_metas.pop(project_id, None)
+                self.project_info.pop(project_id, None)
+                if shared is not None:
+                    shared.forget(project_id)
+                self._published.discard(project_id)
+                total_bytes -= project.nbytes
+                Cache.evictions += 1
+                sly.logger.info(
+                    "Project with id=%s (%s bytes) was evicted from the cache.",
+                    project_id,
+                    project.nbytes,
+                )
+
+    def get_snapshot(self) -> Optional[CacheSnapshot]:
+        """Get the persistent on-disk copy of the cache.
+
+        :return: The snapshot, None if the persistence is disabled or not available.
+        :rtype: Optional[CacheSnapshot]
+        """
+        if not g.persist_cache:
+            return None
+        with self._snapshot_lock:
+            if Cache._snapshot is None:
+                try:
+                    Cache._snapshot = CacheSnapshot(
+                        os.path.join(g.cache_dir, "cache.db"),
+                        max_journal_entries=g.cache_journal_max_entries,
+                    )
+                except Exception as e:
+                    sly.logger.warning("Failed to open the cache snapshot: %s", e)
+                    g.persist_cache = False
+                    return None
+        return Cache._snapshot
+
+    def get_shared_stats(self) -> Optional[SharedStats]:
+        """Get the statistics shared with the other processes of the app
+        (e.g. the workers of uvicorn).
+
+        :return: The shared statistics, None if the sharing is disabled or not available.
+        :rtype: Optional[SharedStats]
+        """
+        if not g.shared_stats:
+            return None
+        with self._snapshot_lock:
+            if Cache._shared is None:
+                try:
+                    Cache._shared = SharedStats(
+                        g.shared_stats_dir,
+                        max_log_bytes=g.shared_stats_max_log_bytes,
+                        half_life=g.decay_half_life_images,
+                    )
+                except Exception as e:
+                    sly.logger.warning("Failed to open the shared statistics: %s", e)
+                    g.shared_stats = False
+                    return None
+        return Cache._shared
+
+    def get_backend(self) -> Optional[CacheBackend]:
+        """Get the cache backend shared with the other sessions of the app.
+
+        :return: The backend, None if it is disabled or not available.
+        :rtype: Optional[CacheBackend]
+        """
+        if not g.cache_backend:
+            return None
+        with self._snapshot_lock:
+            if Cache._backend is None:
+                try:
+                    Cache._backend = create_backend(
+                        g.cache_backend, g.cache_backend_url, g.cache_backend_prefix
+                    )
+                except Exception as e:
+                    sly.logger.warning("Failed to create the cache backend: %s", e)
+                    g.cache_backend = ""
+                    return None
+        return Cache._backend
+
+    def _call_backend(self, method: str, *args: Any) -> Any:
+        """Call the method of the cache backend. The backend is optional, so its errors
+        are logged and the cache falls back to the local data and the server.
+
+        :param method: The name of the method of the backend.
+        :type method: str
+        :return: The result of the method, None if the backend is disabled or failed.
+        :rtype: Any
+        """
+        backend = self.get_backend()
+        if backend is None:
+            return None
+        try:
+            return getattr(backend, method)(*args)
+        except Exception as e:
+            sly.logger.warning("Cache backend failed to %s: %s", method, e)
+            return None
+
+    @sly.timeit
+    def restore(self) -> None:
+        """Restore the saved projects from the on-disk copy of the cache (the most recently
+        saved first), until the memory budget of the cache is reached."""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return
+        for project_id in snapshot.project_ids():
+            if 0 < g.cache_max_projects <= len(self.projects):
+                break
+            if 0 < g.cache_max_bytes <= self.metrics()["nbytes"]:
+                break
+            try:
+                self.cache_annotation_infos(project_id)
+            except Exception as e:
+                sly.logger.warning("Failed to restore project_id=%s: %s", project_id, e)
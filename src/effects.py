@@ -0,0 +1,243 @@
+import itertools
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+import supervisely as sly
+
+import src.globals as g
+
+# Priorities of the side effects: the user-visible ones (notification, rejection)
+# are run before the issue comments and subissues.
+HIGH_PRIORITY = 0
+LOW_PRIORITY = 1
+
+
+class RateLimiter:
+    """Token bucket, which limits the rate of the requests to one endpoint.
+
+    :param rate: Number of requests per second, zero means unlimited.
+    :type rate: float
+    :param burst: Number of requests, which can be made at once.
+    :type burst: int
+
+    Methods:
+    - acquire: Wait until the request can be made.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until the request can be made and take one token."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+class EffectDispatcher:
+    """Runs the side effects of the checks (notifications, rejections, issue comments and
+    subissues) in a pool of worker threads, so the event is not blocked by the serial
+    round trips. The effects with higher priority are started first. The requests to each
+    endpoint are rate limited and the failed requests are retried with exponential backoff.
+
+    :param max_workers: Number of worker threads, i.e. maximum number of concurrent requests.
+    :type max_workers: int
+    :param rate_limits: Endpoint name -> maximum number of requests per second.
+    :type rate_limits: Dict[str, float]
+    :param default_rate_limit: Rate limit of the endpoints not listed in the rate limits,
+        zero means unlimited.
+    :type default_rate_limit: float
+    :param max_retries: Number of retries of the failed request.
+    :type max_retries: int
+    :param backoff: Delay (in seconds) before the first retry, doubled for each next retry.
+    :type backoff: float
+
+    Methods:
+    - submit: Schedule the side effect.
+    - metrics: Get the counters of the side effects.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        rate_limits: Dict[str, float],
+        default_rate_limit: float = 0.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+    ):
+        self._num_workers = max(1, max_workers)
+        self._rate_limits = rate_limits
+        self._default_rate_limit = default_rate_limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        # (priority, sequence number, endpoint, function, args, kwargs, future)
+        self._queue: "queue.PriorityQueue[Tuple]" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._workers = []
+        self._lock = threading.Lock()
+
+        self._submitted = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._retried = 0
+
+    def submit(
+        self,
+        endpoint: str,
+        func: Callable[..., Any],
+        *args,
+        priority: int = LOW_PRIORITY,
+        **kwargs,
+    ) -> Future:
+        """Schedule the side effect.
+
+        :param endpoint: Name of the endpoint, which is used for the rate limit.
+        :type endpoint: str
+        :param func: The function making the request.
+        :type func: Callable[..., Any]
+        :param priority: Priority of the effect, the lower value is started first.
+        :type priority: int
+        :return: The future with the result of the function.
+        :rtype: Future
+        """
+        self._start()
+        future: Future = Future()
+        with self._lock:
+            self._submitted += 1
+        self._queue.put(
+            (priority, next(self._sequence), endpoint, func, args, kwargs, future)
+        )
+        return future
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the counters of the side effects.
+
+        :return: The metrics: number of waiting, submitted, succeeded, failed and retried effects.
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "workers": self._num_workers,
+                "submitted": self._submitted,
+                "succeeded": self._succeeded,
+                "failed": self._failed,
+                "retried": self._retried,
+            }
+
+    def _start(self) -> None:
+        """Start the worker threads, if they are not started yet."""
+        with self._lock:
+            if self._workers:
+                return
+            for idx in range(self._num_workers):
+                worker = threading.Thread(
+                    target=self._work, name=f"effect-worker-{idx}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _limiter(self, endpoint: str) -> RateLimiter:
+        """Get the rate limiter of the endpoint.
+
+        :param endpoint: Name of the endpoint.
+        :type endpoint: str
+        :return: The rate limiter.
+        :rtype: RateLimiter
+        """
+        with self._lock:
+            limiter = self._limiters.get(endpoint)
+            if limiter is None:
+                rate = self._rate_limits.get(endpoint, self._default_rate_limit)
+                limiter = self._limiters[endpoint] = RateLimiter(rate, burst=max(1, int(rate)))
+            return limiter
+
+    def _work(self) -> None:
+        """Main loop of the worker thread."""
+        while True:
+            _, _, endpoint, func, args, kwargs, future = self._queue.get()
+            try:
+                result = self._call(endpoint, func, args, kwargs)
+            except Exception as e:
+                with self._lock:
+                    self._failed += 1
+                sly.logger.warning("Side effect %s failed: %s", endpoint, e)
+                future.set_exception(e)
+            else:
+                with self._lock:
+                    self._succeeded += 1
+                future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    def _call(
+        self,
+        endpoint: str,
+        func: Callable[..., Any],
+        args: tuple,
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        """Make the request, retrying it with exponential backoff and jitter.
+
+        :param endpoint: Name of the endpoint.
+        :type endpoint: str
+        :param func: The function making the request.
+        :type func: Callable[..., Any]
+        :param args: Positional arguments of the function.
+        :type args: tuple
+        :param kwargs: Keyword arguments of the function.
+        :type kwargs: Dict[str, Any]
+        :return: The result of the function.
+        :rtype: Any
+        """
+        limiter = self._limiter(endpoint)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff * 2**attempt * (0.5 + random.random())
+                attempt += 1
+                with self._lock:
+                    self._retried += 1
+                sly.logger.debug(
+                    "Side effect %s failed (%s), retry %s in %.2f s.",
+                    endpoint,
+                    e,
+                    attempt,
+                    delay,
+                )
+                time.sleep(delay)
+
+
+dispatcher = EffectDispatcher(
+    max_workers=g.effects_max_workers,
+    rate_limits=g.effects_rate_limits,
+    default_rate_limit=g.effects_default_rate_limit,
+    max_retries=g.effects_max_retries,
+    backoff=g.effects_backoff,
+)
@@ -0,0 +1,227 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import supervisely as sly
+
+
+class EventQueue:
+    """Bounded in-process queue of events, which are processed by a pool of worker threads.
+    The webhook handler only puts the event into the queue and returns immediately.
+
+    Backpressure policy: when the queue is full, the incoming event is dropped (the image
+    is not checked), the drop is counted and a warning is logged. Already queued events
+    are never discarded, so the events are processed in the order they arrived.
+
+    Coalescing: if the key function is given, a new event with the same key as a waiting
+    event replaces it (the superseded event is dropped and counted). The event is ready
+    only after no newer event with its key arrived for the coalescing window, so quick
+    re-submissions are checked once. The workers take only the ready events (the earliest
+    ready first) and never wait for a window while another event is ready. The events with
+    the same key are never processed concurrently: an event, which is ready while the
+    previous event with its key is processed, waits until that event is done.
+
+    :param handler: Function, which processes one event.
+    :type handler: Callable[[Any], None]
+    :param max_size: Maximum number of events waiting in the queue.
+    :type max_size: int
+    :param num_workers: Number of worker threads.
+    :type num_workers: int
+    :param key: Function, which returns the coalescing key of the event.
+        If not set, the events are not coalesced.
+    :type key: Optional[Callable[[Any], Hashable]]
+    :param coalesce_window: Time (in seconds) without newer events with the same key,
+        after which the event is processed.
+    :type coalesce_window: float
+
+    Properties:
+    - depth: Number of events waiting in the queue.
+
+    Methods:
+    - start: Start the worker threads.
+    - put: Put the event into the queue.
+    - metrics: Get the backpressure metrics of the queue.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], None],
+        max_size: int,
+        num_workers: int,
+        key: Optional[Callable[[Any], Hashable]] = None,
+        coalesce_window: float = 0.0,
+    ):
+        self._handler = handler
+        self._num_workers = max(1, num_workers)
+        self._key = key
+        self._coalesce_window = coalesce_window
+        self._max_size = max_size
+        # key -> [enqueue time, the latest event, time of the latest event]
+        self._pending: Dict[Hashable, List[Any]] = {}
+        # Heap of (time when the window ends, sequence number, key) of the pending keys.
+        # The time is updated lazily: a superseded key is pushed back, when it is on top.
+        self._ready: List[Tuple[float, int, Hashable]] = []
+        self._sequence = itertools.count()
+        # Keys of the events being processed and the ready keys waiting for them.
+        self._in_flight: Set[Hashable] = set()
+        self._blocked: Dict[Hashable, Tuple[float, int, Hashable]] = {}
+        self._workers = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+        self._enqueued = 0
+        self._processed = 0
+        self._failed = 0
+        self._dropped = 0
+        self._superseded = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait: Optional[float] = None
+
+    @property
+    def depth(self) -> int:
+        """Number of events waiting in the queue.
+
+        :return: The number of events.
+        :rtype: int
+        """
+        return len(self._pending)
+
+    def start(self) -> None:
+        """Start the worker threads, if they are not started yet."""
+        with self._lock:
+            if self._workers:
+                return
+            for idx in range(self._num_workers):
+                worker = threading.Thread(
+                    target=self._work, name=f"event-worker-{idx}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+        sly.logger.debug("Started %s event workers.", self._num_workers)
+
+    def put(self, event: Any) -> bool:
+        """Put the event into the queue without blocking.
+
+        :param event: The event to process.
+        :type event: Any
+        :return: True if the event was queued, False if it was dropped because the queue is full.
+        :rtype: bool
+        """
+        self.start()
+        key = self._key(event) if self._key is not None else object()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                # The waiting event is superseded by the new one.
+                entry[1] = event
+                entry[2] = now
+                self._superseded += 1
+                sly.logger.debug("Waiting event with key %s was superseded.", key)
+                return True
+            if 0 < self._max_size <= len(self._pending):
+                self._dropped += 1
+                sly.logger.warning(
+                    "Event queue is full (%s events), the event was dropped.", self.depth
+                )
+                return False
+            self._pending[key] = [now, event, now]
+            heapq.heappush(self._ready, (now + self._coalesce_window, next(self._sequence), key))
+            self._enqueued += 1
+            self._changed.notify()
+        sly.logger.debug("Event was queued, queue depth: %s.", self.depth)
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the backpressure metrics of the queue.
+
+        :return: The metrics: depth, number of enqueued, processed, failed, dropped and
+            superseded events, average, maximum and last wait time in the queue (in seconds).
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            started = self._processed + self._failed
+            return {
+                "depth": self.depth,
+                "max_size": self._max_size,
+                "workers": self._num_workers,
+                "enqueued": self._enqueued,
+                "processed": self._processed,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "superseded": self._superseded,
+                "avg_wait": self._total_wait / started if started else 0.0,
+                "max_wait": self._max_wait,
+                "last_wait": self._last_wait,
+            }
+
+    def _work(self) -> None:
+        """Main loop of the worker thread."""
+        while True:
+            key, event, enqueued_at = self._take()
+            wait_time = time.monotonic() - enqueued_at
+            try:
+                self._handler(event)
+                succeeded = True
+            except Exception as e:
+                succeeded = False
+                sly.logger.warning("Failed to process the event: %s", e, exc_info=True)
+
+            with self._lock:
+                self._release(key)
+                if succeeded:
+                    self._processed += 1
+                else:
+                    self._failed += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+                self._last_wait = wait_time
+
+    def _take(self) -> Tuple[Hashable, Any, float]:
+        """Wait for the earliest ready event, whose key is not processed by another worker,
+        take it and mark its key as processed.
+
+        :return: The key, the latest event with the key and the time, when the first of the
+            coalesced events was queued.
+        :rtype: Tuple[Hashable, Any, float]
+        """
+        with self._lock:
+            while True:
+                if not self._ready:
+                    self._changed.wait()
+                    continue
+                ready_at, sequence, key = self._ready[0]
+                enqueued_at, event, last_put = self._pending[key]
+                if last_put + self._coalesce_window > ready_at:
+                    # The event was superseded, its window ends later.
+                    heapq.heapreplace(
+                        self._ready, (last_put + self._coalesce_window, sequence, key)
+                    )
+                    continue
+                remaining = ready_at - time.monotonic()
+                if remaining > 0:
+                    self._changed.wait(remaining)
+                    continue
+                heapq.heappop(self._ready)
+                if key in self._in_flight:
+                    self._blocked[key] = (ready_at, sequence, key)
+                    continue
+                del self._pending[key]
+                self._in_flight.add(key)
+                return key, event, enqueued_at
+
+    def _release(self, key: Hashable) -> None:
+        """Unmark the processed key and return its blocked event to the ready events.
+        Must be called under the lock.
+
+        :param key: The key of the processed event.
+        :type key: Hashable
+        """
+        self._in_flight.discard(key)
+        blocked = self._blocked.pop(key, None)
+        if blocked is not None:
+            heapq.heappush(self._ready, blocked)
+            self._changed.notify()
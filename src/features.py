@@ -0,0 +1,404 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from math import floor
+from typing import (
+    Any,
+    Container,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+import supervisely as sly
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+class LabelFeatures(NamedTuple):
+    """Compact features of one label, which are enough to calculate all statistics
+    of the project without keeping the annotation itself."""
+
+    class_name: str
+    area: float
+    top: int
+    left: int
+    bottom: int
+    right: int
+    geometry_type: str
+    label_id: int
+
+
+def extract_features(annotation: sly.Annotation) -> List[LabelFeatures]:
+    """Extracts the features of each label of the annotation.
+
+    :param annotation: The annotation to extract the features from.
+    :type annotation: sly.Annotation
+    :return: The features of the labels.
+    :rtype: List[LabelFeatures]
+    """
+    features = []
+    for label in annotation.labels:
+        bbox: sly.Rectangle = label.geometry.to_bbox()
+        features.append(
+            LabelFeatures(
+                class_name=label.obj_class.name,
+                area=float(label.area),
+                top=bbox.top,
+                left=bbox.left,
+                bottom=bbox.bottom,
+                right=bbox.right,
+                geometry_type=label.geometry.geometry_name(),
+                label_id=label.sly_id if label.sly_id is not None else -1,
+            )
+        )
+    return features
+
+
+# Geometry types, which are supported by the fast JSON extractor.
+JSON_GEOMETRY_TYPES = ("rectangle", "polygon", "point", "bitmap")
+
+
+class BitmapMemo:
+    """Bounded memo of the decoded bitmaps: content hash of the encoded mask ->
+    (area, top, left, bottom, right) of the mask relative to its origin. Decoding of the
+    mask (base64, zlib and PNG) is much slower than hashing it, so the masks, which are
+    repeated or unchanged since the previous download, are never decoded twice.
+    The least recently used entries are dropped, when the memo is full.
+
+    :param max_size: Maximum number of the entries, zero disables the memo.
+    :type max_size: int
+
+    Properties:
+    - hits: Number of the masks found in the memo.
+    - misses: Number of the decoded masks.
+
+    Methods:
+    - get: Get the area and the bounding box of the encoded mask.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # content hash -> (area, top, left, bottom, right)
+        self._entries: "OrderedDict[bytes, Tuple[int, int, int, int, int]]" = OrderedDict()
+
+    def get(self, data: str) -> Tuple[int, int, int, int, int]:
+        """Get the area and the bounding box of the encoded mask, decoding it only
+        if it is not in the memo.
+
+        :param data: The encoded mask from the JSON of the bitmap.
+        :type data: str
+        :return: The area and the bounding box (top, left, bottom, right) of the mask
+            relative to its origin.
+        :rtype: Tuple[int, int, int, int, int]
+        """
+        key = hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = _decode_bitmap(data)
+        with self._lock:
+            self.misses += 1
+            if self.max_size > 0:
+                self._entries[key] = value
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+
+
+def _decode_bitmap(data: str) -> Tuple[int, int, int, int, int]:
+    """Decode the mask and compute its area and bounding box with vectorized operations
+    over the whole mask.
+
+    :param data: The encoded mask from the JSON of the bitmap.
+    :type data: str
+    :return: The area and the bounding box (top, left, bottom, right) of the mask
+        relative to its origin, the area is zero for the empty mask.
+    :rtype: Tuple[int, int, int, int, int]
+    """
+    mask = sly.Bitmap.base64_2_data(data)
+    area = int(np.count_nonzero(mask))
+    if area == 0:
+        return 0, 0, 0, 0, 0
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    return area, int(rows[0]), int(cols[0]), int(rows[-1]), int(cols[-1])
+
+
+def extract_features_from_json(
+    annotation_json: Union[Dict[str, Any], str, bytes],
+    class_names: Optional[Container[str]] = None,
+    bitmap_memo: Optional[BitmapMemo] = None,
+) -> Optional[List[LabelFeatures]]:
+    """Extracts the features of each label directly from the JSON of the annotation,
+    without building sly.Annotation. Areas and bounding boxes are computed the same way
+    as in the SDK (the coordinates are floored, polygon areas are computed by the shoelace
+    formula with the interior holes subtracted, bitmaps are decoded through the memo),
+    but only for rectangles, polygons, points and bitmaps, which lie inside the image.
+
+    :param annotation_json: The JSON of the annotation (parsed or raw).
+    :type annotation_json: Union[Dict[str, Any], str, bytes]
+    :param class_names: The names of the classes of the project meta. If set, the labels
+        of the unknown classes are not extracted.
+    :type class_names: Optional[Container[str]]
+    :param bitmap_memo: The memo of the decoded bitmaps, if not set, each bitmap is decoded.
+    :type bitmap_memo: Optional[BitmapMemo]
+    :return: The features of the labels, None if the annotation has labels, which can not
+        be extracted this way (and sly.Annotation should be used instead).
+    :rtype: Optional[List[LabelFeatures]]
+    """
+    if isinstance(annotation_json, (str, bytes)):
+        annotation_json = _loads(annotation_json)
+
+    size = annotation_json.get("size", {})
+    height, width = size.get("height", 0), size.get("width", 0)
+
+    features = []
+    for obj in annotation_json.get("objects", []):
+        class_name = obj.get("classTitle")
+        geometry_type = obj.get("geometryType")
+        if geometry_type not in JSON_GEOMETRY_TYPES:
+            return None
+        if class_names is not None and class_name not in class_names:
+            return None
+
+        if geometry_type == "bitmap":
+            bitmap = obj["bitmap"]
+            if bitmap_memo is not None:
+                area, top, left, bottom, right = bitmap_memo.get(bitmap["data"])
+            else:
+                area, top, left, bottom, right = _decode_bitmap(bitmap["data"])
+            if area == 0:
+                # The SDK does not allow empty bitmaps.
+                return None
+            origin_x, origin_y = bitmap["origin"]
+            top, bottom = top + origin_y, bottom + origin_y
+            left, right = left + origin_x, right + origin_x
+        else:
+            points = obj["points"]
+            exterior = points["exterior"]
+            xs = [floor(point[0]) for point in exterior]
+            ys = [floor(point[1]) for point in exterior]
+            if not xs:
+                return None
+            top, left, bottom, right = min(ys), min(xs), max(ys), max(xs)
+
+        if top < 0 or left < 0 or bottom >= height or right >= width:
+            # The SDK crops such labels to the image, which changes their areas.
+            return None
+
+        if geometry_type == "bitmap":
+            area = float(area)
+        elif geometry_type == "rectangle":
+            area = float((bottom - top + 1) * (right - left + 1))
+        elif geometry_type == "polygon":
+            area = _shoelace(xs, ys)
+            for hole in points.get("interior", []):
+                if not hole:
+                    continue
+                area -= _shoelace(
+                    [floor(point[0]) for point in hole],
+                    [floor(point[1]) for point in hole],
+                )
+        else:
+            area = 0.0
+
+        label_id = obj.get("id")
+        features.append(
+            LabelFeatures(
+                class_name=class_name,
+                area=area,
+                top=top,
+                left=left,
+                bottom=bottom,
+                right=right,
+                geometry_type=geometry_type,
+                label_id=label_id if label_id is not None else -1,
+            )
+        )
+    return features
+
+
+def _shoelace(xs: List[int], ys: List[int]) -> float:
+    """Computes the area of the polygon by the shoelace formula.
+
+    :param xs: The X coordinates of the vertices.
+    :type xs: List[int]
+    :param ys: The Y coordinates of the vertices.
+    :type ys: List[int]
+    :return: The area of the polygon.
+    :rtype: float
+    """
+    doubled_area = 0
+    prev_x, prev_y = xs[-1], ys[-1]
+    for x, y in zip(xs, ys):
+        doubled_area += prev_x * y - x * prev_y
+        prev_x, prev_y = x, y
+    return abs(doubled_area) / 2
+
+
+# Dtypes of the packed features, in the order of the fields of LabelFeatures
+# (the class names and geometry types are packed as indices of the interned lists).
+PACKED_DTYPES = (
+    np.int32,
+    np.float64,
+    np.int32,
+    np.int32,
+    np.int32,
+    np.int32,
+    np.int16,
+    np.int64,
+)
+
+# State of the worker process: version of the project meta -> parsed project meta
+# with the names of its classes, and the memo of the decoded bitmaps of the worker.
+_worker_metas: Dict[str, Tuple[sly.ProjectMeta, FrozenSet[str]]] = {}
+_worker_bitmap_memo = BitmapMemo(max_size=10000)
+
+
+def pack_features(
+    features_per_image: List[Optional[List[LabelFeatures]]],
+) -> Dict[str, Any]:
+    """Packs the features of the batch of images into compact arrays, which are much
+    cheaper to send between the processes than the lists of the tuples.
+
+    :param features_per_image: The features of the labels of each image, None for
+        the images, which could not be parsed.
+    :type features_per_image: List[Optional[List[LabelFeatures]]]
+    :return: The packed features: interned class names and geometry types, number of
+        labels of each image (-1 for the images, which could not be parsed) and the columns.
+    :rtype: Dict[str, Any]
+    """
+    class_indices: Dict[str, int] = {}
+    geometry_indices: Dict[str, int] = {}
+    rows = []
+    counts = []
+    for features in features_per_image:
+        if features is None:
+            counts.append(-1)
+            continue
+        counts.append(len(features))
+        for feature in features:
+            class_idx = class_indices.setdefault(feature.class_name, len(class_indices))
+            geometry_idx = geometry_indices.setdefault(
+                feature.geometry_type, len(geometry_indices)
+            )
+            rows.append(
+                (
+                    class_idx,
+                    feature.area,
+                    feature.top,
+                    feature.left,
+                    feature.bottom,
+                    feature.right,
+                    geometry_idx,
+                    feature.label_id,
+                )
+            )
+    columns = list(zip(*rows)) if rows else [()] * len(PACKED_DTYPES)
+    return {
+        "class_names": list(class_indices),
+        "geometry_types": list(geometry_indices),
+        "counts": np.array(counts, dtype=np.int32),
+        "columns": [
+            np.array(column, dtype=dtype) for column, dtype in zip(columns, PACKED_DTYPES)
+        ],
+    }
+
+
+def unpack_features(packed: Dict[str, Any]) -> List[Optional[List[LabelFeatures]]]:
+    """Unpacks the features packed by pack_features.
+
+    :param packed: The packed features.
+    :type packed: Dict[str, Any]
+    :return: The features of the labels of each image, None for the images,
+        which could not be parsed.
+    :rtype: List[Optional[List[LabelFeatures]]]
+    """
+    class_names = packed["class_names"]
+    geometry_types = packed["geometry_types"]
+    rows = list(zip(*(column.tolist() for column in packed["columns"])))
+
+    result = []
+    start = 0
+    for count in packed["counts"].tolist():
+        if count < 0:
+            result.append(None)
+            continue
+        result.append(
+            [
+                LabelFeatures(
+                    class_names[class_idx],
+                    area,
+                    top,
+                    left,
+                    bottom,
+                    right,
+                    geometry_types[geometry_idx],
+                    label_id,
+                )
+                for class_idx, area, top, left, bottom, right, geometry_idx, label_id in rows[start:start + count]
+            ]
+        )
+        start += count
+    return result
+
+
+def extract_packed_features(
+    annotation_jsons: List[Dict[str, Any]], meta_json: Dict[str, Any], meta_version: str
+) -> Dict[str, Any]:
+    """Extracts the features of the batch of annotations in the worker process.
+    The fast JSON path is used when possible, otherwise sly.Annotation is built
+    with the project meta, which is parsed once per meta version in each worker.
+
+    :param annotation_jsons: The JSONs of the annotations.
+    :type annotation_jsons: List[Dict[str, Any]]
+    :param meta_json: The JSON of the project meta.
+    :type meta_json: Dict[str, Any]
+    :param meta_version: The version of the project meta.
+    :type meta_version: str
+    :return: The packed features, the annotations, which could not be parsed with
+        the given meta, are marked as failed and should be parsed by the caller.
+    :rtype: Dict[str, Any]
+    """
+    if meta_version not in _worker_metas:
+        _worker_metas.clear()
+        project_meta = sly.ProjectMeta.from_json(meta_json)
+        _worker_metas[meta_version] = (
+            project_meta,
+            frozenset(obj_class.name for obj_class in project_meta.obj_classes),
+        )
+    project_meta, class_names = _worker_metas[meta_version]
+
+    features_per_image = []
+    for annotation_json in annotation_jsons:
+        features = extract_features_from_json(
+            annotation_json, class_names, _worker_bitmap_memo
+        )
+        if features is None:
+            try:
+                features = extract_features(
+                    sly.Annotation.from_json(annotation_json, project_meta)
+                )
+            except Exception:
+                features = None
+        features_per_image.append(features)
+    return pack_features(features_per_image)
@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import supervisely as sly
+from supervisely.api.annotation_api import AnnotationInfo
+
+
+class AnnotationFetcher:
+    """Fetches the annotations of the confirmed images for the event handler.
+
+    The requests for the images of the same dataset, which arrive within the coalescing
+    window, are served by one batch request, repeated requests for the same image share
+    one download. The update times of the images are requested first (a small request),
+    the recently downloaded annotations are kept in a bounded memo together with the update
+    time of their image, and only the annotations of the images, which changed since they
+    were memoized, are downloaded. The same update time of the image is stored in the cache
+    and compared by its delta synchronization, so the images confirmed through the events
+    are not downloaded again by the synchronization.
+
+    :param api: The API object to download the annotations with.
+    :type api: sly.Api
+    :param memo_size: Maximum number of the memoized annotations, zero disables the memo.
+    :type memo_size: int
+    :param window: Coalescing window (in seconds), zero disables the waiting.
+    :type window: float
+
+    Methods:
+    - fetch: Get the actual annotation of the image.
+    - metrics: Get the counters and the estimated latency saving of the fetcher.
+    """
+
+    def __init__(self, api: sly.Api, memo_size: int, window: float):
+        self._api = api
+        self.memo_size = memo_size
+        self.window = window
+        self._lock = threading.Lock()
+        # dataset_id -> image_id -> futures of the requests waiting for the batch
+        self._pending: Dict[int, Dict[int, List[Future]]] = {}
+        # image_id -> (update time of the image, the last downloaded annotation of the image)
+        self._memo: "OrderedDict[int, Tuple[Optional[str], AnnotationInfo]]" = OrderedDict()
+
+        self._requests = 0
+        self._batches = 0
+        self._memo_hits = 0
+        self._downloaded = 0
+        self._download_calls = 0
+        self._download_time = 0.0
+        self._check_time = 0.0
+
+    def fetch(
+        self, dataset_id: int, image_id: int
+    ) -> Tuple[AnnotationInfo, Optional[str]]:
+        """Get the actual annotation of the image. The first request for the dataset waits
+        for the coalescing window and fetches the annotations for all the requests
+        of the dataset, which arrived in the meantime.
+
+        :param dataset_id: The ID of the dataset of the image.
+        :type dataset_id: int
+        :param image_id: The ID of the image.
+        :type image_id: int
+        :return: The annotation of the image and the update time of the image
+            (sly.ImageInfo.updated_at), read before the annotation was downloaded.
+        :rtype: Tuple[AnnotationInfo, Optional[str]]
+        """
+        future: Future = Future()
+        with self._lock:
+            self._requests += 1
+            batch = self._pending.get(dataset_id)
+            leader = batch is None
+            if leader:
+                batch = self._pending[dataset_id] = defaultdict(list)
+            batch[image_id].append(future)
+
+        if leader:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._lock:
+                batch = self._pending.pop(dataset_id)
+            self._fetch_batch(dataset_id, batch)
+
+        return future.result()
+
+    def _fetch_batch(self, dataset_id: int, batch: Dict[int, List[Future]]) -> None:
+        """Fetch the annotations of the batch and resolve the futures of the requests.
+
+        :param dataset_id: The ID of the dataset.
+        :type dataset_id: int
+        :param batch: Image ID -> futures of the requests for the image.
+        :type batch: Dict[int, List[Future]]
+        """
+        try:
+            fetched = self._fetch(dataset_id, list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        for image_id, futures in batch.items():
+            result = fetched.get(image_id)
+            for future in futures:
+                if result is None:
+                    future.set_exception(
+                        RuntimeError(f"Annotation of image_id={image_id} was not found.")
+                    )
+                else:
+                    future.set_result(result)
+
+    def _fetch(
+        self, dataset_id: int, image_ids: List[int]
+    ) -> Dict[int, Tuple[AnnotationInfo, Optional[str]]]:
+        """Get the actual annotations of the images, downloading only the ones,
+        which are not memoized or changed since they were memoized.
+
+        :param dataset_id: The ID of the dataset.
+        :type dataset_id: int
+        :param image_ids: The IDs of the images.
+        :type image_ids: List[int]
+        :return: Image ID -> annotation of the image and the update time of the image.
+        :rtype: Dict[int, Tuple[AnnotationInfo, Optional[str]]]
+        """
+        with self._lock:
+            self._batches += 1
+            memoized = {
+                image_id: self._memo[image_id]
+                for image_id in image_ids
+                if image_id in self._memo
+            }
+
+        # The update times are read before the annotations are downloaded, so if the image
+        # changes in between, it is only considered changed once more, never missed.
+        start_time = time.perf_counter()
+        image_infos = self._api.image.get_info_by_id_batch(
+            image_ids, force_metadata_for_links=False
+        )
+        with self._lock:
+            self._check_time += time.perf_counter() - start_time
+        updated_at = {image_info.id: image_info.updated_at for image_info in image_infos}
+
+        result = {}
+        for image_id, (memo_updated_at, annotation_info) in memoized.items():
+            if memo_updated_at is not None and memo_updated_at == updated_at.get(image_id):
+                result[image_id] = (annotation_info, memo_updated_at)
+        stale_ids = [image_id for image_id in image_ids if image_id not in result]
+
+        if stale_ids:
+            start_time = time.perf_counter()
+            if len(stale_ids) == 1:
+                downloaded = [
+                    self._api.annotation.download(
+                        stale_ids[0], force_metadata_for_links=False
+                    )
+                ]
+            else:
+                downloaded = self._api.annotation.download_batch(
+                    dataset_id, stale_ids, force_metadata_for_links=False
+                )
+            elapsed = time.perf_counter() - start_time
+            for annotation_info in downloaded:
+                result[annotation_info.image_id] = (
+                    annotation_info,
+                    updated_at.get(annotation_info.image_id),
+                )
+        else:
+            downloaded, elapsed = [], 0.0
+
+        with self._lock:
+            self._memo_hits += len(image_ids) - len(stale_ids)
+            self._downloaded += len(downloaded)
+            if stale_ids:
+                self._download_calls += 1
+                self._download_time += elapsed
+            if self.memo_size > 0:
+                for annotation_info in downloaded:
+                    self._memo[annotation_info.image_id] = (
+                        updated_at.get(annotation_info.image_id),
+                        annotation_info,
+                    )
+                    self._memo.move_to_end(annotation_info.image_id)
+                for image_id in result:
+                    if image_id in self._memo:
+                        self._memo.move_to_end(image_id)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+        sly.logger.debug(
+            "Fetched %s annotations of dataset_id=%s: %s from the memo, %s downloaded.",
+            len(image_ids),
+            dataset_id,
+            len(image_ids) - len(stale_ids),
+            len(stale_ids),
+        )
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the counters and the estimated latency saving of the fetcher. Without the
+        fetcher each request would be one download of the average duration, so the saving
+        is the difference between that and the time actually spent on the requests.
+
+        :return: The metrics: number of requests, batches, memo hits, downloaded annotations,
+            download calls, average download time, estimated saved time in total and per request.
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            avg_download_time = (
+                self._download_time / self._download_calls if self._download_calls else 0.0
+            )
+            spent = self._download_time + self._check_time
+            saved = self._requests * avg_download_time - spent
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "memo_hits": self._memo_hits,
+                "memo_size": len(self._memo),
+                "downloaded": self._downloaded,
+                "download_calls": self._download_calls,
+                "avg_download_time": avg_download_time,
+                "saved_time": saved,
+                "saved_time_per_request": saved / self._requests if self._requests else 0.0,
+            }
@@ -1,10 +1,19 @@
 import os
+import tempfile
 
 import supervisely as sly
 import supervisely.app.development as sly_app_development
 from dotenv import load_dotenv
 
 DEFAULT_THRESHOLD = 0.2
+# Modes of the comparison with the project statistics.
+MEAN_MODE = "mean"
+MEDIAN_MODE = "median"
+IQR_MODE = "iqr"
+# Comparison with the exponentially weighted mean, which follows the recent labeling.
+RECENT_MODE = "recent"
+# In the IQR mode values outside [Q1 - k * IQR, Q3 + k * IQR] are outliers (Tukey's fences).
+IQR_FENCE_FACTOR = float(os.getenv("IQR_FENCE_FACTOR", 1.5))
 
 if sly.is_development():
     load_dotenv("local.env")
@@ -30,8 +39,113 @@ all_objects_case_enabled = True
 
 average_label_area_case_enabled = True
 average_label_area_case_theshold = DEFAULT_THRESHOLD
+average_label_area_case_mode = MEAN_MODE
 average_number_of_class_labels_case_enabled = True
 average_number_of_class_labels_case_theshold = DEFAULT_THRESHOLD
+average_number_of_class_labels_case_mode = MEAN_MODE
+# endregion
+
+
+# region Cache
+# Number of threads used to list images and download annotation batches during warm-up.
+warmup_max_workers = int(os.getenv("WARMUP_MAX_WORKERS", 4))
+# Number of annotations downloaded in one request during warm-up.
+warmup_batch_size = int(os.getenv("WARMUP_BATCH_SIZE", 50))
+# Number of processes extracting the label features from the downloaded annotations
+# during warm-up. Zero disables the processes, the features are extracted in the threads.
+warmup_parse_processes = int(os.getenv("WARMUP_PARSE_PROCESSES", 0))
+# Smaller projects are always parsed in-process, starting the processes does not pay off.
+warmup_parse_min_images = int(os.getenv("WARMUP_PARSE_MIN_IMAGES", 5000))
+# Memory budget of the cache, least recently used projects are evicted when it is exceeded.
+# Zero means no limit.
+cache_max_bytes = int(os.getenv("CACHE_MAX_BYTES", 2 * 1024**3))
+cache_max_projects = int(os.getenv("CACHE_MAX_PROJECTS", 0))
+# Number of decoded bitmap masks (area and bounding box by the content hash of the mask),
+# which are remembered, so the same masks are not decoded again. Zero disables the memo.
+bitmap_memo_size = int(os.getenv("BITMAP_MEMO_SIZE", 100000))
+
+# Persistent copy of the cache on disk, which allows to skip the warm-up after restart.
+persist_cache = os.getenv("PERSIST_CACHE", "true").lower() in ("true", "1")
+try:
+    default_cache_dir = os.path.join(sly.app.get_data_dir(), "cache")
+except ValueError:
+    default_cache_dir = os.path.join(
+        tempfile.gettempdir(), "real-time-labeling-quality-check"
+    )
+cache_dir = os.getenv("CACHE_DIR", default_cache_dir)
+# Number of journal entries of the project, after which its snapshot is rewritten.
+cache_journal_max_entries = int(os.getenv("CACHE_JOURNAL_MAX_ENTRIES", 1000))
+# Interval (in seconds) of the background synchronization of the cached projects
+# with the server, only new and updated annotations are downloaded. Zero disables it.
+delta_sync_interval = int(os.getenv("DELTA_SYNC_INTERVAL", 600))
+# Half-life (in number of images of the project) of the exponentially weighted statistics,
+# used by the cases in the recent mode: the weight of each image halves after this many
+# newer images are confirmed.
+decay_half_life_images = float(os.getenv("DECAY_HALF_LIFE_IMAGES", 500))
+# Minimum weight of the recent labels (images) of the class, below which the recent mode
+# falls back to the all-time mean.
+decay_min_weight = float(os.getenv("DECAY_MIN_WEIGHT", 1.0))
+# Scope of the statistics, with which the images are compared: "project", "dataset" or "job".
+# If the class has fewer samples in the scope, than the minimum, the parent scope is used.
+stats_scope = os.getenv("STATS_SCOPE", "project")
+stats_scope_min_samples = int(os.getenv("STATS_SCOPE_MIN_SAMPLES", 30))
+# Statistics shared by all the processes of the app (e.g. several uvicorn workers) through
+# the files in the directory: one process warms the project up, the others load it,
+# and the updates made by any process are visible to all of them.
+shared_stats = os.getenv("SHARED_STATS", "false").lower() in ("true", "1")
+shared_stats_dir = os.getenv("SHARED_STATS_DIR", os.path.join(cache_dir, "shared"))
+# Size (in bytes) of the log of the changes of the shared project, after which
+# the log is merged into the shared copy of the project.
+shared_stats_max_log_bytes = int(os.getenv("SHARED_STATS_MAX_LOG_BYTES", 16 * 1024**2))
+# Cache backend shared by several sessions of the app: "memory" (in-process, for checks),
+# "redis" (any server with the Redis protocol) or empty to disable it. The project is
+# downloaded by one session and published to the backend, the others load it from there.
+cache_backend = os.getenv("CACHE_BACKEND", "").lower()
+cache_backend_url = os.getenv("CACHE_BACKEND_URL", "redis://localhost:6379/0")
+cache_backend_prefix = os.getenv("CACHE_BACKEND_PREFIX", "rtlqc")
+# Time (in seconds), for which the session publishing the project holds its lock,
+# the other sessions wait for the project at most that long.
+cache_backend_lock_ttl = float(os.getenv("CACHE_BACKEND_LOCK_TTL", 600))
+# endregion
+
+
+# region Events
+# Maximum number of events waiting for processing, new events are dropped when it is reached.
+event_queue_max_size = int(os.getenv("EVENT_QUEUE_MAX_SIZE", 100))
+# Number of threads processing the events.
+event_workers = int(os.getenv("EVENT_WORKERS", 4))
+# Time (in seconds) without newer events for the same image in the same job, after which
+# the event is processed. Superseded events are dropped. Zero disables the waiting.
+event_coalesce_window = float(os.getenv("EVENT_COALESCE_WINDOW", 1.0))
+# Number of remembered results of the checks: identical annotations checked against
+# the same statistics and settings are not evaluated again. Zero disables the memo.
+case_result_memo_size = int(os.getenv("CASE_RESULT_MEMO_SIZE", 1000))
+# Window (in seconds), in which the annotation requests of the events for the same dataset
+# are merged into one batch request. Zero disables the waiting.
+annotation_coalesce_window = float(os.getenv("ANNOTATION_COALESCE_WINDOW", 0.02))
+# Number of recently downloaded annotations, which are reused, if the image was not
+# updated since. Zero disables the memo.
+annotation_memo_size = int(os.getenv("ANNOTATION_MEMO_SIZE", 500))
+# endregion
+
+
+# region Effects
+# Number of threads sending the notifications, rejections, issue comments and subissues,
+# i.e. maximum number of concurrent requests.
+effects_max_workers = int(os.getenv("EFFECTS_MAX_WORKERS", 8))
+# Endpoint -> maximum number of requests per second.
+effects_rate_limits = {
+    "img_ann_tool.show_notification": 20.0,
+    "labeling_job.set_entity_review_status": 10.0,
+    "issues.get_or_create": 5.0,
+    "issues.add_comment": 10.0,
+    "issues.add_subissue": 10.0,
+}
+effects_default_rate_limit = float(os.getenv("EFFECTS_DEFAULT_RATE_LIMIT", 10))
+# Number of retries of the failed request and the delay (in seconds) before the first retry,
+# which is doubled for each next retry.
+effects_max_retries = int(os.getenv("EFFECTS_MAX_RETRIES", 3))
+effects_backoff = float(os.getenv("EFFECTS_BACKOFF", 0.5))
 # endregion
 
 
@@ -1,33 +1,63 @@
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
 import supervisely as sly
 
 import src.globals as g
 
 
-def get_or_create_issue(issue_name: str) -> int:
-    """Gets or creates an issue with the given name.
+def find_issue(team_id: int, issue_name: str) -> Optional[int]:
+    """Finds the issue with the given name, filtering the issues on the server,
+    so only the matching issues are transferred.
 
+    :param team_id: The ID of the team.
+    :type team_id: int
     :param issue_name: The name of the issue.
     :type issue_name: str
-    :return: The ID of the issue.
-    :rtype: int
+    :return: The ID of the issue, None if there is no such issue.
+    :rtype: Optional[int]
     """
-    all_issues = g.spawn_api.issues.get_list(team_id=g.spawn_team_id)
-    for issue in all_issues:
+    issues = g.spawn_api.issues.get_list(
+        team_id, filters=[{"field": "name", "operator": "=", "value": issue_name}]
+    )
+    for issue in issues:
         if issue.name == issue_name:
             sly.logger.debug(
                 "Issue with name %s was found. Issue ID: %s", issue_name, issue.id
             )
             return issue.id
+    return None
+
+
+def list_issues(team_id: int) -> Dict[str, int]:
+    """Lists all the issues of the team (the pages are fetched by the SDK).
+
+    :param team_id: The ID of the team.
+    :type team_id: int
+    :return: Name of the issue -> ID of the issue.
+    :rtype: Dict[str, int]
+    """
+    issues = {}
+    for issue in g.spawn_api.issues.get_list(team_id):
+        # Keep the first issue, if there are several issues with the same name.
+        issues.setdefault(issue.name, issue.id)
+    sly.logger.debug("Listed %s issues of team_id=%s.", len(issues), team_id)
+    return issues
+
 
+def create_issue(team_id: int, issue_name: str) -> int:
+    """Creates an issue with the given name.
+
+    :param team_id: The ID of the team.
+    :type team_id: int
+    :param issue_name: The name of the issue.
+    :type issue_name: str
+    :return: The ID of the issue.
+    :rtype: int
+    """
     sly.logger.debug(
         "Issue with name %s was not found. Creating a new issue.", issue_name
     )
-
-    issue_id = g.spawn_api.issues.add(g.spawn_team_id, issue_name, is_local=True).id
-
-    return issue_id
+    return g.spawn_api.issues.add(team_id, issue_name, is_local=True).id
 
 
 def get_top_and_left(label: sly.Label) -> Tuple[int, int]:
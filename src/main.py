@@ -1,12 +1,19 @@
+import threading
+import time
+
 import supervisely as sly
 
 import src.globals as g
 import src.test.cases  # NOTE: Do not remove this import.
 from src.cache import Cache
+from src.effects import HIGH_PRIORITY, dispatcher
+from src.events import EventQueue
+from src.fetch import AnnotationFetcher
 from src.test import Test
 from src.ui.settings import container
 
 app = sly.Application(layout=container, show_header=False)
+server = app.get_server()
 
 
 @app.event(sly.Event.JobEntity.StatusChanged)  # type: ignore
@@ -14,6 +21,8 @@ def job_status_changed(api: sly.Api, event: sly.Event.JobEntity.StatusChanged) -
     """Event handler for the JobEntity.StatusChanged event.
     This event is triggered when the status of the job entity changes
     (e.g. user pressed the "Confirm" button).
+    The handler only puts the event into the queue, the event is processed
+    by the worker threads of the queue.
 
     :param api: The API object with credentials of the user.
     :type api: sly.Api
@@ -25,11 +34,22 @@ def job_status_changed(api: sly.Api, event: sly.Event.JobEntity.StatusChanged) -
         sly.logger.debug("Job status is not 'done'. Skipping the event.")
         return
 
+    event_queue.put(event)
+
+
+def process_event(event: sly.Event.JobEntity.StatusChanged) -> None:
+    """Process the JobEntity.StatusChanged event: run the tests for the image,
+    notify the user about failed tests and update the cache.
+
+    :param event: The event object.
+    :type event: sly.Event.JobEntity.StatusChanged
+    """
     Cache().cache_annotation_infos(event.project_id)
 
-    # Obtaining actual AnnotationInfo for the image.
-    annotation_info = g.spawn_api.annotation.download(
-        event.image_id, force_metadata_for_links=False
+    # Obtaining actual AnnotationInfo for the image, it is downloaded only if it changed
+    # since the last download, together with the other images of the dataset.
+    annotation_info, image_updated_at = annotation_fetcher.fetch(
+        event.dataset_id, event.image_id
     )
 
     # Retrieving project meta and project info from cache.
@@ -41,6 +61,7 @@ def job_status_changed(api: sly.Api, event: sly.Event.JobEntity.StatusChanged) -
         project_info,
         project_meta,
         annotation_info,
+        job_id=event.job_id,
         dataset_id=event.dataset_id,
         image_id=event.image_id,
     )
@@ -50,31 +71,32 @@ def job_status_changed(api: sly.Api, event: sly.Event.JobEntity.StatusChanged) -
     if len(reports) > 0:
         sly.logger.info("%s failed tests were found.", len(reports))
 
-        # 1. Show notification in the labeling tool for each failed test.
+        # 1. Show one notification in the labeling tool with the reports of all failed tests.
         # 2. Reject the image in the labeling job if the setting is on.
+        # 3. Create the issue comment and subissue for the failed tests in background.
+        # The requests are sent concurrently by the side effect dispatcher,
+        # the user-visible ones first.
 
-        for message in test.reports:
-            # Show separate notifications for each failed test with detailed information.
-            try:
-                g.spawn_api.img_ann_tool.show_notification(
-                    event.session_id,
-                    message=message,
-                    notification_type="error",
-                )
-                sly.logger.debug("Sent notification: %s to the labeling tool.", message)
-            except Exception as e:
-                sly.logger.warning(
-                    "Failed to send notification to the Image Labeling Tool: %s", e
-                )
+        dispatcher.submit(
+            "img_ann_tool.show_notification",
+            g.spawn_api.img_ann_tool.show_notification,
+            event.session_id,
+            message=test.report,
+            notification_type="error",
+            priority=HIGH_PRIORITY,
+        )
 
         if g.reject_images:
-            try:
-                g.spawn_api.labeling_job.set_entity_review_status(
-                    event.job_id, event.image_id, status="rejected"
-                )
-                sly.logger.info("The image with ID %s was rejected.", event.image_id)
-            except Exception as e:
-                sly.logger.warning("Failed to reject the image: %s", e)
+            dispatcher.submit(
+                "labeling_job.set_entity_review_status",
+                g.spawn_api.labeling_job.set_entity_review_status,
+                event.job_id,
+                event.image_id,
+                status="rejected",
+                priority=HIGH_PRIORITY,
+            )
+
+        test.create_issues()
 
         if not g.use_failed_images:
             # If the setting is off, do not update the cache and return.
@@ -85,5 +107,56 @@ def job_status_changed(api: sly.Api, event: sly.Event.JobEntity.StatusChanged) -
     # to avoid using current annotation info parameters in average calculations.
     # Also, cache is updated only if all tests passed or if the user decided to cache failed tests.
     Cache().update_cached_annotation_info(
-        event.project_id, event.image_id, annotation_info
+        event.project_id,
+        event.image_id,
+        annotation_info,
+        annotation=test.context.annotation,
+        updated_at=image_updated_at,
+        dataset_id=event.dataset_id,
+        job_id=event.job_id,
     )
+
+
+event_queue = EventQueue(
+    process_event,
+    max_size=g.event_queue_max_size,
+    num_workers=g.event_workers,
+    key=lambda event: (event.job_id, event.image_id),
+    coalesce_window=g.event_coalesce_window,
+)
+annotation_fetcher = AnnotationFetcher(
+    g.spawn_api,
+    memo_size=g.annotation_memo_size,
+    window=g.annotation_coalesce_window,
+)
+
+
+def delta_sync() -> None:
+    """Periodically synchronize the cached projects with the server, so the statistics
+    include the changes made outside of the labeling jobs (imports, other apps, etc.)."""
+    while True:
+        time.sleep(g.delta_sync_interval)
+        Cache().sync_all()
+
+
+# Restore the cache saved by the previous run of the app in background,
+# events for the projects, which are not restored yet, will wait for them.
+threading.Thread(target=Cache().restore, name="cache-restore", daemon=True).start()
+if g.delta_sync_interval > 0:
+    threading.Thread(target=delta_sync, name="delta-sync", daemon=True).start()
+
+
+@server.get("/metrics")
+def metrics() -> dict:
+    """Endpoint with the runtime metrics of the application.
+
+    :return: The metrics.
+    :rtype: dict
+    """
+    return {
+        "event_queue": event_queue.metrics(),
+        "annotations": annotation_fetcher.metrics(),
+        "case_results": Test.result_memo.metrics(),
+        "effects": dispatcher.metrics(),
+        "cache": Cache().metrics(),
+    }
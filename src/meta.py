@@ -0,0 +1,89 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+import supervisely as sly
+
+from src.utils import get_meta_version
+
+
+class CompiledMeta:
+    """Lookup tables of the project meta, which are built once per version of the meta
+    and shared by all the test cases. The classes of the meta are interned into integer
+    IDs (the index of the class in the meta), so the cases compare and group small
+    integers instead of hashing ObjClass objects and class names.
+
+    :param project_meta: The metadata of the project.
+    :type project_meta: sly.ProjectMeta
+    :param version: The version of the metadata, calculated if not given.
+    :type version: Optional[str]
+
+    Properties:
+    - version: The version of the project meta.
+    - class_names: Names of the classes, index in the tuple is the class ID.
+    - class_ids: Class name -> class ID.
+    - required_class_ids: IDs of the classes, which are expected on each image.
+    - geometry_types: Geometry type of each class, indexed by the class ID.
+    - num_classes: Number of the classes in the meta.
+
+    Methods:
+    - class_id: Get the ID of the class by its name.
+    - label_class_ids: Get the class IDs of the labels.
+    - class_names_of: Get the names of the classes by their IDs.
+    """
+
+    def __init__(self, project_meta: sly.ProjectMeta, version: Optional[str] = None):
+        self.version = version or get_meta_version(project_meta)
+        obj_classes = list(project_meta.obj_classes)
+
+        self.class_names: Tuple[str, ...] = tuple(
+            obj_class.name for obj_class in obj_classes
+        )
+        self.class_ids: Dict[str, int] = {
+            class_name: class_id for class_id, class_name in enumerate(self.class_names)
+        }
+        self.required_class_ids: FrozenSet[int] = frozenset(self.class_ids.values())
+        self.geometry_types: Tuple[str, ...] = tuple(
+            obj_class.geometry_type.geometry_name() for obj_class in obj_classes
+        )
+
+    @property
+    def num_classes(self) -> int:
+        """Number of the classes in the meta.
+
+        :return: The number of the classes.
+        :rtype: int
+        """
+        return len(self.class_names)
+
+    def class_id(self, class_name: str) -> int:
+        """Get the ID of the class by its name.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        :return: The ID of the class, -1 if the class is not in the meta.
+        :rtype: int
+        """
+        return self.class_ids.get(class_name, -1)
+
+    def label_class_ids(self, labels: Iterable[sly.Label]) -> np.ndarray:
+        """Get the class IDs of the labels, in the order of the labels.
+
+        :param labels: The labels.
+        :type labels: Iterable[sly.Label]
+        :return: The class IDs (-1 for the classes, which are not in the meta).
+        :rtype: np.ndarray
+        """
+        class_ids = self.class_ids
+        return np.array(
+            [class_ids.get(label.obj_class.name, -1) for label in labels], dtype=np.int32
+        )
+
+    def class_names_of(self, class_ids: Iterable[int]) -> List[str]:
+        """Get the names of the classes by their IDs.
+
+        :param class_ids: The IDs of the classes.
+        :type class_ids: Iterable[int]
+        :return: The names of the classes.
+        :rtype: List[str]
+        """
+        return [self.class_names[class_id] for class_id in class_ids]
@@ -0,0 +1,345 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import closing
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import supervisely as sly
+
+from src.features import LabelFeatures
+from src.stats import ProjectStats
+from src.store import COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    project_id INTEGER PRIMARY KEY,
+    meta TEXT NOT NULL,
+    data BLOB NOT NULL,
+    saved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    image_id INTEGER NOT NULL,
+    updated_at TEXT,
+    features TEXT NOT NULL,
+    dataset_id INTEGER,
+    job_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS journal_project ON journal (project_id, id);
+CREATE TABLE IF NOT EXISTS issues (
+    team_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    issue_id INTEGER NOT NULL,
+    PRIMARY KEY (team_id, name)
+);
+"""
+
+
+class CacheSnapshot:
+    """Persistent on-disk copy of the cache in the SQLite database. For each project it keeps
+    a snapshot (project meta, columns of the label store and the last seen update time of
+    each image) and a journal of the image updates since the snapshot was saved.
+    On restart the project is restored from the snapshot and the journal without any
+    requests to the server. The aggregates are not saved: they are rebuilt from the features.
+    The IDs of the issues are also kept, per team, so they are not looked up after restart.
+
+    :param path: Path to the database file.
+    :type path: str
+    :param max_journal_entries: Number of journal entries of the project, after which
+        the snapshot of the project is rewritten and its journal is truncated.
+    :type max_journal_entries: int
+
+    Methods:
+    - project_ids: Get the IDs of the saved projects.
+    - save_project: Save the snapshot of the project and truncate its journal.
+    - append: Append the update of the image to the journal.
+    - load_project: Load the project from the snapshot and replay its journal.
+    - drop_project: Delete the snapshot and the journal of the project.
+    - load_issues: Load the IDs of the issues of the team.
+    - save_issues: Save the IDs of the issues of the team.
+    - drop_issue: Delete the ID of the issue.
+    """
+
+    def __init__(self, path: str, max_journal_entries: int = 1000):
+        self.path = path
+        self.max_journal_entries = max_journal_entries
+        self._lock = threading.Lock()
+        # project_id -> number of journal entries since the last snapshot
+        self._journal_sizes: Dict[int, int] = defaultdict(int)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection to the database (one connection per call, so
+        the snapshot can be used from different threads).
+
+        :return: The connection.
+        :rtype: sqlite3.Connection
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def project_ids(self) -> List[int]:
+        """Get the IDs of the projects, which have a saved snapshot.
+
+        :return: The IDs of the projects, the most recently saved first.
+        :rtype: List[int]
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT project_id FROM snapshots ORDER BY saved_at DESC"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def save_project(
+        self, project_id: int, project_meta: sly.ProjectMeta, project: ProjectStats
+    ) -> None:
+        """Save the snapshot of the project and truncate its journal.
+        The read lock of the project must be held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project_meta: The metadata of the project.
+        :type project_meta: sly.ProjectMeta
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        """
+        data = dump_project_data(project)
+        meta = json.dumps(project_meta.to_json())
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO snapshots (project_id, meta, data, saved_at) "
+                "VALUES (?, ?, ?, ?)",
+                (project_id, meta, data, time.time()),
+            )
+            connection.execute("DELETE FROM journal WHERE project_id = ?", (project_id,))
+            self._journal_sizes[project_id] = 0
+        sly.logger.debug(
+            "Snapshot of project_id=%s was saved (%s bytes).", project_id, len(data)
+        )
+
+    def append(
+        self,
+        project_id: int,
+        image_id: int,
+        features: Sequence[LabelFeatures],
+        updated_at: Optional[str],
+        dataset_id: Optional[int] = None,
+        job_id: Optional[int] = None,
+    ) -> bool:
+        """Append the update of the image to the journal of the project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param image_id: The ID of the image.
+        :type image_id: int
+        :param features: The new features of the labels of the image.
+        :type features: Sequence[LabelFeatures]
+        :param updated_at: The update time of the image.
+        :type updated_at: Optional[str]
+        :param dataset_id: The ID of the dataset of the image.
+        :type dataset_id: Optional[int]
+        :param job_id: The ID of the labeling job of the image.
+        :type job_id: Optional[int]
+        :return: True if the journal of the project is full and the snapshot should be saved.
+        :rtype: bool
+        """
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO journal "
+                "(project_id, image_id, updated_at, features, dataset_id, job_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    project_id,
+                    image_id,
+                    updated_at,
+                    json.dumps(features),
+                    dataset_id,
+                    job_id,
+                ),
+            )
+            self._journal_sizes[project_id] += 1
+            return self._journal_sizes[project_id] >= self.max_journal_entries
+
+    def load_project(
+        self, project_id: int
+    ) -> Optional[Tuple[sly.ProjectMeta, ProjectStats]]:
+        """Load the project from the snapshot and replay its journal.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :return: The metadata and the statistics of the project, None if there is no snapshot.
+        :rtype: Optional[Tuple[sly.ProjectMeta, ProjectStats]]
+        """
+        start_time = time.perf_counter()
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT meta, data FROM snapshots WHERE project_id = ?", (project_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            journal = connection.execute(
+                "SELECT image_id, updated_at, features, dataset_id, job_id FROM journal "
+                "WHERE project_id = ? ORDER BY id",
+                (project_id,),
+            ).fetchall()
+
+        project_meta = sly.ProjectMeta.from_json(json.loads(row[0]))
+        project = load_project_data(row[1])
+        for image_id, updated_at, features, dataset_id, job_id in journal:
+            project.set_image(
+                image_id,
+                [LabelFeatures(*feature) for feature in json.loads(features)],
+                updated_at,
+                dataset_id,
+                job_id,
+            )
+        with self._lock:
+            self._journal_sizes[project_id] = len(journal)
+
+        sly.logger.info(
+            "Project with id=%s was restored from the snapshot "
+            "(%s images, %s journal entries) in %.2f s.",
+            project_id,
+            len(project.updated_at),
+            len(journal),
+            time.perf_counter() - start_time,
+        )
+        return project_meta, project
+
+    def drop_project(self, project_id: int) -> None:
+        """Delete the snapshot and the journal of the project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        """
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM snapshots WHERE project_id = ?", (project_id,))
+            connection.execute("DELETE FROM journal WHERE project_id = ?", (project_id,))
+            self._journal_sizes.pop(project_id, None)
+
+    def load_issues(self, team_id: int) -> Dict[str, int]:
+        """Load the IDs of the issues of the team.
+
+        :param team_id: The ID of the team.
+        :type team_id: int
+        :return: Name of the issue -> ID of the issue.
+        :rtype: Dict[str, int]
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT name, issue_id FROM issues WHERE team_id = ?", (team_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def save_issues(self, team_id: int, issues: Dict[str, int]) -> None:
+        """Save the IDs of the issues of the team.
+
+        :param team_id: The ID of the team.
+        :type team_id: int
+        :param issues: Name of the issue -> ID of the issue.
+        :type issues: Dict[str, int]
+        """
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO issues (team_id, name, issue_id) VALUES (?, ?, ?)",
+                [(team_id, name, issue_id) for name, issue_id in issues.items()],
+            )
+
+    def drop_issue(self, team_id: int, issue_name: str) -> None:
+        """Delete the ID of the issue.
+
+        :param team_id: The ID of the team.
+        :type team_id: int
+        :param issue_name: The name of the issue.
+        :type issue_name: str
+        """
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM issues WHERE team_id = ? AND name = ?", (team_id, issue_name)
+            )
+
+
+def dump_project_data(project: ProjectStats) -> bytes:
+    """Serialize the live rows of the label store, the update times and the scopes
+    (dataset and labeling job) of the images.
+
+    :param project: The statistics of the project.
+    :type project: ProjectStats
+    :return: The serialized project.
+    :rtype: bytes
+    """
+    store = project.store
+    image_ids = list(project.updated_at)
+    arrays = {name: store.column(name) for name in COLUMNS}
+    arrays["image_ids"] = np.asarray(image_ids, dtype=np.int64)
+    arrays["header"] = np.frombuffer(
+        json.dumps(
+            {
+                "class_names": store.class_names,
+                "geometry_types": store.geometry_types,
+                "updated_at": [project.updated_at[image_id] for image_id in image_ids],
+                "scopes": [
+                    project.image_scopes.get(image_id, (None, None))
+                    for image_id in image_ids
+                ],
+            }
+        ).encode("utf-8"),
+        dtype=np.uint8,
+    )
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def load_project_data(data: bytes) -> ProjectStats:
+    """Deserialize the project and rebuild its statistics from the label features.
+
+    :param data: The serialized project.
+    :type data: bytes
+    :return: The statistics of the project.
+    :rtype: ProjectStats
+    """
+    with np.load(io.BytesIO(data)) as arrays:
+        header = json.loads(arrays["header"].tobytes().decode("utf-8"))
+        columns = {name: arrays[name] for name in COLUMNS}
+        image_ids = arrays["image_ids"].tolist()
+
+    class_names = header["class_names"]
+    geometry_types = header["geometry_types"]
+
+    # image_id -> features of the labels of the image
+    features: Dict[int, List[LabelFeatures]] = defaultdict(list)
+    rows = zip(*(columns[name].tolist() for name in COLUMNS))
+    for image_id, class_idx, area, top, left, bottom, right, geometry_idx, label_id in rows:
+        features[image_id].append(
+            LabelFeatures(
+                class_names[class_idx],
+                area,
+                top,
+                left,
+                bottom,
+                right,
+                geometry_types[geometry_idx],
+                label_id,
+            )
+        )
+
+    project = ProjectStats()
+    for image_id, updated_at, (dataset_id, job_id) in zip(
+        image_ids, header["updated_at"], header["scopes"]
+    ):
+        project.set_image(
+            image_id, features.get(image_id, []), updated_at, dataset_id, job_id
+        )
+    return project
@@ -0,0 +1,173 @@
+import socket
+import threading
+import urllib.parse
+from typing import Any, BinaryIO, List, Sequence, Tuple
+
+
+class RespError(Exception):
+    """Error reply of the server."""
+
+
+def _to_bytes(value: Any) -> bytes:
+    """Encode the argument of the command.
+
+    :param value: The argument: bytes, str, int or float.
+    :type value: Any
+    :return: The encoded argument.
+    :rtype: bytes
+    """
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, float):
+        return repr(value).encode("ascii")
+    return str(value).encode("ascii")
+
+
+def encode_command(args: Sequence[Any]) -> bytes:
+    """Encode the command as an array of bulk strings.
+
+    :param args: The name and the arguments of the command.
+    :type args: Sequence[Any]
+    :return: The encoded command.
+    :rtype: bytes
+    """
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = _to_bytes(arg)
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def read_reply(reader: BinaryIO) -> Any:
+    """Read one reply (or one command on the server side) from the stream.
+    Error replies are returned, not raised, so the other replies of the pipeline are read.
+
+    :param reader: The buffered stream of the connection.
+    :type reader: BinaryIO
+    :return: The reply: str (status), RespError, int, bytes, None or list of replies.
+    :rtype: Any
+    """
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection was closed.")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode("utf-8")
+    if kind == b"-":
+        return RespError(payload.decode("utf-8"))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        size = int(payload)
+        if size < 0:
+            return None
+        data = reader.read(size + 2)
+        if len(data) < size + 2:
+            raise ConnectionError("Connection was closed.")
+        return data[:-2]
+    if kind == b"*":
+        size = int(payload)
+        if size < 0:
+            return None
+        return [read_reply(reader) for _ in range(size)]
+    raise ConnectionError(f"Unexpected reply: {line!r}")
+
+
+class RespClient:
+    """Minimal client of the Redis protocol (RESP), which sends the commands in pipelines:
+    all the commands of the pipeline are written at once and their replies are read
+    after that, so the pipeline costs one round trip. Each thread has its own connection.
+
+    :param url: URL of the server: redis://[:password@]host[:port][/db].
+    :type url: str
+    :param timeout: Timeout (in seconds) of the socket operations.
+    :type timeout: float
+
+    Properties:
+    - round_trips: Number of the pipelines sent to the server.
+    - commands: Number of the commands sent to the server.
+
+    Methods:
+    - execute: Run one command.
+    - pipeline: Run the commands in one round trip.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        parsed = urllib.parse.urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported URL of the cache backend: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.round_trips = 0
+        self.commands = 0
+
+    def _connect(self) -> Tuple[socket.socket, BinaryIO]:
+        """Get the connection of the current thread, opening it if needed.
+
+        :return: The socket and its buffered reader.
+        :rtype: Tuple[socket.socket, BinaryIO]
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            # The pipelines are small, they must not wait for the acknowledgements.
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = self._local.connection = (sock, sock.makefile("rb"))
+            setup = []
+            if self.password:
+                setup.append(("AUTH", self.password))
+            if self.db:
+                setup.append(("SELECT", self.db))
+            if setup:
+                self.pipeline(setup)
+        return connection
+
+    def _close(self) -> None:
+        """Close the connection of the current thread."""
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+    def execute(self, *args: Any) -> Any:
+        """Run one command.
+
+        :return: The reply of the command.
+        :rtype: Any
+        """
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Run the commands in one round trip.
+
+        :param commands: The commands, each is the name and the arguments.
+        :type commands: Sequence[Sequence[Any]]
+        :raises RespError: If any of the commands failed (after all replies were read).
+        :return: The replies of the commands.
+        :rtype: List[Any]
+        """
+        if not commands:
+            return []
+        sock, reader = self._connect()
+        try:
+            sock.sendall(b"".join(encode_command(command) for command in commands))
+            replies = [read_reply(reader) for _ in commands]
+        except (OSError, ConnectionError):
+            # The connection is in an unknown state, the next call opens a new one.
+            self._close()
+            raise
+        with self._lock:
+            self.round_trips += 1
+            self.commands += len(commands)
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
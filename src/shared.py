@@ -0,0 +1,478 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import supervisely as sly
+
+from src.features import LabelFeatures
+from src.persistence import dump_project_data, load_project_data
+from src.stats import ProjectStats
+
+# Header of the base file: magic, epoch, size of the project meta JSON.
+BASE_HEADER = struct.Struct("<8sQQ")
+BASE_MAGIC = b"RTLQBASE"
+# Header of the log file: magic, epoch.
+LOG_HEADER = struct.Struct("<8sQ")
+LOG_MAGIC = b"RTLQLOG\0"
+# Size of the record, which precedes the JSON of the record in the log.
+RECORD_HEADER = struct.Struct("<I")
+
+# Operations of the log records.
+SET_IMAGE = "set_image"
+REMOVE_IMAGE = "remove_image"
+RENAME_CLASS = "rename_class"
+DROP_CLASS = "drop_class"
+
+
+def set_image_record(
+    image_id: int,
+    features: Sequence[LabelFeatures],
+    updated_at: Optional[str] = None,
+    dataset_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Get the record, which sets the labels of the image (see ProjectStats.set_image)."""
+    return {
+        "op": SET_IMAGE,
+        "image_id": image_id,
+        "features": list(features),
+        "updated_at": updated_at,
+        "dataset_id": dataset_id,
+        "job_id": job_id,
+    }
+
+
+def remove_image_record(image_id: int) -> Dict[str, Any]:
+    """Get the record, which removes the labels of the image."""
+    return {"op": REMOVE_IMAGE, "image_id": image_id}
+
+
+def rename_class_record(old_name: str, new_name: str) -> Dict[str, Any]:
+    """Get the record, which renames the class."""
+    return {"op": RENAME_CLASS, "old_name": old_name, "new_name": new_name}
+
+
+def drop_class_record(class_name: str) -> Dict[str, Any]:
+    """Get the record, which removes all the labels of the class."""
+    return {"op": DROP_CLASS, "class_name": class_name}
+
+
+def apply_record(project: ProjectStats, record: Dict[str, Any]) -> None:
+    """Apply the change of the statistics to the project.
+    The write lock of the project must be held by the caller.
+
+    :param project: The statistics of the project.
+    :type project: ProjectStats
+    :param record: The change, created by one of the *_record functions.
+    :type record: Dict[str, Any]
+    """
+    op = record["op"]
+    if op == SET_IMAGE:
+        project.set_image(
+            record["image_id"],
+            [LabelFeatures(*feature) for feature in record["features"]],
+            record["updated_at"],
+            record["dataset_id"],
+            record["job_id"],
+        )
+    elif op == REMOVE_IMAGE:
+        project.remove_image(record["image_id"])
+    elif op == RENAME_CLASS:
+        project.rename_class(record["old_name"], record["new_name"])
+    elif op == DROP_CLASS:
+        project.drop_class(record["class_name"])
+    else:
+        raise ValueError(f"Unknown operation of the record: {op}")
+
+
+class SharedStats:
+    """Replicated statistics of the projects, kept consistent between all the processes
+    of the app (e.g. uvicorn workers) through the files in one directory. For each project
+    there are:
+
+    - the base file: the project meta and the label features of the project
+      (in the format of the cache snapshot), written once by the warm-up;
+    - the log file: the changes of the statistics since the base was written, appended
+      by any process and read by the others through a memory map;
+    - the lock files: the data lock (shared for reading, exclusive for writing the base
+      and the log) and the warm-up lock (one process warms the project up at a time).
+
+    Each process keeps its own full replica of the statistics (only the files are shared,
+    not the memory of the replicas), which is the base with the applied
+    records of the log, and remembers its position in the log. Before the statistics are
+    read, the new records are applied, so every process sees the updates of the others.
+    A change is appended under the exclusive lock after the replica is brought up to date,
+    so all the replicas apply the changes in the same order. When the log grows over
+    the limit, the base is rewritten from the replica and a new log is started
+    with the next epoch; the replicas of the previous epoch (and the replicas replaced
+    by the newer ones) are outdated and must be loaded again.
+
+    :param directory: Path to the directory with the shared files.
+    :type directory: str
+    :param max_log_bytes: Size of the log, after which it is merged into the base.
+    :type max_log_bytes: int
+    :param half_life: Half-life (in number of images) of the exponentially weighted
+        statistics of the loaded replicas.
+    :type half_life: float
+
+    Methods:
+    - load_or_build: Load the replica of the project or build and publish it.
+    - is_current: Check whether the replica has all the changes of the log.
+    - refresh: Apply the new changes of the log to the replica.
+    - append: Apply the changes to the replica and append them to the log.
+    - forget: Forget the evicted replica.
+    - metrics: Get the counters of the shared statistics.
+    """
+
+    def __init__(self, directory: str, max_log_bytes: int, half_life: float):
+        self.directory = directory
+        self.max_log_bytes = max_log_bytes
+        self.half_life = half_life
+        os.makedirs(directory, exist_ok=True)
+
+        # project_id -> (replica of this process, its epoch and offset in the log)
+        self._replicas: Dict[int, Tuple[ProjectStats, int, int]] = {}
+        # (project_id, lock name) -> (thread lock, descriptor of the lock file)
+        self._locks: Dict[Tuple[int, str], Tuple[threading.Lock, int]] = {}
+        self._locks_lock = threading.Lock()
+
+        self._built = 0
+        self._loaded = 0
+        self._appended = 0
+        self._replayed = 0
+        self._compactions = 0
+
+    def _path(self, project_id: int, suffix: str) -> str:
+        """Get the path to the shared file of the project.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param suffix: The kind of the file: "base", "log" or "<name>.lock".
+        :type suffix: str
+        :return: The path to the file.
+        :rtype: str
+        """
+        return os.path.join(self.directory, f"project_{project_id}.{suffix}")
+
+    @contextmanager
+    def _locked(self, project_id: int, name: str, shared: bool = False) -> Iterator[None]:
+        """Hold the lock of the project across the processes. The lock of the file
+        belongs to the whole process, so the threads of the process take it in turn.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param name: The name of the lock: "data" or "warmup".
+        :type name: str
+        :param shared: Whether to take the lock for reading (shared with other processes).
+        :type shared: bool
+        """
+        with self._locks_lock:
+            lock = self._locks.get((project_id, name))
+            if lock is None:
+                fd = os.open(self._path(project_id, f"{name}.lock"), os.O_RDWR | os.O_CREAT)
+                lock = self._locks[(project_id, name)] = (threading.Lock(), fd)
+        thread_lock, fd = lock
+        with thread_lock:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def load_or_build(
+        self,
+        project_id: int,
+        build: Callable[[], Tuple[sly.ProjectMeta, ProjectStats]],
+        force: bool = False,
+    ) -> Tuple[sly.ProjectMeta, ProjectStats]:
+        """Load the replica of the project from the shared files. If the project was not
+        published yet (or the reload is forced), build it and publish it for the other
+        processes. Only one process builds the project, the others wait and load it.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param build: Builds the project meta and the statistics of the project.
+        :type build: Callable[[], Tuple[sly.ProjectMeta, ProjectStats]]
+        :param force: Whether to build the project, even if it was published.
+        :type force: bool
+        :return: The metadata and the statistics of the project.
+        :rtype: Tuple[sly.ProjectMeta, ProjectStats]
+        """
+        with self._locked(project_id, "warmup"):
+            if not force:
+                with self._locked(project_id, "data", shared=True):
+                    loaded = self._load(project_id)
+                if loaded is not None:
+                    return loaded
+
+            project_meta, project = build()
+            with project.lock.read(), self._locked(project_id, "data"):
+                self._publish(project_id, json.dumps(project_meta.to_json()), project)
+            self._built += 1
+            return project_meta, project
+
+    def _load(self, project_id: int) -> Optional[Tuple[sly.ProjectMeta, ProjectStats]]:
+        """Load the replica from the base and apply the log.
+        The data lock of the project must be held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :return: The metadata and the statistics of the project, None if it was not published.
+        :rtype: Optional[Tuple[sly.ProjectMeta, ProjectStats]]
+        """
+        start_time = time.perf_counter()
+        try:
+            with open(self._path(project_id, "base"), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < BASE_HEADER.size:
+            return None
+        magic, epoch, meta_size = BASE_HEADER.unpack_from(data)
+        if magic != BASE_MAGIC:
+            return None
+        meta_start = BASE_HEADER.size
+        project_meta = sly.ProjectMeta.from_json(
+            json.loads(data[meta_start:meta_start + meta_size].decode("utf-8"))
+        )
+        project = load_project_data(data[meta_start + meta_size:])
+        project.reset_decayed(self.half_life)
+
+        self._replicas[project_id] = (project, epoch, LOG_HEADER.size)
+        if not self._replay(project_id, project):
+            # The base and the log are from different epochs, the publishing was interrupted.
+            self._replicas.pop(project_id, None)
+            return None
+        self._loaded += 1
+        sly.logger.info(
+            "Project with id=%s was loaded from the shared statistics in %.2f s.",
+            project_id,
+            time.perf_counter() - start_time,
+        )
+        return project_meta, project
+
+    def _publish(self, project_id: int, meta: str, project: ProjectStats) -> None:
+        """Write the base from the replica and start a new log with the next epoch.
+        The exclusive data lock of the project must be held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param meta: The JSON of the project meta.
+        :type meta: str
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        """
+        base_path = self._path(project_id, "base")
+        epoch = self._read_base_header(base_path)[1] + 1
+        meta_data = meta.encode("utf-8")
+        header = BASE_HEADER.pack(BASE_MAGIC, epoch, len(meta_data))
+        self._write_file(base_path, header + meta_data + dump_project_data(project))
+        self._write_file(self._path(project_id, "log"), LOG_HEADER.pack(LOG_MAGIC, epoch))
+        self._replicas[project_id] = (project, epoch, LOG_HEADER.size)
+        sly.logger.debug(
+            "Shared statistics of project_id=%s were published (epoch %s).",
+            project_id,
+            epoch,
+        )
+
+    @staticmethod
+    def _read_base_header(base_path: str) -> Tuple[bytes, int, int]:
+        """Read the header of the base file.
+
+        :param base_path: The path to the base file.
+        :type base_path: str
+        :return: The magic, the epoch and the size of the project meta, zeros if there is no base.
+        :rtype: Tuple[bytes, int, int]
+        """
+        try:
+            with open(base_path, "rb") as file:
+                header = file.read(BASE_HEADER.size)
+        except FileNotFoundError:
+            return b"", 0, 0
+        if len(header) < BASE_HEADER.size:
+            return b"", 0, 0
+        return BASE_HEADER.unpack(header)
+
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        """Replace the file atomically, so the file is never seen half-written.
+
+        :param path: The path to the file.
+        :type path: str
+        :param data: The content of the file.
+        :type data: bytes
+        """
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    def is_current(self, project_id: int) -> bool:
+        """Check without any locks, whether the replica has all the changes of the log.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :return: True if the replica is up to date.
+        :rtype: bool
+        """
+        replica = self._replicas.get(project_id)
+        if replica is None:
+            return False
+        _, epoch, offset = replica
+        try:
+            with open(self._path(project_id, "log"), "rb") as file:
+                header = file.read(LOG_HEADER.size)
+                size = os.fstat(file.fileno()).st_size
+        except FileNotFoundError:
+            return False
+        if len(header) < LOG_HEADER.size:
+            return False
+        return LOG_HEADER.unpack(header)[1] == epoch and size == offset
+
+    def refresh(self, project_id: int, project: ProjectStats) -> bool:
+        """Apply the new changes of the log to the replica.
+        The write lock of the project must be held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The replica of the project.
+        :type project: ProjectStats
+        :return: False if the log was started anew, so the replica must be loaded again.
+        :rtype: bool
+        """
+        with self._locked(project_id, "data", shared=True):
+            return self._replay(project_id, project)
+
+    def _replay(self, project_id: int, project: ProjectStats) -> bool:
+        """Apply the records of the log after the position of the replica.
+        The data lock of the project must be held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The replica of the project.
+        :type project: ProjectStats
+        :return: False if the replica is outdated: it was replaced by the newer replica
+            or it is from another epoch.
+        :rtype: bool
+        """
+        replica = self._replicas.get(project_id)
+        if replica is None or replica[0] is not project:
+            return False
+        _, epoch, offset = replica
+        try:
+            file = open(self._path(project_id, "log"), "rb")
+        except FileNotFoundError:
+            return False
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            if size < LOG_HEADER.size:
+                return False
+            with mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as log:
+                if LOG_HEADER.unpack_from(log)[1] != epoch:
+                    return False
+                num_records = 0
+                while offset < size:
+                    (record_size,) = RECORD_HEADER.unpack_from(log, offset)
+                    start = offset + RECORD_HEADER.size
+                    apply_record(project, json.loads(log[start:start + record_size]))
+                    offset = start + record_size
+                    num_records += 1
+        self._replicas[project_id] = (project, epoch, offset)
+        self._replayed += num_records
+        if num_records:
+            sly.logger.debug(
+                "%s changes of project_id=%s were received from other processes.",
+                num_records,
+                project_id,
+            )
+        return True
+
+    def append(
+        self,
+        project_id: int,
+        project: ProjectStats,
+        records: List[Dict[str, Any]],
+        project_meta: sly.ProjectMeta,
+    ) -> bool:
+        """Bring the replica up to date, apply the changes to it and append them to the log.
+        If the log exceeds the limit, it is merged into the base.
+        The write lock of the project must be held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The replica of the project.
+        :type project: ProjectStats
+        :param records: The changes, created by the *_record functions.
+        :type records: List[Dict[str, Any]]
+        :param project_meta: The current metadata of the project, which is written
+            to the base, if the log is merged into it.
+        :type project_meta: sly.ProjectMeta
+        :return: False if the replica must be loaded again, the changes are not applied then.
+        :rtype: bool
+        """
+        with self._locked(project_id, "data"):
+            if not self._replay(project_id, project):
+                return False
+            data = b""
+            for record in records:
+                apply_record(project, record)
+                record_data = json.dumps(record).encode("utf-8")
+                data += RECORD_HEADER.pack(len(record_data)) + record_data
+            with open(self._path(project_id, "log"), "ab") as file:
+                file.write(data)
+            _, epoch, offset = self._replicas[project_id]
+            self._replicas[project_id] = (project, epoch, offset + len(data))
+            self._appended += len(records)
+
+            if offset + len(data) > self.max_log_bytes:
+                self._compact(project_id, project, project_meta)
+        return True
+
+    def _compact(
+        self, project_id: int, project: ProjectStats, project_meta: sly.ProjectMeta
+    ) -> None:
+        """Merge the log into the base: rewrite the base from the replica with the current
+        project meta (the renamed and dropped classes are only in the log, so the meta
+        of the old base is outdated). The exponentially weighted statistics of the replica
+        are rebuilt, so they are the same as in the replicas, which will be loaded from
+        the new base. The exclusive data lock of the project must be held by the caller.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        :param project: The up to date replica of the project.
+        :type project: ProjectStats
+        :param project_meta: The current metadata of the project.
+        :type project_meta: sly.ProjectMeta
+        """
+        project.reset_decayed(self.half_life)
+        self._publish(project_id, json.dumps(project_meta.to_json()), project)
+        self._compactions += 1
+
+    def forget(self, project_id: int) -> None:
+        """Forget the replica, which was evicted from the cache.
+
+        :param project_id: The ID of the project.
+        :type project_id: int
+        """
+        self._replicas.pop(project_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the counters of the shared statistics.
+
+        :return: The metrics: number of built and loaded replicas, appended and
+            received changes and merges of the log into the base.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "built": self._built,
+            "loaded": self._loaded,
+            "appended": self._appended,
+            "received": self._replayed,
+            "compactions": self._compactions,
+        }
@@ -0,0 +1,1333 @@
+import itertools
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.features import LabelFeatures
+from src.meta import CompiledMeta
+from src.store import LabelStore
+from src.sync import ReadWriteLock
+
+# Approximate memory used by one image row of the LabelCountIndex, by one ClassAreaStats
+# object with its key, by one update time of the image with its key and by one
+# (dataset, job) pair of the image with its key (in bytes).
+ROW_OVERHEAD_BYTES = 280
+CLASS_STATS_BYTES = 200
+UPDATED_AT_BYTES = 150
+IMAGE_SCOPE_BYTES = 150
+
+# Relative accuracy of the quantiles of the QuantileSketch and the range of the values,
+# which are kept with this accuracy (smaller and larger values fall into the edge buckets).
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_MIN_VALUE = 0.01
+SKETCH_MAX_VALUE = 1e12
+
+# Default half-life (in number of images) of the exponentially weighted statistics.
+DEFAULT_DECAY_HALF_LIFE = 500.0
+
+# Versions of the statistics are unique across all the projects and their reloads,
+# so a version never refers to different statistics.
+_versions = itertools.count(1)
+
+# Scopes of the statistics, from the parent to the child.
+PROJECT_SCOPE = "project"
+DATASET_SCOPE = "dataset"
+JOB_SCOPE = "job"
+
+
+class ClassAreaStats:
+    """Running aggregates of the label areas of one class. Labels can be added and removed
+    in O(1), so the statistics never require re-reading the whole project.
+
+    Properties:
+    - count: Number of labels.
+    - total: Sum of the areas of the labels.
+    - total_sq: Sum of the squared areas of the labels.
+    - mean: Average area of the labels.
+    - std: Standard deviation of the areas of the labels.
+
+    Methods:
+    - copy: Get an independent copy of the aggregates.
+    - add: Add the area of a label to the aggregates.
+    - remove: Remove the area of a label from the aggregates.
+    """
+
+    __slots__ = ("count", "total", "total_sq")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def copy(self) -> "ClassAreaStats":
+        """Get an independent copy of the aggregates.
+
+        :return: The copy of the aggregates.
+        :rtype: ClassAreaStats
+        """
+        stats = ClassAreaStats()
+        stats.count = self.count
+        stats.total = self.total
+        stats.total_sq = self.total_sq
+        return stats
+
+    def add(self, area: float) -> None:
+        """Add the area of a label to the aggregates.
+
+        :param area: The area of the label.
+        :type area: float
+        """
+        self.count += 1
+        self.total += area
+        self.total_sq += area * area
+
+    def remove(self, area: float) -> None:
+        """Remove the area of a label from the aggregates.
+
+        :param area: The area of the label.
+        :type area: float
+        """
+        self.count -= 1
+        if self.count <= 0:
+            # Reset the sums to avoid accumulating floating point errors.
+            self.count = 0
+            self.total = 0.0
+            self.total_sq = 0.0
+            return
+        self.total -= area
+        self.total_sq -= area * area
+
+    @property
+    def mean(self) -> float:
+        """Average area of the labels.
+
+        :return: The average area, 0 if there are no labels.
+        :rtype: float
+        """
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    @property
+    def std(self) -> float:
+        """Standard deviation of the areas of the labels.
+
+        :return: The standard deviation, 0 if there are no labels.
+        :rtype: float
+        """
+        if self.count == 0:
+            return 0.0
+        variance = self.total_sq / self.count - self.mean**2
+        return math.sqrt(max(variance, 0.0))
+
+
+class QuantileSketch:
+    """Streaming quantile sketch of non-negative values with relative accuracy: a histogram
+    with logarithmic buckets (as in DDSketch), each value x is counted in the bucket
+    ceil(log(x) / log(gamma)). Unlike t-digest or P², the values can be removed
+    as well as added, in O(1), and the memory is fixed (about 6 KB), regardless
+    of the number of values. Any quantile (e.g. median or quartiles) is obtained within
+    the relative accuracy in one vectorized pass over the buckets.
+
+    Properties:
+    - count: Number of the values.
+
+    Methods:
+    - copy: Get an independent copy of the sketch.
+    - add: Add the value to the sketch.
+    - remove: Remove the value from the sketch.
+    - merge: Add all the values of another sketch.
+    - quantile: Get the quantile of the values.
+    - quantiles: Get the quantiles of the values.
+    """
+
+    __slots__ = ("count", "_zero_count", "_buckets")
+
+    GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+    _LOG_GAMMA = math.log(GAMMA)
+    _OFFSET = math.ceil(math.log(SKETCH_MIN_VALUE) / _LOG_GAMMA)
+    NUM_BUCKETS = math.ceil(math.log(SKETCH_MAX_VALUE) / _LOG_GAMMA) - _OFFSET + 1
+    NBYTES = NUM_BUCKETS * 4 + 100
+
+    def __init__(self):
+        self.count = 0
+        self._zero_count = 0
+        self._buckets = np.zeros(self.NUM_BUCKETS, dtype=np.int32)
+
+    def copy(self) -> "QuantileSketch":
+        """Get an independent copy of the sketch.
+
+        :return: The copy of the sketch.
+        :rtype: QuantileSketch
+        """
+        sketch = QuantileSketch()
+        sketch.merge(self)
+        return sketch
+
+    def _bucket(self, value: float) -> int:
+        """Get the index of the bucket of the positive value.
+
+        :param value: The value.
+        :type value: float
+        :return: The index of the bucket.
+        :rtype: int
+        """
+        idx = math.ceil(math.log(value) / self._LOG_GAMMA) - self._OFFSET
+        return min(max(idx, 0), self.NUM_BUCKETS - 1)
+
+    def add(self, value: float) -> None:
+        """Add the value to the sketch.
+
+        :param value: The value.
+        :type value: float
+        """
+        self.count += 1
+        if value <= 0:
+            self._zero_count += 1
+        else:
+            self._buckets[self._bucket(value)] += 1
+
+    def remove(self, value: float) -> None:
+        """Remove the value, which was added before, from the sketch.
+
+        :param value: The value.
+        :type value: float
+        """
+        if value <= 0:
+            if self._zero_count == 0:
+                return
+            self._zero_count -= 1
+        else:
+            idx = self._bucket(value)
+            if self._buckets[idx] == 0:
+                return
+            self._buckets[idx] -= 1
+        self.count -= 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add all the values of another sketch.
+
+        :param other: The other sketch.
+        :type other: QuantileSketch
+        """
+        self.count += other.count
+        self._zero_count += other._zero_count
+        self._buckets += other._buckets
+
+    def quantile(self, q: float) -> float:
+        """Get the quantile of the values.
+
+        :param q: The quantile, in [0, 1] (0.5 for the median).
+        :type q: float
+        :return: The quantile within the relative accuracy, 0 if there are no values.
+        :rtype: float
+        """
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs: Sequence[float]) -> Tuple[float, ...]:
+        """Get the quantiles of the values in one pass over the buckets.
+
+        :param qs: The quantiles, in [0, 1].
+        :type qs: Sequence[float]
+        :return: The quantiles within the relative accuracy, 0 if there are no values.
+        :rtype: Tuple[float, ...]
+        """
+        if self.count == 0:
+            return tuple(0.0 for _ in qs)
+        cumulative = np.cumsum(self._buckets)
+        result = []
+        for q in qs:
+            rank = q * (self.count - 1)
+            if rank < self._zero_count:
+                result.append(0.0)
+                continue
+            idx = int(np.searchsorted(cumulative, rank - self._zero_count, side="right"))
+            idx = min(idx, self.NUM_BUCKETS - 1) + self._OFFSET
+            # The middle of the bucket (gamma^(i-1), gamma^i] in terms of relative error.
+            result.append(2 * self.GAMMA**idx / (self.GAMMA + 1))
+        return tuple(result)
+
+
+class DecayedClassStats:
+    """Exponentially weighted aggregates of the label areas and of the number of labels
+    per image of one class. The weight of each image halves every `half_life` images
+    added to the project after it. The sums are kept relative to the tick (number of the
+    image in the project) of the last update and are decayed lazily, when the class
+    is updated again, so adding an image costs O(1) and the classes absent on the image
+    are not touched.
+
+    Properties:
+    - tick: Tick of the project, to which the sums are decayed.
+    - area_weight: Sum of the weights of the labels.
+    - area_total: Weighted sum of the areas of the labels.
+    - count_weight: Sum of the weights of the images containing the class.
+    - count_total: Weighted sum of the number of labels on the images containing the class.
+    - area_mean: Weighted average area of the labels.
+    - count_mean: Weighted average number of labels per image containing the class.
+
+    Methods:
+    - copy: Get an independent copy of the aggregates.
+    - decay_to: Decay the sums to the given tick.
+    - add_image: Add the labels of the class on one image.
+    - merge: Add the aggregates of another class.
+    """
+
+    __slots__ = ("tick", "area_weight", "area_total", "count_weight", "count_total")
+
+    def __init__(self, tick: int = 0):
+        self.tick = tick
+        self.area_weight = 0.0
+        self.area_total = 0.0
+        self.count_weight = 0.0
+        self.count_total = 0.0
+
+    def copy(self) -> "DecayedClassStats":
+        """Get an independent copy of the aggregates.
+
+        :return: The copy of the aggregates.
+        :rtype: DecayedClassStats
+        """
+        stats = DecayedClassStats(self.tick)
+        stats.area_weight = self.area_weight
+        stats.area_total = self.area_total
+        stats.count_weight = self.count_weight
+        stats.count_total = self.count_total
+        return stats
+
+    def decay_to(self, tick: int, half_life: float) -> None:
+        """Decay the sums to the given tick of the project.
+
+        :param tick: The tick of the project.
+        :type tick: int
+        :param half_life: The number of images, after which the weight of an image halves.
+        :type half_life: float
+        """
+        if tick <= self.tick:
+            return
+        factor = 0.5 ** ((tick - self.tick) / half_life)
+        self.area_weight *= factor
+        self.area_total *= factor
+        self.count_weight *= factor
+        self.count_total *= factor
+        self.tick = tick
+
+    def add_image(self, tick: int, half_life: float, areas: Sequence[float]) -> None:
+        """Add the labels of the class on the image with the given tick.
+
+        :param tick: The tick of the image in the project.
+        :type tick: int
+        :param half_life: The number of images, after which the weight of an image halves.
+        :type half_life: float
+        :param areas: The areas of the labels of the class on the image.
+        :type areas: Sequence[float]
+        """
+        self.decay_to(tick, half_life)
+        self.area_weight += len(areas)
+        self.area_total += sum(areas)
+        self.count_weight += 1.0
+        self.count_total += len(areas)
+
+    def merge(self, other: "DecayedClassStats", half_life: float) -> None:
+        """Add the aggregates of another class (e.g. when the classes are merged by renaming).
+
+        :param other: The aggregates of another class.
+        :type other: DecayedClassStats
+        :param half_life: The number of images, after which the weight of an image halves.
+        :type half_life: float
+        """
+        other = other.copy()
+        tick = max(self.tick, other.tick)
+        self.decay_to(tick, half_life)
+        other.decay_to(tick, half_life)
+        self.area_weight += other.area_weight
+        self.area_total += other.area_total
+        self.count_weight += other.count_weight
+        self.count_total += other.count_total
+
+    @property
+    def area_mean(self) -> float:
+        """Weighted average area of the labels (the decay does not change it).
+
+        :return: The average area, 0 if there are no labels.
+        :rtype: float
+        """
+        if self.area_weight <= 0:
+            return 0.0
+        return self.area_total / self.area_weight
+
+    @property
+    def count_mean(self) -> float:
+        """Weighted average number of labels per image containing the class.
+
+        :return: The average number of labels, 0 if there are no images with the class.
+        :rtype: float
+        """
+        if self.count_weight <= 0:
+            return 0.0
+        return self.count_total / self.count_weight
+
+
+class LabelCountIndex:
+    """Sparse image x class index of label counts. Each image keeps only the classes
+    present on it, while per-class totals and numbers of images containing the class
+    are kept in arrays indexed by the interned class index, so the totals and the numbers
+    of images of the class, from which its average is computed, are obtained in O(1).
+
+    Properties:
+    - class_indices: Interned indices of the class names.
+    - totals: Total number of labels of each class.
+    - image_counts: Number of images containing each class.
+    - nbytes: Approximate memory used by the index.
+
+    Methods:
+    - set_image: Set the label counts of the image.
+    - remove_image: Remove the image from the index.
+    - total: Get the total number of labels of the class.
+    - images_with_class: Get the number of images containing the class.
+    - rename_class: Rename the class.
+    - drop_class: Remove the class from all images.
+    """
+
+    def __init__(self):
+        # class_name -> index in the arrays below
+        self.class_indices: Dict[str, int] = {}
+        self.totals = np.zeros(0, dtype=np.int64)
+        self.image_counts = np.zeros(0, dtype=np.int64)
+
+        # image_id -> (class indices, label counts)
+        self._rows: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._rows_nbytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the index.
+
+        :return: The number of bytes.
+        :rtype: int
+        """
+        arrays = self.totals.nbytes + self.image_counts.nbytes
+        return arrays + self._rows_nbytes + len(self._rows) * ROW_OVERHEAD_BYTES
+
+    def _intern(self, class_name: str) -> int:
+        """Get the index of the class, growing the arrays if the class is new.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        :return: The index of the class.
+        :rtype: int
+        """
+        class_idx = self.class_indices.get(class_name)
+        if class_idx is None:
+            class_idx = len(self.class_indices)
+            self.class_indices[class_name] = class_idx
+            if class_idx >= len(self.totals):
+                # Grow the arrays geometrically to keep the amortized cost O(1).
+                size = max(8, 2 * len(self.totals))
+                self.totals = np.resize(self.totals, size)
+                self.image_counts = np.resize(self.image_counts, size)
+                self.totals[class_idx:] = 0
+                self.image_counts[class_idx:] = 0
+        return class_idx
+
+    def set_image(self, image_id: int, class_counts: Dict[str, int]) -> None:
+        """Set the label counts of the image, replacing the previous version of the image.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        :param class_counts: Number of labels of each class on the image.
+        :type class_counts: Dict[str, int]
+        """
+        self.remove_image(image_id)
+        if not class_counts:
+            return
+
+        indices = np.fromiter(
+            (self._intern(class_name) for class_name in class_counts),
+            dtype=np.int64,
+            count=len(class_counts),
+        )
+        counts = np.fromiter(
+            class_counts.values(), dtype=np.int64, count=len(class_counts)
+        )
+        self.totals[indices] += counts
+        self.image_counts[indices] += 1
+        self._rows[image_id] = (indices, counts)
+        self._rows_nbytes += indices.nbytes + counts.nbytes
+
+    def remove_image(self, image_id: int) -> None:
+        """Remove the image from the index.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        """
+        row = self._rows.pop(image_id, None)
+        if row is None:
+            return
+        indices, counts = row
+        self.totals[indices] -= counts
+        self.image_counts[indices] -= 1
+        self._rows_nbytes -= indices.nbytes + counts.nbytes
+
+    def rename_class(self, old_name: str, new_name: str) -> None:
+        """Rename the class. If the index already has a class with the new name,
+        the counts of the old class are merged into it.
+
+        :param old_name: The old name of the class.
+        :type old_name: str
+        :param new_name: The new name of the class.
+        :type new_name: str
+        """
+        if old_name not in self.class_indices:
+            return
+        if new_name not in self.class_indices:
+            self.class_indices[new_name] = self.class_indices.pop(old_name)
+            return
+
+        old_idx = self.class_indices.pop(old_name)
+        new_idx = self.class_indices[new_name]
+        for image_id, (indices, counts) in list(self._rows.items()):
+            if old_idx not in indices:
+                continue
+            class_counts = dict(zip(indices.tolist(), counts.tolist()))
+            count = class_counts.pop(old_idx)
+            class_counts[new_idx] = class_counts.get(new_idx, 0) + count
+            self._replace_row(image_id, class_counts)
+
+    def drop_class(self, class_name: str) -> None:
+        """Remove the class from all images.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        """
+        class_idx = self.class_indices.get(class_name)
+        if class_idx is None:
+            return
+        for image_id, (indices, counts) in list(self._rows.items()):
+            if class_idx not in indices:
+                continue
+            class_counts = dict(zip(indices.tolist(), counts.tolist()))
+            class_counts.pop(class_idx)
+            self._replace_row(image_id, class_counts)
+
+    def _replace_row(self, image_id: int, class_counts: Dict[int, int]) -> None:
+        """Replace the row of the image with the given counts of the class indices.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        :param class_counts: Class index -> number of labels of the class on the image.
+        :type class_counts: Dict[int, int]
+        """
+        self.remove_image(image_id)
+        if not class_counts:
+            return
+        indices = np.fromiter(class_counts, dtype=np.int64, count=len(class_counts))
+        counts = np.fromiter(
+            class_counts.values(), dtype=np.int64, count=len(class_counts)
+        )
+        self.totals[indices] += counts
+        self.image_counts[indices] += 1
+        self._rows[image_id] = (indices, counts)
+        self._rows_nbytes += indices.nbytes + counts.nbytes
+
+    def total(self, class_name: str) -> int:
+        """Get the total number of labels of the class.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        :return: The total number of labels of the class.
+        :rtype: int
+        """
+        class_idx = self.class_indices.get(class_name)
+        if class_idx is None:
+            return 0
+        return int(self.totals[class_idx])
+
+    def images_with_class(self, class_name: str) -> int:
+        """Get the number of images containing at least one label of the class.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        :return: The number of images containing the class.
+        :rtype: int
+        """
+        class_idx = self.class_indices.get(class_name)
+        if class_idx is None:
+            return 0
+        return int(self.image_counts[class_idx])
+
+
+class ScopeStats:
+    """Running aggregates of the labels of the images in one scope (dataset or labeling job)
+    of the project: label areas and the number of labels of each class, the number
+    of images containing it, their quantile sketches and exponentially weighted statistics.
+    Images are added and removed in O(labels on the image). The weighted statistics
+    are decayed by the images added to the scope, not to the whole project.
+
+    Properties:
+    - area_stats: Class name -> running aggregates of the label areas.
+    - area_sketches: Class name -> quantile sketch of the label areas.
+    - label_totals: Class name -> total number of labels of the class.
+    - image_counts: Class name -> number of images containing the class.
+    - count_sketches: Class name -> quantile sketch of the number of labels of the class
+      per image containing it.
+    - decayed: Class name -> exponentially weighted statistics of the class.
+    - tick: Number of images added to the exponentially weighted statistics of the scope.
+    - num_images: Number of images in the scope.
+
+    Methods:
+    - add_image: Add the labels of the image.
+    - remove_image: Remove the labels of the image.
+    - rename_class: Rename the class.
+    - drop_class: Remove the class.
+    """
+
+    __slots__ = (
+        "area_stats",
+        "area_sketches",
+        "label_totals",
+        "image_counts",
+        "count_sketches",
+        "decayed",
+        "tick",
+        "num_images",
+    )
+
+    def __init__(self):
+        self.area_stats: Dict[str, ClassAreaStats] = defaultdict(ClassAreaStats)
+        self.area_sketches: Dict[str, QuantileSketch] = defaultdict(QuantileSketch)
+        self.label_totals: Dict[str, int] = Counter()
+        self.image_counts: Dict[str, int] = Counter()
+        self.count_sketches: Dict[str, QuantileSketch] = defaultdict(QuantileSketch)
+        self.decayed: Dict[str, DecayedClassStats] = {}
+        self.tick = 0
+        self.num_images = 0
+
+    def add_image(
+        self, class_areas: Dict[str, List[float]], half_life: float = DEFAULT_DECAY_HALF_LIFE
+    ) -> None:
+        """Add the labels of the image.
+
+        :param class_areas: Class name -> areas of the labels of the class on the image.
+        :type class_areas: Dict[str, List[float]]
+        :param half_life: The number of images, after which the weight of an image halves.
+        :type half_life: float
+        """
+        self.num_images += 1
+        self.tick += 1
+        for class_name, areas in class_areas.items():
+            class_stats = self.area_stats[class_name]
+            area_sketch = self.area_sketches[class_name]
+            for area in areas:
+                class_stats.add(area)
+                area_sketch.add(area)
+            self.label_totals[class_name] += len(areas)
+            self.image_counts[class_name] += 1
+            self.count_sketches[class_name].add(len(areas))
+            decayed = self.decayed.get(class_name)
+            if decayed is None:
+                decayed = self.decayed[class_name] = DecayedClassStats(self.tick)
+            decayed.add_image(self.tick, half_life, areas)
+
+    def remove_image(self, class_areas: Dict[str, List[float]]) -> None:
+        """Remove the labels of the image, which was added before. As in the project
+        statistics, the image is not subtracted from the weighted statistics: it decays
+        as any other past image.
+
+        :param class_areas: Class name -> areas of the labels of the class on the image.
+        :type class_areas: Dict[str, List[float]]
+        """
+        self.num_images -= 1
+        for class_name, areas in class_areas.items():
+            class_stats = self.area_stats[class_name]
+            area_sketch = self.area_sketches[class_name]
+            for area in areas:
+                class_stats.remove(area)
+                area_sketch.remove(area)
+            self.label_totals[class_name] -= len(areas)
+            self.image_counts[class_name] -= 1
+            self.count_sketches[class_name].remove(len(areas))
+            if self.image_counts[class_name] <= 0:
+                self.area_stats.pop(class_name, None)
+                self.area_sketches.pop(class_name, None)
+                self.label_totals.pop(class_name, None)
+                self.image_counts.pop(class_name, None)
+                self.count_sketches.pop(class_name, None)
+
+    def rename_class(
+        self, old_name: str, new_name: str, half_life: float = DEFAULT_DECAY_HALF_LIFE
+    ) -> None:
+        """Rename the class, merging it into the class with the new name, if it exists.
+
+        :param old_name: The old name of the class.
+        :type old_name: str
+        :param new_name: The new name of the class.
+        :type new_name: str
+        :param half_life: The number of images, after which the weight of an image halves.
+        :type half_life: float
+        """
+        old_decayed = self.decayed.pop(old_name, None)
+        if old_decayed is not None:
+            if new_name in self.decayed:
+                self.decayed[new_name].merge(old_decayed, half_life)
+            else:
+                self.decayed[new_name] = old_decayed
+        old_stats = self.area_stats.pop(old_name, None)
+        if old_stats is None:
+            return
+        new_stats = self.area_stats[new_name]
+        new_stats.count += old_stats.count
+        new_stats.total += old_stats.total
+        new_stats.total_sq += old_stats.total_sq
+        for sketches in (self.area_sketches, self.count_sketches):
+            old_sketch = sketches.pop(old_name, None)
+            if old_sketch is not None:
+                sketches[new_name].merge(old_sketch)
+        self.label_totals[new_name] += self.label_totals.pop(old_name, 0)
+        self.image_counts[new_name] += self.image_counts.pop(old_name, 0)
+
+    def drop_class(self, class_name: str) -> None:
+        """Remove all the labels of the class.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        """
+        self.area_stats.pop(class_name, None)
+        self.area_sketches.pop(class_name, None)
+        self.label_totals.pop(class_name, None)
+        self.image_counts.pop(class_name, None)
+        self.count_sketches.pop(class_name, None)
+        self.decayed.pop(class_name, None)
+
+
+class StatsSnapshot:
+    """Snapshot of the project statistics for the classes of one image. It is taken once
+    per event, so all test cases compare the image against the same statistics, even if
+    the cache is updated in the meantime. The classes are addressed by their IDs
+    in the compiled project meta.
+
+    :param area_stats: Class ID -> area statistics of the class.
+    :type area_stats: Dict[int, ClassAreaStats]
+    :param label_counts: Class ID -> (total number of labels, number of images with class).
+    :type label_counts: Dict[int, Tuple[int, int]]
+    :param area_sketches: Class ID -> quantile sketch of the label areas of the class.
+    :type area_sketches: Dict[int, QuantileSketch]
+    :param count_sketches: Class ID -> quantile sketch of the number of labels of the class
+        per image containing it.
+    :type count_sketches: Dict[int, QuantileSketch]
+    :param decayed: Class ID -> exponentially weighted statistics of the class,
+        decayed to the current tick of the project.
+    :type decayed: Dict[int, DecayedClassStats]
+    :param scopes: Class ID -> scopes ("project", "dataset" or "job"), from which
+        the area statistics and the label counts of the class were taken.
+    :type scopes: Dict[int, Tuple[str, str]]
+    :param version: Version of the project statistics, from which the snapshot was taken.
+    :type version: int
+
+    Properties:
+    - version: Version of the project statistics, from which the snapshot was taken.
+
+    Methods:
+    - use_shared_area_stats: Replace the project area statistics with the shared aggregates.
+    - get_area_stats: Get the area statistics of the class.
+    - area_quantiles: Get the quantiles of the label areas of the class.
+    - images_with_class: Get the number of images containing the class.
+    - average_label_count: Get the average number of labels of the class per image.
+    - label_count_quantiles: Get the quantiles of the number of labels of the class per image.
+    - get_decayed_stats: Get the exponentially weighted statistics of the class.
+    - get_scopes: Get the scopes of the area statistics and the label counts of the class.
+    """
+
+    def __init__(
+        self,
+        area_stats: Dict[int, ClassAreaStats],
+        label_counts: Dict[int, Tuple[int, int]],
+        area_sketches: Optional[Dict[int, QuantileSketch]] = None,
+        count_sketches: Optional[Dict[int, QuantileSketch]] = None,
+        decayed: Optional[Dict[int, DecayedClassStats]] = None,
+        scopes: Optional[Dict[int, Tuple[str, str]]] = None,
+        version: int = 0,
+    ):
+        self._area_stats = area_stats
+        self._label_counts = label_counts
+        self._area_sketches = area_sketches or {}
+        self._count_sketches = count_sketches or {}
+        self._decayed = decayed or {}
+        self._scopes = scopes or {}
+        self.version = version
+
+    @classmethod
+    def take(
+        cls,
+        project: "ProjectStats",
+        compiled_meta: CompiledMeta,
+        class_ids: Iterable[int],
+        scopes: Sequence[Tuple[str, int]] = (),
+        min_samples: int = 0,
+    ) -> "StatsSnapshot":
+        """Copy the statistics of the given classes. Class names are looked up
+        only here, once per class. The statistics of the label areas (aggregates, quantile
+        sketch and the weighted area) and of the label counts (totals, quantile sketch
+        and the weighted count) are taken from the first of the given scopes, which has
+        enough samples of the class, and from the whole project, if none of them has.
+
+        :param project: The statistics of the project.
+        :type project: ProjectStats
+        :param compiled_meta: The compiled metadata of the project.
+        :type compiled_meta: CompiledMeta
+        :param class_ids: The IDs of the classes to copy the statistics for.
+        :type class_ids: Iterable[int]
+        :param scopes: The scopes (type, ID) to take the statistics from, from the child
+            to the parent, e.g. [("job", 1), ("dataset", 2)].
+        :type scopes: Sequence[Tuple[str, int]]
+        :param min_samples: The minimum number of labels (for the areas) or images
+            (for the label counts) of the class in the scope to use it.
+        :type min_samples: int
+        :return: The snapshot of the statistics.
+        :rtype: StatsSnapshot
+        """
+        scope_stats = [
+            (scope[0], project.scopes[scope]) for scope in scopes if scope in project.scopes
+        ]
+
+        snapshot_area_stats = {}
+        snapshot_label_counts = {}
+        snapshot_area_sketches = {}
+        snapshot_count_sketches = {}
+        snapshot_decayed = {}
+        snapshot_scopes = {}
+        for class_id in set(class_ids):
+            if not 0 <= class_id < compiled_meta.num_classes:
+                continue
+            class_name = compiled_meta.class_names[class_id]
+
+            area_scope, area_source = PROJECT_SCOPE, project
+            for scope_type, stats in scope_stats:
+                scoped = stats.area_stats.get(class_name)
+                if scoped is not None and scoped.count >= max(min_samples, 1):
+                    area_scope, area_source = scope_type, stats
+                    break
+            class_stats = area_source.area_stats.get(class_name)
+            snapshot_area_stats[class_id] = (
+                class_stats.copy() if class_stats is not None else ClassAreaStats()
+            )
+
+            count_scope, count_source = PROJECT_SCOPE, project
+            label_counts = (
+                project.label_counts.total(class_name),
+                project.label_counts.images_with_class(class_name),
+            )
+            for scope_type, stats in scope_stats:
+                images_with_class = stats.image_counts.get(class_name, 0)
+                if images_with_class >= max(min_samples, 1):
+                    count_scope, count_source = scope_type, stats
+                    label_counts = (stats.label_totals[class_name], images_with_class)
+                    break
+            snapshot_label_counts[class_id] = label_counts
+            snapshot_scopes[class_id] = (area_scope, count_scope)
+            for sketches, snapshot_sketches in (
+                (area_source.area_sketches, snapshot_area_sketches),
+                (count_source.count_sketches, snapshot_count_sketches),
+            ):
+                sketch = sketches.get(class_name)
+                snapshot_sketches[class_id] = (
+                    sketch.copy() if sketch is not None else QuantileSketch()
+                )
+
+            # The weighted area is taken from the scope of the areas and the weighted
+            # number of labels from the scope of the counts, each decayed to its scope.
+            decayed = DecayedClassStats(project.tick)
+            for source, fields in (
+                (area_source, ("area_weight", "area_total")),
+                (count_source, ("count_weight", "count_total")),
+            ):
+                source_decayed = source.decayed.get(class_name)
+                if source_decayed is None:
+                    continue
+                source_decayed = source_decayed.copy()
+                source_decayed.decay_to(source.tick, project.half_life)
+                for field in fields:
+                    setattr(decayed, field, getattr(source_decayed, field))
+            snapshot_decayed[class_id] = decayed
+        return cls(
+            snapshot_area_stats,
+            snapshot_label_counts,
+            snapshot_area_sketches,
+            snapshot_count_sketches,
+            snapshot_decayed,
+            snapshot_scopes,
+            project.version,
+        )
+
+    def use_shared_area_stats(
+        self, class_stats: Dict[int, Tuple[int, float, float]]
+    ) -> None:
+        """Replace the project area statistics of the classes with the aggregates shared
+        by all sessions of the app. The statistics taken from a dataset or a labeling job
+        are kept. The version of the snapshot is changed, so the results of the test cases
+        computed with the previous aggregates are not reused.
+
+        :param class_stats: Class ID -> number of labels, sum of the areas and sum
+            of the squared areas of the class in the whole project.
+        :type class_stats: Dict[int, Tuple[int, float, float]]
+        """
+        used = []
+        for class_id, (count, total, total_sq) in sorted(class_stats.items()):
+            if self.get_scopes(class_id)[0] != PROJECT_SCOPE:
+                continue
+            stats = ClassAreaStats()
+            stats.count, stats.total, stats.total_sq = count, total, total_sq
+            self._area_stats[class_id] = stats
+            used.append((class_id, count, total, total_sq))
+        if used:
+            self.version = hash((self.version, tuple(used)))
+
+    def get_area_stats(self, class_id: int) -> ClassAreaStats:
+        """Get the area statistics of the class.
+
+        :param class_id: The ID of the class.
+        :type class_id: int
+        :return: The area statistics of the class (empty if the class is not in the snapshot).
+        :rtype: ClassAreaStats
+        """
+        return self._area_stats.get(class_id, ClassAreaStats())
+
+    def area_quantiles(self, class_id: int, qs: Sequence[float]) -> Tuple[float, ...]:
+        """Get the quantiles of the label areas of the class.
+
+        :param class_id: The ID of the class.
+        :type class_id: int
+        :param qs: The quantiles, in [0, 1].
+        :type qs: Sequence[float]
+        :return: The quantiles (zeros if the class is not in the snapshot).
+        :rtype: Tuple[float, ...]
+        """
+        return self._area_sketches.get(class_id, QuantileSketch()).quantiles(qs)
+
+    def images_with_class(self, class_id: int) -> int:
+        """Get the number of images containing at least one label of the class.
+
+        :param class_id: The ID of the class.
+        :type class_id: int
+        :return: The number of images containing the class.
+        :rtype: int
+        """
+        return self._label_counts.get(class_id, (0, 0))[1]
+
+    def average_label_count(self, class_id: int) -> float:
+        """Get the average number of labels of the class per image containing the class.
+
+        :param class_id: The ID of the class.
+        :type class_id: int
+        :return: The average number of labels, 0 if no images contain the class.
+        :rtype: float
+        """
+        total, number_of_images = self._label_counts.get(class_id, (0, 0))
+        if number_of_images == 0:
+            return 0.0
+        return total / number_of_images
+
+    def label_count_quantiles(
+        self, class_id: int, qs: Sequence[float]
+    ) -> Tuple[float, ...]:
+        """Get the quantiles of the number of labels of the class per image containing it.
+
+        :param class_id: The ID of the class.
+        :type class_id: int
+        :param qs: The quantiles, in [0, 1].
+        :type qs: Sequence[float]
+        :return: The quantiles (zeros if the class is not in the snapshot).
+        :rtype: Tuple[float, ...]
+        """
+        return self._count_sketches.get(class_id, QuantileSketch()).quantiles(qs)
+
+    def get_decayed_stats(self, class_id: int) -> DecayedClassStats:
+        """Get the exponentially weighted statistics of the class. The weights are decayed
+        to the moment of the snapshot, so they show how many recent labels (images) the
+        averages are based on.
+
+        :param class_id: The ID of the class.
+        :type class_id: int
+        :return: The exponentially weighted statistics (empty if the class is not in the snapshot).
+        :rtype: DecayedClassStats
+        """
+        return self._decayed.get(class_id, DecayedClassStats())
+
+    def get_scopes(self, class_id: int) -> Tuple[str, str]:
+        """Get the scopes, from which the area statistics and the label counts
+        of the class were taken.
+
+        :param class_id: The ID of the class.
+        :type class_id: int
+        :return: The scopes of the area statistics and of the label counts.
+        :rtype: Tuple[str, str]
+        """
+        return self._scopes.get(class_id, (PROJECT_SCOPE, PROJECT_SCOPE))
+
+
+class ProjectStats:
+    """All cached label features and statistics of one project. The statistics are always
+    changed together, image by image, so they stay consistent with each other.
+    Access from concurrent events must be guarded by the lock of the project.
+
+    Properties:
+    - store: Columnar store of the label features.
+    - area_stats: Class name -> running aggregates of the label areas.
+    - area_sketches: Class name -> quantile sketch of the label areas.
+    - label_counts: Image x class index of the label counts.
+    - count_sketches: Class name -> quantile sketch of the number of labels of the class
+      per image containing it.
+    - updated_at: Image ID -> last seen update time of the image.
+    - decayed: Class name -> exponentially weighted statistics of the class.
+    - tick: Number of images added to the exponentially weighted statistics.
+    - half_life: Half-life (in number of images) of the exponentially weighted statistics.
+    - scopes: (scope type, ID) -> aggregates of the labels in the dataset or labeling job.
+    - image_scopes: Image ID -> (dataset ID, labeling job ID) of the image.
+    - version: Version of the statistics, changed by every change of them.
+    - lock: Read/write lock of the project.
+    - nbytes: Approximate memory used by the statistics of the project.
+
+    Methods:
+    - set_image: Set the labels of the image, replacing its previous version.
+    - reset_decayed: Rebuild the exponentially weighted statistics in the order of updates.
+    - remove_image: Remove the labels of the image.
+    - rename_class: Rename the class in all the statistics.
+    - drop_class: Remove all the labels of the class from the statistics.
+    - snapshot: Get the snapshot of the statistics for the given classes.
+    """
+
+    def __init__(self):
+        self.store = LabelStore()
+        self.area_stats: Dict[str, ClassAreaStats] = defaultdict(ClassAreaStats)
+        self.area_sketches: Dict[str, QuantileSketch] = defaultdict(QuantileSketch)
+        self.label_counts = LabelCountIndex()
+        self.count_sketches: Dict[str, QuantileSketch] = defaultdict(QuantileSketch)
+        self.updated_at: Dict[int, Optional[str]] = {}
+        self.decayed: Dict[str, DecayedClassStats] = {}
+        self.tick = 0
+        self.half_life = DEFAULT_DECAY_HALF_LIFE
+        self.scopes: Dict[Tuple[str, int], ScopeStats] = {}
+        self.image_scopes: Dict[int, Tuple[Optional[int], Optional[int]]] = {}
+        self.version = next(_versions)
+        self.lock = ReadWriteLock()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the features and statistics of the project.
+
+        :return: The number of bytes.
+        :rtype: int
+        """
+        num_class_stats = len(self.area_stats) + len(self.decayed)
+        num_sketches = len(self.area_sketches) + len(self.count_sketches)
+        for scope in self.scopes.values():
+            num_class_stats += len(scope.area_stats) + len(scope.decayed)
+            num_sketches += len(scope.area_sketches) + len(scope.count_sketches)
+        class_stats = num_class_stats * CLASS_STATS_BYTES
+        sketches = num_sketches * QuantileSketch.NBYTES
+        updated_at = len(self.updated_at) * UPDATED_AT_BYTES
+        image_scopes = len(self.image_scopes) * IMAGE_SCOPE_BYTES
+        return (
+            self.store.nbytes
+            + self.label_counts.nbytes
+            + class_stats
+            + sketches
+            + updated_at
+            + image_scopes
+        )
+
+    def set_image(
+        self,
+        image_id: int,
+        features: Sequence[LabelFeatures],
+        updated_at: Optional[str] = None,
+        dataset_id: Optional[int] = None,
+        job_id: Optional[int] = None,
+    ) -> None:
+        """Set the labels of the image, subtracting its previous version first.
+        The labels are added to the statistics of the project and of the dataset and
+        the labeling job of the image, so each scope is updated incrementally.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        :param features: The features of the labels of the image.
+        :type features: Sequence[LabelFeatures]
+        :param updated_at: The update time of the image.
+        :type updated_at: Optional[str]
+        :param dataset_id: The ID of the dataset of the image, the previous one if not set.
+        :type dataset_id: Optional[int]
+        :param job_id: The ID of the labeling job of the image, the previous one if not set.
+        :type job_id: Optional[int]
+        """
+        previous_dataset_id, previous_job_id = self.image_scopes.get(image_id, (None, None))
+        dataset_id = dataset_id if dataset_id is not None else previous_dataset_id
+        job_id = job_id if job_id is not None else previous_job_id
+
+        self.remove_image(image_id)
+        self.updated_at[image_id] = updated_at
+        self.version = next(_versions)
+
+        self.store.set_image(image_id, features)
+        for feature in features:
+            self.area_stats[feature.class_name].add(feature.area)
+            self.area_sketches[feature.class_name].add(feature.area)
+        class_counts = Counter(feature.class_name for feature in features)
+        for class_name, count in class_counts.items():
+            self.count_sketches[class_name].add(count)
+        self.label_counts.set_image(image_id, class_counts)
+
+        class_areas = defaultdict(list)
+        for feature in features:
+            class_areas[feature.class_name].append(feature.area)
+
+        if dataset_id is not None or job_id is not None:
+            self.image_scopes[image_id] = (dataset_id, job_id)
+            for scope in self._image_scope_keys(dataset_id, job_id):
+                scope_stats = self.scopes.get(scope)
+                if scope_stats is None:
+                    scope_stats = self.scopes[scope] = ScopeStats()
+                scope_stats.add_image(class_areas, self.half_life)
+
+        # The new version of the image is the most recent one, the previous versions
+        # are not subtracted: they decay as any other past image.
+        self.tick += 1
+        for class_name, areas in class_areas.items():
+            decayed = self.decayed.get(class_name)
+            if decayed is None:
+                decayed = self.decayed[class_name] = DecayedClassStats(self.tick)
+            decayed.add_image(self.tick, self.half_life, areas)
+
+    @staticmethod
+    def _image_scope_keys(
+        dataset_id: Optional[int], job_id: Optional[int]
+    ) -> List[Tuple[str, int]]:
+        """Get the keys of the scopes of the image.
+
+        :param dataset_id: The ID of the dataset of the image.
+        :type dataset_id: Optional[int]
+        :param job_id: The ID of the labeling job of the image.
+        :type job_id: Optional[int]
+        :return: The keys (scope type, ID) of the scopes.
+        :rtype: List[Tuple[str, int]]
+        """
+        keys = []
+        if dataset_id is not None:
+            keys.append((DATASET_SCOPE, dataset_id))
+        if job_id is not None:
+            keys.append((JOB_SCOPE, job_id))
+        return keys
+
+    def reset_decayed(self, half_life: float) -> None:
+        """Rebuild the exponentially weighted statistics of the project and of its scopes
+        from the cached labels, adding the images in the order of their update times
+        (the warm-up downloads them in an arbitrary order). Runs in one vectorized pass
+        over the store for the project and for each type of the scopes.
+
+        :param half_life: The number of images, after which the weight of an image halves.
+        :type half_life: float
+        """
+        self.half_life = half_life
+        self.version = next(_versions)
+        image_ids = sorted(self.updated_at, key=lambda i: self.updated_at[i] or "")
+        self.tick = len(image_ids)
+        self.decayed = {}
+        for scope_stats in self.scopes.values():
+            scope_stats.decayed = {}
+            scope_stats.tick = 0
+        if not image_ids:
+            return
+
+        self.decayed = self._build_decayed(
+            image_ids, np.zeros(len(image_ids), dtype=np.int64), 1
+        )[0][0]
+        for scope_type, scope_idx in ((DATASET_SCOPE, 0), (JOB_SCOPE, 1)):
+            # Each image is in at most one scope of the type.
+            scope_keys = []
+            group_of_scope = {}
+            image_groups = np.full(len(image_ids), -1, dtype=np.int64)
+            for position, image_id in enumerate(image_ids):
+                scope_id = self.image_scopes.get(image_id, (None, None))[scope_idx]
+                if scope_id is None or (scope_type, scope_id) not in self.scopes:
+                    continue
+                group = group_of_scope.get(scope_id)
+                if group is None:
+                    group = group_of_scope[scope_id] = len(scope_keys)
+                    scope_keys.append((scope_type, scope_id))
+                image_groups[position] = group
+            if not scope_keys:
+                continue
+            decayed, ticks = self._build_decayed(image_ids, image_groups, len(scope_keys))
+            for group, scope in enumerate(scope_keys):
+                self.scopes[scope].decayed = decayed[group]
+                self.scopes[scope].tick = ticks[group]
+
+    def _build_decayed(
+        self, image_ids: Sequence[int], image_groups: np.ndarray, num_groups: int
+    ) -> Tuple[List[Dict[str, DecayedClassStats]], List[int]]:
+        """Build the exponentially weighted statistics of the groups of the images
+        (e.g. of the datasets). The images of each group are weighted by their order
+        in the group, relative to the last image of the group.
+
+        :param image_ids: The IDs of the images in the order of their updates.
+        :type image_ids: Sequence[int]
+        :param image_groups: The index of the group of each image, -1 if it is in no group.
+        :type image_groups: np.ndarray
+        :param num_groups: The number of the groups.
+        :type num_groups: int
+        :return: Class name -> weighted statistics of each group and the tick of each group.
+        :rtype: Tuple[List[Dict[str, DecayedClassStats]], List[int]]
+        """
+        half_life = self.half_life
+        # Tick of each image in its group (1 for the oldest image of the group).
+        image_ticks = np.zeros(len(image_ids), dtype=np.int64)
+        grouped = np.flatnonzero(image_groups >= 0)
+        by_group = grouped[np.argsort(image_groups[grouped], kind="stable")]
+        group_ticks = np.bincount(image_groups[grouped], minlength=num_groups)
+        group_starts = np.cumsum(group_ticks) - group_ticks
+        image_ticks[by_group] = (
+            np.arange(len(by_group)) - np.repeat(group_starts, group_ticks) + 1
+        )
+
+        image_id_column = self.store.column("image_id")
+        class_idx_column = self.store.column("class_idx")
+        area_column = self.store.column("area")
+        order = np.asarray(image_ids, dtype=np.int64)
+        sorter = np.argsort(order)
+        # Position of the image of each row in the order of the updates.
+        row_images = sorter[np.searchsorted(order, image_id_column, sorter=sorter)]
+        row_groups = image_groups[row_images]
+        in_group = row_groups >= 0
+        row_images = row_images[in_group]
+        row_groups = row_groups[in_group]
+        class_idx_column = class_idx_column[in_group]
+        area_column = area_column[in_group]
+        # The rows are weighted relative to the current tick of their group.
+        weights = 0.5 ** ((group_ticks[row_groups] - image_ticks[row_images]) / half_life)
+
+        num_classes = len(self.store.class_names)
+        size = num_groups * num_classes
+        keys = row_groups * num_classes + class_idx_column
+        area_weights = np.bincount(keys, weights, minlength=size)
+        area_totals = np.bincount(keys, weights * area_column, minlength=size)
+        # Rows of the same image and class are counted once for the image weights.
+        _, pair_rows, pair_counts = np.unique(
+            row_images * num_classes + class_idx_column,
+            return_index=True,
+            return_counts=True,
+        )
+        pair_keys = keys[pair_rows]
+        pair_weights = weights[pair_rows]
+        count_weights = np.bincount(pair_keys, pair_weights, minlength=size)
+        count_totals = np.bincount(pair_keys, pair_weights * pair_counts, minlength=size)
+
+        result = [{} for _ in range(num_groups)]
+        for key in np.flatnonzero(area_weights > 0).tolist():
+            group, class_idx = divmod(key, num_classes)
+            decayed = DecayedClassStats(int(group_ticks[group]))
+            decayed.area_weight = float(area_weights[key])
+            decayed.area_total = float(area_totals[key])
+            decayed.count_weight = float(count_weights[key])
+            decayed.count_total = float(count_totals[key])
+            result[group][self.store.class_names[class_idx]] = decayed
+        return result, group_ticks.tolist()
+
+    def remove_image(self, image_id: int) -> None:
+        """Remove the labels of the image from the statistics.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        """
+        self.version = next(_versions)
+        rows = self.store.image_rows(image_id)
+        class_names = self.store.class_names
+        class_areas = defaultdict(list)
+        for class_idx, area in zip(rows["class_idx"].tolist(), rows["area"].tolist()):
+            self.area_stats[class_names[class_idx]].remove(area)
+            self.area_sketches[class_names[class_idx]].remove(area)
+            class_areas[class_names[class_idx]].append(area)
+        class_indices, counts = np.unique(rows["class_idx"], return_counts=True)
+        for class_idx, count in zip(class_indices.tolist(), counts.tolist()):
+            self.count_sketches[class_names[class_idx]].remove(count)
+        self.store.remove_image(image_id)
+        self.label_counts.remove_image(image_id)
+        self.updated_at.pop(image_id, None)
+
+        image_scopes = self.image_scopes.pop(image_id, None)
+        if image_scopes is not None:
+            for scope in self._image_scope_keys(*image_scopes):
+                scope_stats = self.scopes.get(scope)
+                if scope_stats is None:
+                    continue
+                scope_stats.remove_image(class_areas)
+                if scope_stats.num_images <= 0:
+                    del self.scopes[scope]
+
+    def rename_class(self, old_name: str, new_name: str) -> None:
+        """Rename the class in all the statistics without touching the other classes.
+
+        :param old_name: The old name of the class.
+        :type old_name: str
+        :param new_name: The new name of the class.
+        :type new_name: str
+        """
+        self.version = next(_versions)
+        self.store.rename_class(old_name, new_name)
+        self.label_counts.rename_class(old_name, new_name)
+        old_stats = self.area_stats.pop(old_name, None)
+        if old_stats is not None:
+            new_stats = self.area_stats[new_name]
+            new_stats.count += old_stats.count
+            new_stats.total += old_stats.total
+            new_stats.total_sq += old_stats.total_sq
+        for sketches in (self.area_sketches, self.count_sketches):
+            old_sketch = sketches.pop(old_name, None)
+            if old_sketch is not None:
+                sketches[new_name].merge(old_sketch)
+        old_decayed = self.decayed.pop(old_name, None)
+        if old_decayed is not None:
+            if new_name in self.decayed:
+                self.decayed[new_name].merge(old_decayed, self.half_life)
+            else:
+                self.decayed[new_name] = old_decayed
+        for scope_stats in self.scopes.values():
+            scope_stats.rename_class(old_name, new_name, self.half_life)
+
+    def drop_class(self, class_name: str) -> None:
+        """Remove all the labels of the class from the statistics.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        """
+        self.version = next(_versions)
+        self.store.drop_class(class_name)
+        self.label_counts.drop_class(class_name)
+        self.area_stats.pop(class_name, None)
+        self.area_sketches.pop(class_name, None)
+        self.count_sketches.pop(class_name, None)
+        self.decayed.pop(class_name, None)
+        for scope_stats in self.scopes.values():
+            scope_stats.drop_class(class_name)
+
+    def snapshot(
+        self,
+        compiled_meta: CompiledMeta,
+        class_ids: Iterable[int],
+        scopes: Sequence[Tuple[str, int]] = (),
+        min_samples: int = 0,
+    ) -> "StatsSnapshot":
+        """Get the snapshot of the statistics for the given classes.
+
+        :param compiled_meta: The compiled metadata of the project.
+        :type compiled_meta: CompiledMeta
+        :param class_ids: The IDs of the classes in the compiled meta.
+        :type class_ids: Iterable[int]
+        :param scopes: The scopes (type, ID) to take the statistics from, from the child
+            to the parent. The project statistics are used, if none has enough samples.
+        :type scopes: Sequence[Tuple[str, int]]
+        :param min_samples: The minimum number of samples of the class in the scope to use it.
+        :type min_samples: int
+        :return: The snapshot of the statistics.
+        :rtype: StatsSnapshot
+        """
+        return StatsSnapshot.take(self, compiled_meta, class_ids, scopes, min_samples)
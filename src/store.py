@@ -0,0 +1,281 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from src.features import LabelFeatures
+
+# Name of the column -> dtype of the column.
+COLUMNS = {
+    "image_id": np.int64,
+    "class_idx": np.int32,
+    "area": np.float64,
+    "top": np.int32,
+    "left": np.int32,
+    "bottom": np.int32,
+    "right": np.int32,
+    "geometry_idx": np.int16,
+    "label_id": np.int64,
+}
+
+# Minimum capacity of the arrays (in rows).
+MIN_CAPACITY = 1024
+
+# Approximate memory used by one entry of the image -> rows index (in bytes).
+INDEX_ENTRY_BYTES = 160
+
+
+class LabelStore:
+    """Columnar store of the label features of one project. Each label is one row in the
+    contiguous NumPy arrays, the labels of each image occupy a contiguous range of rows.
+    When the image is updated, its previous rows are marked as dead and the new rows
+    are appended to the end, dead rows are dropped by compaction, when they take up
+    more than a half of the store.
+
+    Class names and geometry types are interned, so the rows contain only numbers.
+
+    Properties:
+    - class_names: Interned class names, index in the list is the class index.
+    - geometry_types: Interned geometry types, index in the list is the geometry index.
+    - image_ranges: Image ID -> (start, stop) range of the rows of the image.
+    - num_rows: Number of rows in the store, including dead rows.
+    - num_labels: Number of live labels in the store.
+    - nbytes: Approximate memory used by the store.
+
+    Methods:
+    - intern_class: Get the index of the class name.
+    - class_idx: Get the index of the class name without interning.
+    - set_image: Set the labels of the image.
+    - remove_image: Remove the labels of the image.
+    - image_rows: Get the rows of the image.
+    - rename_class: Rename the class.
+    - drop_class: Remove all the labels of the class.
+    - column: Get the live values of the column.
+    - compact: Drop the dead rows.
+    """
+
+    def __init__(self, capacity: int = MIN_CAPACITY):
+        self.class_names: List[str] = []
+        self._class_indices: Dict[str, int] = {}
+        self.geometry_types: List[str] = []
+        self._geometry_indices: Dict[str, int] = {}
+
+        # image_id -> (start, stop)
+        self.image_ranges: Dict[int, Tuple[int, int]] = {}
+
+        self._capacity = max(capacity, MIN_CAPACITY)
+        self._columns = {
+            name: np.zeros(self._capacity, dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self.num_rows = 0
+        self.num_labels = 0
+
+    def _view(self, name: str) -> np.ndarray:
+        """Get the filled part of the column, including dead rows.
+
+        :param name: The name of the column.
+        :type name: str
+        :return: The view of the column.
+        :rtype: np.ndarray
+        """
+        return self._columns[name][: self.num_rows]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the arrays and the index of the store.
+
+        :return: The number of bytes.
+        :rtype: int
+        """
+        arrays = sum(column.nbytes for column in self._columns.values())
+        return arrays + self._alive.nbytes + len(self.image_ranges) * INDEX_ENTRY_BYTES
+
+    def intern_class(self, class_name: str) -> int:
+        """Get the index of the class name, adding it to the store if it is new.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        :return: The index of the class.
+        :rtype: int
+        """
+        class_idx = self._class_indices.get(class_name)
+        if class_idx is None:
+            class_idx = len(self.class_names)
+            self._class_indices[class_name] = class_idx
+            self.class_names.append(class_name)
+        return class_idx
+
+    def class_idx(self, class_name: str) -> int:
+        """Get the index of the class name without adding it to the store.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        :return: The index of the class, -1 if the class is not in the store.
+        :rtype: int
+        """
+        return self._class_indices.get(class_name, -1)
+
+    def _intern_geometry(self, geometry_type: str) -> int:
+        """Get the index of the geometry type, adding it to the store if it is new.
+
+        :param geometry_type: The name of the geometry type.
+        :type geometry_type: str
+        :return: The index of the geometry type.
+        :rtype: int
+        """
+        geometry_idx = self._geometry_indices.get(geometry_type)
+        if geometry_idx is None:
+            geometry_idx = len(self.geometry_types)
+            self._geometry_indices[geometry_type] = geometry_idx
+            self.geometry_types.append(geometry_type)
+        return geometry_idx
+
+    def _reserve(self, num_rows: int) -> None:
+        """Make sure that the arrays can hold the given number of additional rows.
+        Compacts the store first if most of the rows are dead, otherwise grows the arrays.
+
+        :param num_rows: The number of rows to add.
+        :type num_rows: int
+        """
+        required = self.num_rows + num_rows
+        if required <= self._capacity:
+            return
+        if self.num_rows - self.num_labels > self.num_rows // 2:
+            self.compact()
+            if self.num_rows + num_rows <= self._capacity:
+                return
+        capacity = max(required, 2 * self._capacity)
+        for name, column in self._columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: self.num_rows] = column[: self.num_rows]
+            self._columns[name] = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self.num_rows] = self._alive[: self.num_rows]
+        self._alive = alive
+        self._capacity = capacity
+
+    def set_image(self, image_id: int, features: Sequence[LabelFeatures]) -> None:
+        """Set the labels of the image, replacing the previous version of the image.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        :param features: The features of the labels of the image.
+        :type features: Sequence[LabelFeatures]
+        """
+        self.remove_image(image_id)
+        self._reserve(len(features))
+
+        start = self.num_rows
+        stop = start + len(features)
+        columns = self._columns
+        columns["image_id"][start:stop] = image_id
+        for row, feature in enumerate(features, start=start):
+            columns["class_idx"][row] = self.intern_class(feature.class_name)
+            columns["area"][row] = feature.area
+            columns["top"][row] = feature.top
+            columns["left"][row] = feature.left
+            columns["bottom"][row] = feature.bottom
+            columns["right"][row] = feature.right
+            columns["geometry_idx"][row] = self._intern_geometry(feature.geometry_type)
+            columns["label_id"][row] = feature.label_id
+        self._alive[start:stop] = True
+
+        self.num_rows = stop
+        self.num_labels += len(features)
+        self.image_ranges[image_id] = (start, stop)
+
+    def remove_image(self, image_id: int) -> None:
+        """Remove the labels of the image from the store.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        """
+        image_range = self.image_ranges.pop(image_id, None)
+        if image_range is None:
+            return
+        start, stop = image_range
+        self.num_labels -= int(np.count_nonzero(self._alive[start:stop]))
+        self._alive[start:stop] = False
+
+    def image_rows(self, image_id: int) -> Dict[str, np.ndarray]:
+        """Get the live rows of the image.
+
+        :param image_id: The ID of the image.
+        :type image_id: int
+        :return: Name of the column -> values of the image.
+        :rtype: Dict[str, np.ndarray]
+        """
+        start, stop = self.image_ranges.get(image_id, (0, 0))
+        alive = self._alive[start:stop]
+        return {
+            name: column[start:stop][alive] for name, column in self._columns.items()
+        }
+
+    def rename_class(self, old_name: str, new_name: str) -> None:
+        """Rename the class. If the store already has a class with the new name,
+        the rows of the old class are moved to it.
+
+        :param old_name: The old name of the class.
+        :type old_name: str
+        :param new_name: The new name of the class.
+        :type new_name: str
+        """
+        old_idx = self._class_indices.pop(old_name, None)
+        if old_idx is None:
+            return
+        new_idx = self._class_indices.get(new_name)
+        if new_idx is None:
+            self._class_indices[new_name] = old_idx
+            self.class_names[old_idx] = new_name
+            return
+        class_idx = self._view("class_idx")
+        class_idx[class_idx == old_idx] = new_idx
+        # The index of the old class stays reserved, but no rows refer to it anymore.
+        self.class_names[old_idx] = ""
+
+    def drop_class(self, class_name: str) -> List[int]:
+        """Remove all the labels of the class from the store.
+
+        :param class_name: The name of the class.
+        :type class_name: str
+        :return: The IDs of the images, which had labels of the class.
+        :rtype: List[int]
+        """
+        class_idx = self.class_idx(class_name)
+        if class_idx < 0:
+            return []
+        mask = self._alive[: self.num_rows] & (self._view("class_idx") == class_idx)
+        self._alive[: self.num_rows][mask] = False
+        self.num_labels -= int(np.count_nonzero(mask))
+        return np.unique(self._view("image_id")[mask]).tolist()
+
+    def column(self, name: str) -> np.ndarray:
+        """Get the values of the column for the live rows.
+
+        :param name: The name of the column.
+        :type name: str
+        :return: The values of the column.
+        :rtype: np.ndarray
+        """
+        return self._view(name)[self._alive[: self.num_rows]]
+
+    def compact(self) -> None:
+        """Drop the dead rows and rebuild the image -> rows index."""
+        alive = self._alive[: self.num_rows]
+        order = np.argsort(self._view("image_id")[alive], kind="stable")
+        for name, column in self._columns.items():
+            values = column[: self.num_rows][alive][order]
+            column[: len(values)] = values
+        self.num_rows = self.num_labels
+        self._alive[:] = False
+        self._alive[: self.num_rows] = True
+
+        self.image_ranges = {}
+        image_ids = self._view("image_id")
+        if self.num_rows > 0:
+            boundaries = np.flatnonzero(np.diff(image_ids)) + 1
+            starts = np.concatenate(([0], boundaries))
+            stops = np.concatenate((boundaries, [self.num_rows]))
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                self.image_ranges[int(image_ids[start])] = (start, stop)
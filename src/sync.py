@@ -0,0 +1,107 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+
+class ReadWriteLock:
+    """Lock, which allows many concurrent readers or one writer.
+    Waiting writers block new readers, so the writers are not starved by a stream of readers.
+
+    Methods:
+    - read: Context manager, which holds the lock for reading.
+    - write: Context manager, which holds the lock for writing.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Hold the lock for reading."""
+        with self._condition:
+            while self._writer or self._waiting_writers > 0:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Hold the lock for writing."""
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers > 0:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class _Call:
+    """In-flight call of the SingleFlight."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls with the same key: the first caller runs the function,
+    the others wait for it and receive the same result (or the same exception).
+
+    Methods:
+    - do: Run the function once for all concurrent callers with the same key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run the function, unless the call with the same key is already in progress,
+        in which case wait for it and return its result.
+
+        :param key: The key of the call.
+        :type key: Hashable
+        :param func: The function to run.
+        :type func: Callable[..., Any]
+        :return: The result of the function.
+        :rtype: Any
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
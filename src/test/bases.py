@@ -1,4 +1,6 @@
-from typing import List, Optional, Union
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
 
 import supervisely as sly
 from supervisely.api.annotation_api import AnnotationInfo
@@ -6,13 +8,16 @@ from supervisely.imaging.image import get_new_labeling_tool_url
 
 import src.globals as g
 from src.cache import Cache
+from src.effects import dispatcher
 from src.issues import get_top_and_left
+from src.meta import CompiledMeta
+from src.stats import StatsSnapshot
+from src.utils import get_annotation_hash
 
 
-class BaseCase:
-    """Base class for all test cases. It contains the logic for running the test and
-    creating an issue, if the test fails. The exact logic of the test should be
-    implemented in the run_result method.
+class EventContext:
+    """Context of one event, which is shared by all test cases. The annotation is parsed
+    (and the project meta is refetched, if it is stale) exactly once per event.
 
     :param project_info: Information about the project.
     :type project_info: sly.ProjectInfo
@@ -20,47 +25,92 @@ class BaseCase:
     :type project_meta: sly.ProjectMeta
     :param annotation_info: Information about the annotation.
     :type annotation_info: AnnotationInfo
+    :param job_id: ID of the labeling job, in which the image was confirmed.
+    :type job_id: Optional[int]
     :param kwargs: Additional keyword arguments.
     :type kwargs: Any
 
+    Properties:
+    - project_info: Information about the project.
+    - project_meta: Metadata of the project (refreshed, if the annotation required it).
+    - annotation_info: Information about the annotation.
+    - annotation: Parsed annotation.
+    - compiled_meta: Lookup tables of the project meta.
+    - class_ids: Class IDs of the labels of the annotation, in the order of the labels.
+    - stats: Snapshot of the statistics for the classes on the image (of the project,
+      the dataset or the labeling job, depending on the scope setting).
+    - job_id: ID of the labeling job, in which the image was confirmed.
+    - kwargs: Additional keyword arguments.
+    """
+
+    def __init__(
+        self,
+        project_info: sly.ProjectInfo,
+        project_meta: sly.ProjectMeta,
+        annotation_info: AnnotationInfo,
+        job_id: Optional[int] = None,
+        **kwargs,
+    ):
+        self.project_info = project_info
+        self.annotation_info = annotation_info
+        self.job_id = job_id
+        self.kwargs = kwargs
+
+        self.annotation: sly.Annotation = Cache().get_annotation(
+            annotation_info, project_meta, project_info
+        )
+        # If the meta was stale, it was refetched while parsing the annotation.
+        self.project_meta: sly.ProjectMeta = Cache().get_project_meta(project_info.id)
+
+        self.compiled_meta: CompiledMeta = Cache().get_compiled_meta(project_info.id)
+        self.class_ids = self.compiled_meta.label_class_ids(self.annotation.labels)
+
+        self.stats: StatsSnapshot = Cache().get_stats_snapshot(
+            project_info.id,
+            self.compiled_meta,
+            self.class_ids.tolist(),
+            dataset_id=kwargs.get("dataset_id"),
+            job_id=job_id,
+        )
+
+
+class BaseCase:
+    """Base class for all test cases. It contains the logic for running the test,
+    the results of all cases are reported by the Test together. The exact logic
+    of the test should be implemented in the run_result method.
+
+    :param context: Context of the event, shared by all test cases.
+    :type context: EventContext
+
     Properties:
     - report: Report of the test.
     - failed_labels: List of labels that failed the test.
 
     Methods:
     - run: Run the test.
-    - create_issue: Create an issue for the test.
-    - create_subissues: Create subissues for the test.
-    - add_link_to_report: Add a link to the image to the report.
-    - add_meta_to_report: Add metadata to the report.
     - run_result: Run the test and return the result.
     - is_enabled: Check if the test is enabled.
     - get_threshold: Get the threshold for the test.
+    - get_mode: Get the mode of the comparison with the project statistics.
     """
 
     enabled = True
     threshold = None
 
-    def __init__(
-        self,
-        project_info: sly.ProjectInfo,
-        project_meta: sly.ProjectMeta,
-        annotation_info: AnnotationInfo,
-        **kwargs,
-    ):
-        self.project_info = project_info
-        self.project_meta = project_meta
-        self.annotation_info = annotation_info
+    def __init__(self, context: EventContext):
+        self.context = context
+        self.project_info = context.project_info
+        self.project_meta = context.project_meta
+        self.annotation_info = context.annotation_info
+        self.annotation = context.annotation
+        self.compiled_meta = context.compiled_meta
+        self.class_ids = context.class_ids
+        self.stats = context.stats
+        self.kwargs = context.kwargs
 
         self._report: Union[str, None] = None
         self._failed_labels: List[sly.Label] = []
 
-        self.annotation = Cache().get_annotation(
-            annotation_info, project_meta, project_info
-        )
-
-        self.kwargs = kwargs
-
     @property
     def report(self) -> Union[str, None]:
         """Report of the test. Should be set in the run_result method.
@@ -114,6 +164,27 @@ class BaseCase:
         """
         raise NotImplementedError()
 
+    @classmethod
+    def get_mode(cls) -> str:
+        """Get the mode of the comparison with the project statistics
+        (mean, median, IQR or recent mean).
+
+        :return: The mode of the comparison.
+        :rtype: str
+        """
+        return g.MEAN_MODE
+
+    def _threshold_text(self) -> str:
+        """Get the threshold of the test as text for the reports. In the IQR mode
+        the threshold is given by the fences instead of the threshold setting.
+
+        :return: The threshold of the test as text.
+        :rtype: str
+        """
+        if self.get_mode() == g.IQR_MODE:
+            return f"{g.IQR_FENCE_FACTOR} IQR"
+        return str(self.get_threshold())
+
     @sly.timeit
     def run(self) -> Optional[str]:
         """Run the test. Return the report of the test.
@@ -130,98 +201,78 @@ class BaseCase:
                 "[FAILED ] Test for case %s failed.", self.__class__.__name__
             )
 
-            # If the test failed, safely create an issue.
-            try:
-                self.create_issue()
-            except Exception as e:
-                sly.logger.warning("Failed to create an issue: %s", e)
-
         return self.report
 
-    @sly.timeit
-    def create_issue(self) -> None:
-        """Create an issue and subissues for the test."""
-        # Get the issue ID from the cache.
-        issue_name = f"Annotation Quality Check: {self.project_info.name}"
-        issue_id = Cache().get_issued_id(issue_name)
 
-        # Create issue only if the switch is on and if the report is not empty.
-        if self.report is not None and g.create_issues:
-            # Add a metadata to the report.
-            report = self.add_meta_to_report(self.report)
+class ResultMemo:
+    """Bounded memo of the results of the test cases: key of the check (content hash of the
+    annotation, version of the statistics and the settings) -> reports of the failed cases.
+    The least recently used entries are dropped, when the memo is full.
 
-            # Add a link to the image to the report.
-            report = self.add_link_to_report(report)
+    :param max_size: Maximum number of the entries, zero disables the memo.
+    :type max_size: int
 
-            # Add comment with detailed report to the issue.
-            g.spawn_api.issues.add_comment(issue_id, report)
-            sly.logger.debug("Comment was added to issue %s.", issue_id)
+    Methods:
+    - get: Get the reports of the check.
+    - put: Remember the reports of the check.
+    - metrics: Get the hit and miss counters of the memo.
+    """
 
-            # Create subissues for the failed labels.
-            # NOTE: This only works for the cases, which related to specific labels.
-            # And it does not work for cases, which related to the whole image or annotation.
-            self.create_subissues(issue_id, self.failed_labels)
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[str, ...]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
 
-    @sly.timeit
-    def create_subissues(self, issue_id: int, labels: List[sly.Label]) -> None:
-        """Create subissues for the test.
+    def get(self, key: Hashable) -> Optional[Tuple[str, ...]]:
+        """Get the reports of the check.
 
-        :param issue_id: The ID of the issue.
-        :type issue_id: int
-        :param labels: List of labels that failed the test.
-        :type labels: List[sly.Label]
+        :param key: The key of the check.
+        :type key: Hashable
+        :return: The reports, None if the check is not in the memo.
+        :rtype: Optional[Tuple[str, ...]]
         """
-        # Iterate over the failed labels and create subissues for them.
-        for label in labels:
-            # Get the top and left coordinates of the label to add subissue marker.
-            top, left = get_top_and_left(label)
-            g.spawn_api.issues.add_subissue(
-                issue_id,
-                [self.annotation.image_id],
-                [label.sly_id],  # type: ignore
-                top,
-                left,
-                annotation_info=self.annotation_info,
-                project_meta=self.project_meta,
-            )
-
-    def add_link_to_report(self, report: str) -> str:
-        """Modify the report by adding a link to the image.
-
-        :param report: The report to modify.
-        :type report: str
-        :return: The modified report.
-        :rtype: str
+        with self._lock:
+            reports = self._entries.get(key)
+            if reports is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return reports
+
+    def put(self, key: Hashable, reports: Tuple[str, ...]) -> None:
+        """Remember the reports of the check.
+
+        :param key: The key of the check.
+        :type key: Hashable
+        :param reports: The reports of the failed cases.
+        :type reports: Tuple[str, ...]
         """
-        try:
-            url = get_new_labeling_tool_url(**self.kwargs)
-        except Exception as e:
-            sly.logger.warning("Failed to get the link to the image: %s", e)
-            return report
-
-        return f"{report}\n\n [Link to the image]({url})"
-
-    def add_meta_to_report(self, report: str) -> str:
-        """Modify the report by adding metadata to it.
-
-        :param report: The report to modify.
-        :type report: str
-        :return: The modified report.
-        :rtype: str
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = reports
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the hit and miss counters of the memo.
+
+        :return: The metrics of the memo.
+        :rtype: Dict[str, Any]
         """
-        meta = (
-            f"Image ID: {self.annotation_info.image_id}\n\n"
-            f"Image Name: {self.annotation_info.image_name}\n\n"
-            f"Project ID: {self.project_info.id}\n\n"
-            f"Project Name: {self.project_info.name}\n\n"
-        )
-
-        return f"{report}\n\n{meta}"
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "size": len(self._entries)}
 
 
 class Test:
     """Class for running test using a list of test cases.
-    One instance of the test class is created for each image.
+    One instance of the test class is created for each image. The results of all
+    the cases are reported together: one notification, one issue comment and one
+    subissue for all the failed labels of the image.
 
     :param project_info: Information about the project.
     :type project_info: sly.ProjectInfo
@@ -229,29 +280,45 @@ class Test:
     :type project_meta: sly.ProjectMeta
     :param annotation_info: Information about the annotation.
     :type annotation_info: AnnotationInfo
+    :param job_id: ID of the labeling job, in which the image was confirmed.
+    :type job_id: Optional[int]
     :param kwargs: Additional keyword arguments.
     :type kwargs: Any
 
     Properties:
     - reports: List of reports of the test cases.
+    - report: Consolidated report of all the failed test cases.
+    - failed_labels: Labels, which failed any of the test cases.
+    - context: Context of the event, shared by all test cases.
 
     Methods:
     - run: Run the test.
+    - create_issues: Schedule the issue comment and the subissue for the failed test cases.
+    - create_subissue: Create one subissue for all the failed labels.
+    - add_link_to_report: Add a link to the image to the report.
+    - add_meta_to_report: Add metadata to the report.
     """
 
+    # Results of the checks, so identical resubmissions are not evaluated again.
+    result_memo = ResultMemo(g.case_result_memo_size)
+
     def __init__(
         self,
         project_info: sly.ProjectInfo,
         project_meta: sly.ProjectMeta,
         annotation_info: AnnotationInfo,
+        job_id: Optional[int] = None,
         **kwargs,
     ):
         self.project_info = project_info
         self.project_meta = project_meta
         self.annotation_info = annotation_info
+        self.job_id = job_id
         self.kwargs = kwargs
 
         self._reports = []
+        self._failed_cases: List[BaseCase] = []
+        self._context: Optional[EventContext] = None
 
     @property
     def reports(self) -> List[str]:
@@ -262,6 +329,48 @@ class Test:
         """
         return self._reports
 
+    @property
+    def report(self) -> Optional[str]:
+        """Consolidated report of all the failed test cases.
+
+        :return: The report, None if all the test cases passed.
+        :rtype: Optional[str]
+        """
+        if not self._reports:
+            return None
+        return "\n\n".join(self._reports)
+
+    @property
+    def failed_labels(self) -> List[sly.Label]:
+        """Labels, which failed any of the test cases, each label once.
+
+        :return: The failed labels.
+        :rtype: List[sly.Label]
+        """
+        failed_labels = {}
+        for case in self._failed_cases:
+            for label in case.failed_labels:
+                failed_labels.setdefault(id(label), label)
+        return list(failed_labels.values())
+
+    @property
+    def context(self) -> EventContext:
+        """Context of the event, shared by all test cases.
+        It is created once, on the first access.
+
+        :return: Context of the event.
+        :rtype: EventContext
+        """
+        if self._context is None:
+            self._context = EventContext(
+                self.project_info,
+                self.project_meta,
+                self.annotation_info,
+                job_id=self.job_id,
+                **self.kwargs,
+            )
+        return self._context
+
     @sly.timeit
     def run(self) -> List[str]:
         """Run the test.
@@ -269,6 +378,22 @@ class Test:
         :return: List of reports of the test cases.
         :rtype: List[str]
         """
+        # Parse the annotation once and share it with all the cases.
+        context = self.context
+
+        # The same annotation checked against the same statistics and settings
+        # has the same results, the issues for them were already created.
+        memo_key = self._memo_key(context)
+        reports = self.result_memo.get(memo_key)
+        if reports is not None:
+            sly.logger.info(
+                "The annotation of image_id=%s was already checked, the results are reused.",
+                self.annotation_info.image_id,
+            )
+            self._reports = list(reports)
+            return self.reports
+
+        all_cases_run = True
         # Iterate over subclasses of BaseCase and run them.
         for case in BaseCase.__subclasses__():
             sly.logger.debug("Running test case %s...", case.__name__)
@@ -279,20 +404,155 @@ class Test:
                 continue
 
             # Create an instance of the case and run it.
-            current_case = case(
-                project_info=self.project_info,
-                project_meta=self.project_meta,
-                annotation_info=self.annotation_info,
-                **self.kwargs,
-            )
+            current_case = case(context)
             try:
                 case_report = current_case.run()
 
                 # If the case contains a report, add it to the list of reports.
                 if case_report is not None:
                     self._reports.append(case_report)
+                    self._failed_cases.append(current_case)
             except Exception as e:
+                all_cases_run = False
                 sly.logger.warning("Failed to run the test case: %s", e)
 
+        if all_cases_run:
+            self.result_memo.put(memo_key, tuple(self._reports))
         sly.logger.info("All test cases were run.")
         return self.reports
+
+    def create_issues(self) -> None:
+        """Schedule one comment with the consolidated report and one subissue for all
+        the failed labels of the image. The requests are sent by the side effect dispatcher,
+        after the user-visible effects, so this method should be called after them.
+        The results reused from the memo do not create the issues again."""
+        # Create issue only if the switch is on and if any case failed.
+        if not self._failed_cases or not g.create_issues:
+            return
+        dispatcher.submit("issues.get_or_create", self._post_issue)
+
+    @sly.timeit
+    def _post_issue(self) -> None:
+        """Get the issue of the project and schedule the comment and the subissue."""
+        # Get the issue ID of the team of the project from the cache.
+        issue_name = f"Annotation Quality Check: {self.project_info.name}"
+        team_id = self.project_info.team_id
+        issue_id = Cache().get_issued_id(issue_name, team_id)
+
+        # Add a metadata to the report.
+        report = self.add_meta_to_report(self.report)  # type: ignore
+
+        # Add a link to the image to the report.
+        report = self.add_link_to_report(report)
+
+        # Add comment with detailed report to the issue.
+        comment = dispatcher.submit(
+            "issues.add_comment", g.spawn_api.issues.add_comment, issue_id, report
+        )
+
+        def forget_deleted_issue(future):
+            # If the comment can not be added (e.g. the issue was deleted),
+            # the issue is looked up again for the next images.
+            if future.exception() is not None:
+                Cache().forget_issue(issue_name, team_id)
+
+        comment.add_done_callback(forget_deleted_issue)
+        sly.logger.debug("Comment to issue %s was scheduled.", issue_id)
+
+        # NOTE: Only the cases, which are related to specific labels, have failed labels.
+        # The cases related to the whole image or annotation are only in the comment.
+        self.create_subissue(issue_id, self.failed_labels)
+
+    def create_subissue(self, issue_id: int, labels: List[sly.Label]) -> None:
+        """Schedule one subissue for all the failed labels of the image.
+        The marker of the subissue is placed at the top left corner of the labels.
+
+        :param issue_id: The ID of the issue.
+        :type issue_id: int
+        :param labels: List of labels that failed the tests.
+        :type labels: List[sly.Label]
+        """
+        if not labels:
+            return
+        corners = [get_top_and_left(label) for label in labels]
+        top = min(top for top, _ in corners)
+        left = min(left for _, left in corners)
+        dispatcher.submit(
+            "issues.add_subissue",
+            g.spawn_api.issues.add_subissue,
+            issue_id,
+            [self.annotation_info.image_id],
+            [label.sly_id for label in labels],  # type: ignore
+            top,
+            left,
+            annotation_info=self.annotation_info,
+            project_meta=self.context.project_meta,
+        )
+
+    def add_link_to_report(self, report: str) -> str:
+        """Modify the report by adding a link to the image.
+
+        :param report: The report to modify.
+        :type report: str
+        :return: The modified report.
+        :rtype: str
+        """
+        try:
+            url = get_new_labeling_tool_url(**self.kwargs)
+        except Exception as e:
+            sly.logger.warning("Failed to get the link to the image: %s", e)
+            return report
+
+        return f"{report}\n\n [Link to the image]({url})"
+
+    def add_meta_to_report(self, report: str) -> str:
+        """Modify the report by adding metadata to it.
+
+        :param report: The report to modify.
+        :type report: str
+        :return: The modified report.
+        :rtype: str
+        """
+        meta = (
+            f"Image ID: {self.annotation_info.image_id}\n\n"
+            f"Image Name: {self.annotation_info.image_name}\n\n"
+            f"Project ID: {self.project_info.id}\n\n"
+            f"Project Name: {self.project_info.name}\n\n"
+        )
+
+        return f"{report}\n\n{meta}"
+
+    def _memo_key(self, context: EventContext) -> Hashable:
+        """Get the key of the check for the memo of the results: the image, the content
+        of its annotation, the version of the statistics and the meta, and all the settings,
+        which affect the results. The image is a part of the key, so the results (and the
+        failed cases, which are filed as issues) of one image are never reused for another
+        image with the same annotation.
+
+        :param context: Context of the event.
+        :type context: EventContext
+        :return: The key of the check.
+        :rtype: Hashable
+        """
+        case_settings = []
+        for case in BaseCase.__subclasses__():
+            try:
+                threshold = case.get_threshold()
+            except NotImplementedError:
+                threshold = None
+            case_settings.append(
+                (case.__name__, case.is_enabled(), threshold, case.get_mode())
+            )
+        return (
+            self.project_info.id,
+            self.annotation_info.image_id,
+            get_annotation_hash(self.annotation_info.annotation),
+            context.stats.version,
+            context.compiled_meta.version,
+            tuple(case_settings),
+            g.stats_scope,
+            g.stats_scope_min_samples,
+            self.kwargs.get("dataset_id"),
+            self.job_id,
+            g.create_issues,
+        )
@@ -1,11 +1,11 @@
-from typing import List, Optional
+from typing import Optional
 
+import numpy as np
 import supervisely as sly
 
 import src.globals as g
-from src.cache import Cache
 from src.test import BaseCase
-from src.utils import group_labels_by_class, is_diff_more_than_threshold
+from src.utils import is_diff_more_than_threshold, is_outside_iqr_fences
 
 
 class NoObjectsCase(BaseCase):
@@ -44,21 +44,21 @@ class AllObjectsCase(BaseCase):
         :return: True if all objects are present, False otherwise.
         :rtype: bool
         """
-        obj_classes_in_meta = {obj_class for obj_class in self.project_meta.obj_classes}
-        obj_classes_in_annotation = {
-            label.obj_class for label in self.annotation.labels
-        }
+        required_class_ids = self.compiled_meta.required_class_ids
+        class_ids_in_annotation = set(self.class_ids.tolist())
 
         sly.logger.debug(
             "Number of objects in project meta: %s, in annotation: %s",
-            len(obj_classes_in_meta),
-            len(obj_classes_in_annotation),
+            len(required_class_ids),
+            len(class_ids_in_annotation),
         )
-        if obj_classes_in_meta == obj_classes_in_annotation:
+        missing_class_ids = required_class_ids - class_ids_in_annotation
+        if not missing_class_ids:
             return True
         else:
-            missing_classes = obj_classes_in_meta - obj_classes_in_annotation
-            missing_class_names = [obj_class.name for obj_class in missing_classes]
+            missing_class_names = self.compiled_meta.class_names_of(
+                sorted(missing_class_ids)
+            )
 
             self.report = f"The following classes are missing on the image: {missing_class_names}."
             return False
@@ -84,31 +84,64 @@ class AverageLabelAreaCase(BaseCase):
         :rtype: bool
         """
         result = True
-        for label in self.annotation.labels:
-            label_class_name = label.obj_class.name
+        class_names = self.compiled_meta.class_names
+        for label, class_id in zip(self.annotation.labels, self.class_ids.tolist()):
+            if class_id < 0:
+                continue
+            label_class_name = class_names[class_id]
 
-            labels = Cache().get_labels_by_class(self.project_info.id, label_class_name)
-            if len(labels) < 1:
+            area_stats = self.stats.get_area_stats(class_id)
+            if area_stats.count < 1:
                 sly.logger.debug(
                     "Not enough labels for class %s to calculate average area.",
                     label_class_name,
                 )
                 continue
 
-            average_area = self._get_average_area(labels)
-            sly.logger.debug(
-                "Average area for class %s is %s.", label_class_name, average_area
-            )
-
-            if is_diff_more_than_threshold(
-                label.area, average_area, self.get_threshold()  # type: ignore
-            ):
+            mode = self.get_mode()
+            if mode in (g.MEAN_MODE, g.RECENT_MODE):
+                average_area = area_stats.mean
+                if mode == g.RECENT_MODE:
+                    decayed_stats = self.stats.get_decayed_stats(class_id)
+                    if decayed_stats.area_weight >= g.decay_min_weight:
+                        average_area = decayed_stats.area_mean
+                sly.logger.debug(
+                    "The %s average area for class %s is %s.",
+                    mode,
+                    label_class_name,
+                    average_area,
+                )
+                is_outlier = average_area > 0 and is_diff_more_than_threshold(
+                    label.area, average_area, self.get_threshold()  # type: ignore
+                )
+            else:
+                # The quantiles are not skewed by a few huge labels.
+                q1, median_area, q3 = self.stats.area_quantiles(
+                    class_id, (0.25, 0.5, 0.75)
+                )
+                sly.logger.debug(
+                    "Median area for class %s is %s (IQR %s).",
+                    label_class_name,
+                    median_area,
+                    q3 - q1,
+                )
+                if mode == g.IQR_MODE:
+                    is_outlier = is_outside_iqr_fences(
+                        label.area, q1, q3, g.IQR_FENCE_FACTOR
+                    )
+                else:
+                    is_outlier = median_area > 0 and is_diff_more_than_threshold(
+                        label.area, median_area, self.get_threshold()  # type: ignore
+                    )
+
+            if is_outlier:
                 result = False
                 sly.logger.debug(
-                    "Label with area %s for class %s differs from average area more than %s.",
+                    "Label with area %s for class %s differs from %s area more than %s.",
                     label.area,
                     label_class_name,
-                    self.get_threshold(),
+                    mode,
+                    self._threshold_text(),
                 )
 
                 if label not in self.failed_labels:
@@ -116,8 +149,9 @@ class AverageLabelAreaCase(BaseCase):
 
         if not result:
             self.report = (
-                "The labels with following IDs have area that differs from average area "
-                f"more than specified threshold of {self.get_threshold()}: "
+                "The labels with following IDs have area that differs from "
+                f"{self.get_mode()} area "
+                f"more than specified threshold of {self._threshold_text()}: "
                 f"{[label.sly_id for label in self.failed_labels]}."
             )
 
@@ -141,18 +175,14 @@ class AverageLabelAreaCase(BaseCase):
         """
         return g.average_label_area_case_theshold
 
-    def _get_average_area(self, labels: List[sly.Label]) -> float:
-        """Calculates the average area of the labels.
+    @classmethod
+    def get_mode(cls) -> str:
+        """Gets the mode (mean, median, IQR or recent mean) from the (select widget in the UI) settings.
 
-        :param labels: The list of labels.
-        :type labels: List[sly.Label]
-        :return: The average area of the labels.
-        :rtype: float
+        :return: The mode.
+        :rtype: str
         """
-        area_sum = 0
-        for label in labels:
-            area_sum += label.area
-        return area_sum / len(labels)
+        return g.average_label_area_case_mode
 
 
 class AverageNumberOfClasLabelsCase(BaseCase):
@@ -167,27 +197,26 @@ class AverageNumberOfClasLabelsCase(BaseCase):
         :return: True if the numbers are close, False otherwise.
         :rtype: bool
         """
-        # 1. Group labels in annotation by class to know for each class how many
-        # labels are on the image.
-        # 2. Group labels of the class from cache by images to know what is
-        # the average number of labels for the class on one image.
-        # 3. Iterate over class label groups and compare the number of labels
+        # 1. Count labels of each class on the image by their class IDs.
+        # 2. Look up in the statistics snapshot how many labels of the class
+        # are on one image on average (among the images containing the class).
+        # 3. Iterate over the classes on the image and compare the number of labels
         # on the current image with the average number of labels for the class.
 
-        class_labels_in_annotation = group_labels_by_class([self.annotation])
-        class_annotations_in_cache = Cache().group_annotations_by_class(
-            self.project_info.id
+        known_class_ids = self.class_ids[self.class_ids >= 0]
+        label_counts = np.bincount(
+            known_class_ids, minlength=self.compiled_meta.num_classes
         )
         result = True
         failed_class_names = []
 
-        for class_name, labels in class_labels_in_annotation.items():
-            number_of_labels = len(labels)
+        for class_id in np.flatnonzero(label_counts).tolist():
+            class_name = self.compiled_meta.class_names[class_id]
+            number_of_labels = int(label_counts[class_id])
             sly.logger.debug(
                 "Number of labels for class %s is %s.", class_name, number_of_labels
             )
-            class_annotations = class_annotations_in_cache.get(class_name, [])
-            number_of_images_with_class = len(class_annotations)
+            number_of_images_with_class = self.stats.images_with_class(class_id)
             if number_of_images_with_class < 1:
                 sly.logger.debug(
                     "Not enough images with class %s to calculate average number of labels.",
@@ -195,27 +224,48 @@ class AverageNumberOfClasLabelsCase(BaseCase):
                 )
                 continue
 
-            class_labels_in_cache = group_labels_by_class(class_annotations).get(
-                class_name, []
-            )
-
-            average_number_of_labels = (
-                len(class_labels_in_cache) / number_of_images_with_class
-            )
-            sly.logger.debug(
-                "Average number of labels for class %s is %s.",
-                class_name,
-                average_number_of_labels,
-            )
-
-            if is_diff_more_than_threshold(
-                number_of_labels, average_number_of_labels, self.get_threshold()  # type: ignore
-            ):
+            mode = self.get_mode()
+            if mode in (g.MEAN_MODE, g.RECENT_MODE):
+                average_number_of_labels = self.stats.average_label_count(class_id)
+                if mode == g.RECENT_MODE:
+                    decayed_stats = self.stats.get_decayed_stats(class_id)
+                    if decayed_stats.count_weight >= g.decay_min_weight:
+                        average_number_of_labels = decayed_stats.count_mean
+                sly.logger.debug(
+                    "The %s average number of labels for class %s is %s.",
+                    mode,
+                    class_name,
+                    average_number_of_labels,
+                )
+                is_outlier = average_number_of_labels > 0 and is_diff_more_than_threshold(
+                    number_of_labels, average_number_of_labels, self.get_threshold()  # type: ignore
+                )
+            else:
+                q1, median_number_of_labels, q3 = self.stats.label_count_quantiles(
+                    class_id, (0.25, 0.5, 0.75)
+                )
+                sly.logger.debug(
+                    "Median number of labels for class %s is %s (IQR %s).",
+                    class_name,
+                    median_number_of_labels,
+                    q3 - q1,
+                )
+                if mode == g.IQR_MODE:
+                    is_outlier = is_outside_iqr_fences(
+                        number_of_labels, q1, q3, g.IQR_FENCE_FACTOR
+                    )
+                else:
+                    is_outlier = median_number_of_labels > 0 and is_diff_more_than_threshold(
+                        number_of_labels, median_number_of_labels, self.get_threshold()  # type: ignore
+                    )
+
+            if is_outlier:
                 result = False
                 sly.logger.debug(
-                    "Number of labels for class %s differs from average more than %s.",
+                    "Number of labels for class %s differs from %s more than %s.",
                     class_name,
-                    self.get_threshold(),
+                    mode,
+                    self._threshold_text(),
                 )
 
                 failed_class_names.append(class_name)
@@ -223,8 +273,9 @@ class AverageNumberOfClasLabelsCase(BaseCase):
         if not result:
             self.report = (
                 "The number of labels for classes "
-                f"{failed_class_names} differs from average more than specified threshold of: "
-                f"{self.get_threshold()}."
+                f"{failed_class_names} differs from {self.get_mode()} more than specified "
+                "threshold of: "
+                f"{self._threshold_text()}."
             )
 
         return result
@@ -246,3 +297,12 @@ class AverageNumberOfClasLabelsCase(BaseCase):
         :rtype: float
         """
         return g.average_number_of_class_labels_case_theshold
+
+    @classmethod
+    def get_mode(cls) -> str:
+        """Gets the mode (mean, median, IQR or recent mean) from the (select widget in the UI) settings.
+
+        :return: The mode.
+        :rtype: str
+        """
+        return g.average_number_of_class_labels_case_mode
@@ -1,9 +1,17 @@
 import supervisely as sly
 from supervisely.app.widgets import Flexbox  # Progress,
-from supervisely.app.widgets import Card, Container, InputNumber, Switch, Text
+from supervisely.app.widgets import Card, Container, InputNumber, Select, Switch, Text
 
 import src.globals as g
 
+# Modes of the comparison with the project statistics for the select widgets.
+mode_items = [
+    Select.Item(g.MEAN_MODE, "Compare with mean"),
+    Select.Item(g.MEDIAN_MODE, "Compare with median"),
+    Select.Item(g.RECENT_MODE, "Compare with recent mean"),
+    Select.Item(g.IQR_MODE, "Outside of interquartile range"),
+]
+
 # region NoObjectsCase
 no_objects_case_switch = Switch(switched=True)
 no_objects_case_text = Text("No objects on the image")
@@ -54,26 +62,55 @@ average_label_area_case_flexbox = Flexbox(
 average_label_area_case_input = InputNumber(
     value=g.DEFAULT_THRESHOLD, min=0.0, max=1.0, step=0.1
 )
+average_label_area_case_mode_select = Select(
+    mode_items, filterable=False, placeholder="Select mode"
+)
+average_label_area_case_mode_select.set_value(g.average_label_area_case_mode)
 average_label_area_case_container = Container(
-    [average_label_area_case_flexbox, average_label_area_case_input]
+    [
+        average_label_area_case_flexbox,
+        average_label_area_case_mode_select,
+        average_label_area_case_input,
+    ]
 )
 
 
 @average_label_area_case_switch.value_changed
 def on_average_label_area_case_switch_changed(is_on: bool) -> None:
     """Callback for the average_label_area_case_switch.
-    Hide or show the average_label_area_case_input based on the switch state.
+    Hide or show the average_label_area_case_input and average_label_area_case_mode_select
+    based on the switch state.
 
     :param is_on: The state of the switch.
     :type is_on: bool
     """
     g.average_label_area_case_enabled = is_on
     if is_on:
-        average_label_area_case_input.show()
+        average_label_area_case_mode_select.show()
+        if g.average_label_area_case_mode != g.IQR_MODE:
+            average_label_area_case_input.show()
     else:
+        average_label_area_case_mode_select.hide()
         average_label_area_case_input.hide()
 
 
+@average_label_area_case_mode_select.value_changed
+def on_average_label_area_case_mode_select_changed(mode: str) -> None:
+    """Callback for the average_label_area_case_mode_select.
+    Set the global variable average_label_area_case_mode to the selected mode.
+    The threshold is not used in the IQR mode, so the input is hidden.
+
+    :param mode: The selected mode.
+    :type mode: str
+    """
+    g.average_label_area_case_mode = mode
+    if mode == g.IQR_MODE:
+        average_label_area_case_input.hide()
+    else:
+        average_label_area_case_input.show()
+    sly.logger.debug("Average label area mode is set to %s.", mode)
+
+
 @average_label_area_case_input.value_changed
 def on_average_label_area_case_input_changed(value: float) -> None:
     """Callback for the average_label_area_case_input.
@@ -102,9 +139,16 @@ average_number_of_class_labels_case_flexbox = Flexbox(
 average_number_of_class_labels_case_input = InputNumber(
     value=g.DEFAULT_THRESHOLD, min=0.0, max=1.0, step=0.1
 )
+average_number_of_class_labels_case_mode_select = Select(
+    mode_items, filterable=False, placeholder="Select mode"
+)
+average_number_of_class_labels_case_mode_select.set_value(
+    g.average_number_of_class_labels_case_mode
+)
 average_number_of_class_labels_case_container = Container(
     [
         average_number_of_class_labels_case_flexbox,
+        average_number_of_class_labels_case_mode_select,
         average_number_of_class_labels_case_input,
     ]
 )
@@ -113,18 +157,39 @@ average_number_of_class_labels_case_container = Container(
 @average_number_of_class_labels_case_switch.value_changed
 def on_average_number_of_class_labels_case_switch_changed(is_on: bool) -> None:
     """Callback for the average_number_of_class_labels_case_switch.
-    Hide or show the average_number_of_class_labels_case_input based on the switch state.
+    Hide or show the average_number_of_class_labels_case_input and
+    average_number_of_class_labels_case_mode_select based on the switch state.
 
     :param is_on: The state of the switch.
     :type is_on: bool
     """
     g.average_number_of_class_labels_case_enabled = is_on
     if is_on:
-        average_number_of_class_labels_case_input.show()
+        average_number_of_class_labels_case_mode_select.show()
+        if g.average_number_of_class_labels_case_mode != g.IQR_MODE:
+            average_number_of_class_labels_case_input.show()
     else:
+        average_number_of_class_labels_case_mode_select.hide()
         average_number_of_class_labels_case_input.hide()
 
 
+@average_number_of_class_labels_case_mode_select.value_changed
+def on_average_number_of_class_labels_case_mode_select_changed(mode: str) -> None:
+    """Callback for the average_number_of_class_labels_case_mode_select.
+    Set the global variable average_number_of_class_labels_case_mode to the selected mode.
+    The threshold is not used in the IQR mode, so the input is hidden.
+
+    :param mode: The selected mode.
+    :type mode: str
+    """
+    g.average_number_of_class_labels_case_mode = mode
+    if mode == g.IQR_MODE:
+        average_number_of_class_labels_case_input.hide()
+    else:
+        average_number_of_class_labels_case_input.show()
+    sly.logger.debug("Average number of class labels mode is set to %s.", mode)
+
+
 @average_number_of_class_labels_case_input.value_changed
 def on_average_number_of_class_labels_case_input_changed(value: float) -> None:
     """Callback for the average_number_of_class_labels_case_input.
@@ -216,6 +281,37 @@ def use_failed_images_switch_changed(is_on: bool) -> None:
     sly.logger.debug("Use failed images setting is set to %s.", is_on)
 
 
+# endregion
+
+# region StatsScopeSelect
+stats_scope_select = Select(
+    [
+        Select.Item("project", "Statistics of the project"),
+        Select.Item("dataset", "Statistics of the dataset"),
+        Select.Item("job", "Statistics of the labeling job"),
+    ],
+    filterable=False,
+)
+stats_scope_select.set_value(g.stats_scope)
+stats_scope_text = Text(
+    "Scope of the statistics for comparison. If the class has too few samples in the "
+    "dataset or the labeling job, the statistics of the parent scope are used."
+)
+stats_scope_container = Container([stats_scope_text, stats_scope_select])
+
+
+@stats_scope_select.value_changed
+def stats_scope_select_changed(scope: str) -> None:
+    """Callback for the stats_scope_select.
+    Set the global variable stats_scope to the selected scope.
+
+    :param scope: The selected scope.
+    :type scope: str
+    """
+    g.stats_scope = scope
+    sly.logger.debug("Statistics scope is set to %s.", scope)
+
+
 # endregion
 
 # Card with settings.
@@ -227,6 +323,7 @@ settings_card = Card(
             create_issues_flexbox,
             reject_images_flexbox,
             use_failed_images_flexbox,
+            stats_scope_container,
         ]
     ),
     collapsable=True,
@@ -1,5 +1,6 @@
-from collections import defaultdict
-from typing import Dict, List
+import hashlib
+import json
+from typing import Dict, List, Tuple
 
 import supervisely as sly
 
@@ -17,13 +18,72 @@ def is_diff_more_than_threshold(
     return rel_diff > threshold
 
 
-def group_labels_by_class(
-    annotations: List[sly.Annotation],
-) -> Dict[str, List[sly.Label]]:
-    result = defaultdict(list)
+def is_outside_iqr_fences(value: float, q1: float, q3: float, factor: float) -> bool:
+    iqr = q3 - q1
+    lower_fence = q1 - factor * iqr
+    upper_fence = q3 + factor * iqr
+    sly.logger.debug(
+        "Value %s, fences: [%s, %s] (IQR %s).", value, lower_fence, upper_fence, iqr
+    )
+    return value < lower_fence or value > upper_fence
+
+
+def get_meta_version(project_meta: sly.ProjectMeta) -> str:
+    """Get the version of the project meta: the hash of its JSON, which changes
+    whenever any class or tag of the project is added, removed or changed.
+
+    :param project_meta: The metadata of the project.
+    :type project_meta: sly.ProjectMeta
+    :return: The version of the project meta.
+    :rtype: str
+    """
+    data = json.dumps(project_meta.to_json(), sort_keys=True).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_annotation_hash(annotation_json: dict) -> str:
+    """Get the content hash of the annotation JSON, which is the same for the identical
+    resubmissions of the annotation.
+
+    :param annotation_json: The JSON of the annotation.
+    :type annotation_json: dict
+    :return: The hash of the annotation.
+    :rtype: str
+    """
+    data = json.dumps(annotation_json, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+def diff_project_metas(
+    old_meta: sly.ProjectMeta, new_meta: sly.ProjectMeta
+) -> Tuple[Dict[str, str], List[str]]:
+    """Find the classes of the old project meta, which are affected by the new one.
+    The classes are matched by their IDs (or by names, if the IDs are not known).
+    Added classes do not affect the existing labels, so they are ignored.
 
-    for annotation in annotations:
-        for label in annotation.labels:
-            result[label.obj_class.name].append(label)
+    :param old_meta: The previous metadata of the project.
+    :type old_meta: sly.ProjectMeta
+    :param new_meta: The new metadata of the project.
+    :type new_meta: sly.ProjectMeta
+    :return: Old name -> new name of the renamed classes and names of the classes,
+        which were removed or changed their geometry type.
+    :rtype: Tuple[Dict[str, str], List[str]]
+    """
+    new_classes_by_id = {
+        obj_class.sly_id: obj_class
+        for obj_class in new_meta.obj_classes
+        if obj_class.sly_id is not None
+    }
+    renamed = {}
+    dropped = []
+    for old_class in old_meta.obj_classes:
+        if old_class.sly_id is not None:
+            new_class = new_classes_by_id.get(old_class.sly_id)
+        else:
+            new_class = new_meta.get_obj_class(old_class.name)
 
-    return result
+        if new_class is None or new_class.geometry_type != old_class.geometry_type:
+            dropped.append(old_class.name)
+        elif new_class.name != old_class.name:
+            renamed[old_class.name] = new_class.name
+    return renamed, dropped
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# src.globals reads the session of the app from the environment on import, the tests
+# run outside of the app with a dummy session, which is never contacted.
+os.environ.setdefault("ENV", "production")
+os.environ.setdefault("SERVER_ADDRESS", "http://localhost")
+os.environ.setdefault("API_TOKEN", "0" * 128)
+os.environ.setdefault("TEAM_ID", "1")
+os.environ.setdefault("WORKSPACE_ID", "1")
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="rtlqc-tests-"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
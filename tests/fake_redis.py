@@ -0,0 +1,277 @@
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.resp import RespError, read_reply
+
+
+def encode_reply(value: Any) -> bytes:
+    """Encode the reply of the server.
+
+    :param value: The reply: str (status), RespError, int, bytes, None or list of replies.
+    :type value: Any
+    :return: The encoded reply.
+    :rtype: bytes
+    """
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode("utf-8")
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode("utf-8")
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(item) for item in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedisServer:
+    """In-process server of the Redis protocol, which keeps the data in memory.
+    It supports only the commands used by the cache backend: strings (with NX and PX
+    options of SET), hashes, counters and optimistic transactions (WATCH, MULTI, EXEC),
+    so the backend can be checked without a real server.
+
+    :param host: The host to listen on.
+    :type host: str
+    :param port: The port to listen on, zero picks a free port.
+    :type port: int
+
+    Properties:
+    - url: URL of the server for the RespClient.
+
+    Methods:
+    - start: Start serving in the background thread.
+    - stop: Stop the server.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        store = _FakeStore()
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                # State of the transaction of the connection.
+                state = {"watched": {}, "queue": None}
+                while True:
+                    try:
+                        command = read_reply(self.rfile)
+                    except (OSError, ConnectionError):
+                        return
+                    if not isinstance(command, list) or not command:
+                        return
+                    self.wfile.write(encode_reply(store.execute(command, state)))
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL of the server for the RespClient.
+
+        :return: The URL.
+        :rtype: str
+        """
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRedisServer":
+        """Start serving in the background thread.
+
+        :return: The server.
+        :rtype: FakeRedisServer
+        """
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-redis", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _FakeStore:
+    """Data of the FakeRedisServer: the keys are strings or hashes, every change of the key
+    changes its version, which is checked by EXEC for the watched keys."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[bytes, Any] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._versions: Dict[bytes, int] = {}
+
+    def execute(self, command: List[bytes], state: Dict[str, Any]) -> Any:
+        """Run the command of the connection.
+
+        :param command: The name and the arguments of the command.
+        :type command: List[bytes]
+        :param state: The transaction state of the connection.
+        :type state: Dict[str, Any]
+        :return: The reply.
+        :rtype: Any
+        """
+        name = command[0].decode("utf-8").upper()
+        args = command[1:]
+        with self._lock:
+            if state["queue"] is not None and name not in ("EXEC", "DISCARD", "MULTI"):
+                state["queue"].append((name, args))
+                return "QUEUED"
+            if name == "MULTI":
+                state["queue"] = []
+                return "OK"
+            if name == "WATCH":
+                for key in args:
+                    self._expire(key)
+                    state["watched"][key] = self._versions.get(key, 0)
+                return "OK"
+            if name in ("UNWATCH", "DISCARD"):
+                state["watched"] = {}
+                state["queue"] = None
+                return "OK"
+            if name == "EXEC":
+                queue, watched = state["queue"], state["watched"]
+                state["queue"], state["watched"] = None, {}
+                if queue is None:
+                    return RespError("ERR EXEC without MULTI")
+                for key, version in watched.items():
+                    self._expire(key)
+                    if self._versions.get(key, 0) != version:
+                        return None
+                return [self._run(queued_name, queued_args) for queued_name, queued_args in queue]
+            return self._run(name, args)
+
+    def _expire(self, key: bytes) -> None:
+        """Delete the key, if its time to live is over."""
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._delete(key)
+
+    def _delete(self, key: bytes) -> bool:
+        """Delete the key.
+
+        :return: True if the key existed.
+        :rtype: bool
+        """
+        self._expires.pop(key, None)
+        if self._data.pop(key, None) is None:
+            return False
+        self._touch(key)
+        return True
+
+    def _touch(self, key: bytes) -> None:
+        """Change the version of the key."""
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _hash(self, key: bytes, create: bool = False) -> Optional[Dict[bytes, bytes]]:
+        """Get the hash of the key.
+
+        :raises RespError: If the key is not a hash.
+        :return: The hash, None if there is no key and it should not be created.
+        :rtype: Optional[Dict[bytes, bytes]]
+        """
+        self._expire(key)
+        value = self._data.get(key)
+        if value is None and create:
+            value = self._data[key] = {}
+        if value is not None and not isinstance(value, dict):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _run(self, name: str, args: List[bytes]) -> Any:
+        """Run the command outside of the transaction.
+
+        :param name: The name of the command.
+        :type name: str
+        :param args: The arguments of the command.
+        :type args: List[bytes]
+        :return: The reply.
+        :rtype: Any
+        """
+        try:
+            return self._dispatch(name, args)
+        except RespError as e:
+            return e
+        except (IndexError, ValueError):
+            return RespError(f"ERR wrong arguments for '{name.lower()}' command")
+
+    def _dispatch(self, name: str, args: List[bytes]) -> Any:
+        """Run the command, raising RespError on failure."""
+        if name == "PING":
+            return "PONG"
+        if name in ("AUTH", "SELECT"):
+            return "OK"
+        if name == "GET":
+            self._expire(args[0])
+            value = self._data.get(args[0])
+            if isinstance(value, dict):
+                raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+            return value
+        if name == "SET":
+            key, value = args[0], args[1]
+            options = [arg.upper() for arg in args[2:]]
+            self._expire(key)
+            if b"NX" in options and key in self._data:
+                return None
+            self._data[key] = value
+            self._expires.pop(key, None)
+            if b"PX" in options:
+                ttl = int(options[options.index(b"PX") + 1]) / 1000
+                self._expires[key] = time.monotonic() + ttl
+            self._touch(key)
+            return "OK"
+        if name == "DEL":
+            return sum(self._delete(key) for key in args)
+        if name == "EXISTS":
+            for key in args:
+                self._expire(key)
+            return sum(key in self._data for key in args)
+        if name == "HSET":
+            if len(args) < 3 or len(args) % 2 == 0:
+                raise ValueError
+            fields = self._hash(args[0], create=True)
+            added = 0
+            for field, value in zip(args[1::2], args[2::2]):
+                added += field not in fields
+                fields[field] = value
+            self._touch(args[0])
+            return added
+        if name == "HGET":
+            return (self._hash(args[0]) or {}).get(args[1])
+        if name == "HMGET":
+            fields = self._hash(args[0]) or {}
+            return [fields.get(field) for field in args[1:]]
+        if name == "HDEL":
+            fields = self._hash(args[0])
+            if not fields:
+                return 0
+            removed = sum(fields.pop(field, None) is not None for field in args[1:])
+            if not fields:
+                self._delete(args[0])
+            elif removed:
+                self._touch(args[0])
+            return removed
+        if name == "HKEYS":
+            return list(self._hash(args[0]) or {})
+        if name == "HLEN":
+            return len(self._hash(args[0]) or {})
+        if name == "HGETALL":
+            return [item for pair in (self._hash(args[0]) or {}).items() for item in pair]
+        if name == "HINCRBY":
+            fields = self._hash(args[0], create=True)
+            value = int(fields.get(args[1], b"0")) + int(args[2])
+            fields[args[1]] = str(value).encode("ascii")
+            self._touch(args[0])
+            return value
+        if name == "HINCRBYFLOAT":
+            fields = self._hash(args[0], create=True)
+            value = float(fields.get(args[1], b"0")) + float(args[2])
+            fields[args[1]] = repr(value).encode("ascii")
+            self._touch(args[0])
+            return fields[args[1]]
+        raise RespError(f"ERR unknown command '{name.lower()}'")
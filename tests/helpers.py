@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import supervisely as sly
+
+from src.features import LabelFeatures
+
+
+def label(class_name, area, label_id=0):
+    return LabelFeatures(class_name, area, 0, 0, 9, 9, "rectangle", label_id)
+
+
+def project_state(project):
+    return {
+        "updated_at": dict(project.updated_at),
+        "scopes": dict(project.image_scopes),
+        "areas": {
+            name: (stats.count, stats.total, stats.total_sq)
+            for name, stats in project.area_stats.items()
+            if stats.count
+        },
+        "labels": {
+            name: (project.label_counts.total(name), project.label_counts.images_with_class(name))
+            for name in project.label_counts.class_indices
+            if project.label_counts.total(name)
+        },
+    }
+
+
+def square(obj_class, size):
+    return sly.Label(sly.Rectangle(0, 0, size - 1, size - 1), obj_class)
+
+
+def annotation_info(image_id, labels):
+    return SimpleNamespace(
+        image_id=image_id,
+        image_name=f"{image_id}.jpg",
+        updated_at="t0",
+        annotation=sly.Annotation((1000, 1000), labels).to_json(),
+    )
+
+
+class FakeApi:
+    """Serves the datasets and the annotations of one project.
+
+    :param datasets: Dataset ID -> image ID -> labels of the image.
+    """
+
+    def __init__(self, datasets):
+        self.datasets = datasets
+        self.batches = []
+        self.updated_at = {}
+        self.failing_dataset = None
+        self.meta = None
+        self.meta_requests = 0
+        self.project = SimpleNamespace(get_meta=self.get_meta)
+        self.issue_ids = {}
+        self.issue_requests = []
+        self.filter_issues = True
+        self.issues = SimpleNamespace(get_list=self.get_issues, add=self.add_issue)
+        self.dataset = SimpleNamespace(get_list=self.get_datasets)
+        self.image = SimpleNamespace(get_list=self.get_images, get_info_by_id_batch=self.get_image_infos)
+        self.annotation = SimpleNamespace(download=self.download, download_batch=self.download_batch)
+
+    def get_meta(self, project_id):
+        self.meta_requests += 1
+        return self.meta.to_json()
+
+    def get_issues(self, team_id, filters=None):
+        self.issue_requests.append(("get_list", filters is not None))
+        if filters is not None and not self.filter_issues:
+            raise RuntimeError("The filters are not supported.")
+        names = [item["value"] for item in filters or []] or list(self.issue_ids)
+        return [SimpleNamespace(id=self.issue_ids[name], name=name) for name in names if name in self.issue_ids]
+
+    def add_issue(self, team_id, name, is_local=False):
+        self.issue_requests.append(("add", name))
+        self.issue_ids[name] = 100 + len(self.issue_ids)
+        return SimpleNamespace(id=self.issue_ids[name], name=name)
+
+    def get_datasets(self, project_id):
+        return [SimpleNamespace(id=dataset_id) for dataset_id in self.datasets]
+
+    def image_info(self, image_id):
+        return SimpleNamespace(id=image_id, updated_at=self.updated_at.get(image_id, "t0"))
+
+    def get_images(self, dataset_id, only_labelled=False):
+        return [self.image_info(image_id) for image_id in self.datasets[dataset_id]]
+
+    def get_image_infos(self, image_ids, force_metadata_for_links=True):
+        return [self.image_info(image_id) for image_id in image_ids]
+
+    def download(self, image_id, force_metadata_for_links=True):
+        for dataset_id, images in self.datasets.items():
+            if image_id in images:
+                return self.download_batch(dataset_id, [image_id])[0]
+        raise KeyError(image_id)
+
+    def download_batch(self, dataset_id, image_ids, force_metadata_for_links=True):
+        if dataset_id == self.failing_dataset:
+            raise RuntimeError("The download failed.")
+        self.batches.append((dataset_id, list(image_ids)))
+        return [annotation_info(image_id, self.datasets[dataset_id][image_id]) for image_id in image_ids]
@@ -0,0 +1,166 @@
+import io
+import threading
+import time
+
+import pytest
+
+from fake_redis import FakeRedisServer, encode_reply
+from helpers import label
+from src.backends import (
+    ImageRow,
+    MemoryBackend,
+    RedisBackend,
+    class_deltas,
+    create_backend,
+    iter_image_rows,
+)
+from src.resp import RespClient, RespError, encode_command, read_reply
+from src.stats import ProjectStats
+
+
+def row(image_id, *features, dataset_id=1, job_id=None):
+    return ImageRow(image_id, list(features), f"t{image_id}", dataset_id, job_id)
+
+
+@pytest.fixture
+def server():
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, server):
+    if request.param == "memory":
+        return MemoryBackend()
+    return RedisBackend(RespClient(server.url), "test")
+
+
+def test_replies_round_trip():
+    replies = ["OK", RespError("ERR failed"), 42, b"bulk\r\nstring", None, [1, [b"a", None], "QUEUED"]]
+    reader = io.BytesIO(b"".join(encode_reply(reply) for reply in replies))
+    decoded = [read_reply(reader) for _ in replies]
+    assert isinstance(decoded[1], RespError) and str(decoded[1]) == "ERR failed"
+    assert decoded[:1] + decoded[2:] == replies[:1] + replies[2:]
+
+    reader = io.BytesIO(encode_command(["HINCRBYFLOAT", "key", 0.1, 7]))
+    assert read_reply(reader) == [b"HINCRBYFLOAT", b"key", b"0.1", b"7"]
+    with pytest.raises(ConnectionError):
+        read_reply(io.BytesIO(b"$5\r\nab"))
+
+
+def test_client_pipelines_the_commands(server):
+    client = RespClient(server.url)
+    replies = client.pipeline(
+        [("SET", "a", "1"), ("GET", "a"), ("HINCRBY", "h", "f", 2), ("HINCRBY", "h", "f", 3), ("HGETALL", "h")]
+    )
+    assert replies == ["OK", b"1", 2, 5, [b"f", b"5"]]
+    assert client.round_trips == 1
+    assert client.commands == 5
+    with pytest.raises(RespError):
+        client.execute("GET", "h")
+    # The connection is still usable after the error reply.
+    assert client.execute("PING") == "PONG"
+
+
+def test_watched_transaction_fails_after_a_concurrent_change(server):
+    first, second = RespClient(server.url), RespClient(server.url)
+    first.pipeline([("WATCH", "key"), ("MULTI",), ("SET", "key", "first")])
+    second.execute("SET", "key", "second")
+    assert first.execute("EXEC") is None
+    assert first.execute("GET", "key") == b"second"
+
+
+def test_project_rows_and_aggregates(backend):
+    assert backend.get_project(5) is None
+    rows = [row(1, label("car", 10.0, 1), label("car", 30.0, 2), job_id=7), row(2, label("road", 500.0, 3)), row(3)]
+    backend.put_project(5, rows)
+    assert sorted(backend.get_project(5)) == sorted(rows)
+    assert backend.get_class_stats(5, ["car", "road", "sign"]) == {
+        "car": (2, 40.0, 1000.0),
+        "road": (1, 500.0, 250000.0),
+    }
+
+    backend.set_images(5, [row(2, label("car", 20.0, 4)), row(4, label("sign", 2.0, 5))])
+    backend.remove_images(5, [1, 100])
+    assert sorted(image.image_id for image in backend.get_project(5)) == [2, 3, 4]
+    assert backend.get_class_stats(5, ["car", "road", "sign"]) == {
+        "car": (1, 20.0, 400.0),
+        "sign": (1, 2.0, 4.0),
+    }
+
+    backend.drop_project(5)
+    assert backend.get_project(5) is None
+    assert backend.get_class_stats(5, ["car"]) == {}
+
+
+def test_meta_info_issues_and_lock(backend):
+    assert backend.get_meta(5) is None
+    backend.set_meta(5, {"classes": []})
+    backend.set_project_info(5, {"id": 5, "name": "project"})
+    assert backend.get_meta(5) == {"classes": []}
+    assert backend.get_project_info(5) == {"id": 5, "name": "project"}
+
+    backend.set_issue_id(1, "issue", 10)
+    assert backend.get_issue_id(1, "issue") == 10
+    backend.delete_issue_id(1, "issue")
+    assert backend.get_issue_id(1, "issue") is None
+
+    assert backend.try_lock_project(5, ttl=10)
+    assert not backend.try_lock_project(5, ttl=10)
+    backend.unlock_project(5)
+    assert backend.try_lock_project(5, ttl=10)
+
+
+def test_lock_of_another_session_is_not_released(server):
+    first = RedisBackend(RespClient(server.url), "test")
+    second = RedisBackend(RespClient(server.url), "test")
+    assert first.try_lock_project(5, ttl=0.05)
+    time.sleep(0.1)
+    # The lock expired and was taken by another session.
+    assert second.try_lock_project(5, ttl=10)
+    first.unlock_project(5)
+    assert not first.try_lock_project(5, ttl=10)
+
+
+def test_concurrent_updates_keep_exact_aggregates(server):
+    client = RespClient(server.url)
+    backend = RedisBackend(client, "test")
+    backend.put_project(5, [row(image_id, label("car", 1.0)) for image_id in range(8)])
+    barrier = threading.Barrier(8)
+
+    def update(image_id):
+        barrier.wait(5)
+        for area in range(2, 12):
+            backend.set_images(5, [row(image_id, label("car", float(area)), label("road", 1.0))])
+
+    threads = [threading.Thread(target=update, args=(image_id,)) for image_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+        assert not thread.is_alive()
+    assert backend.get_class_stats(5, ["car", "road"]) == {
+        "car": (8, 88.0, 968.0),
+        "road": (8, 8.0, 8.0),
+    }
+    assert sorted(backend.get_project(5)) == sorted(
+        row(image_id, label("car", 11.0), label("road", 1.0)) for image_id in range(8)
+    )
+
+
+def test_rows_of_the_project_and_class_deltas():
+    project = ProjectStats()
+    project.set_image(1, [label("car", 10.0, 1)], "t1", 1, 7)
+    project.set_image(2, [], "t2", 1)
+    assert sorted(iter_image_rows(project)) == [row(1, label("car", 10.0, 1), job_id=7), row(2)]
+
+    deltas = class_deltas([label("car", 10.0), label("road", 5.0)], [label("car", 10.0), label("car", 2.0)])
+    assert deltas == {"car": (1, 2.0, 4.0), "road": (-1, -5.0, -25.0)}
+
+
+def test_create_backend():
+    assert create_backend("", "", "test") is None
+    assert isinstance(create_backend("memory", "", "test"), MemoryBackend)
+    with pytest.raises(ValueError):
+        create_backend("unknown", "", "test")
@@ -0,0 +1,157 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import supervisely as sly
+
+import src.globals as g
+from helpers import FakeApi, annotation_info, square
+from src.cache import Cache
+
+CAR = sly.ObjClass("car", sly.Rectangle)
+META = sly.ProjectMeta(obj_classes=[CAR])
+
+_project_ids = itertools.count(2000)
+
+
+@pytest.fixture
+def project_id():
+    project_id = next(_project_ids)
+    Cache.project_meta[project_id] = META
+    Cache.project_info[project_id] = SimpleNamespace(id=project_id, name="project")
+    return project_id
+
+
+def test_warm_up_downloads_all_datasets_in_batches(project_id, monkeypatch):
+    api = FakeApi(
+        {
+            1: {image_id: [square(CAR, 10), square(CAR, 20)] for image_id in range(5)},
+            2: {image_id: [square(CAR, 30)] for image_id in range(5, 8)},
+            3: {},
+        }
+    )
+    monkeypatch.setattr(g, "spawn_api", api)
+    monkeypatch.setattr(g, "warmup_batch_size", 2)
+
+    Cache().cache_annotation_infos(project_id)
+
+    assert sorted(api.batches) == [
+        (1, [0, 1]),
+        (1, [2, 3]),
+        (1, [4]),
+        (2, [5, 6]),
+        (2, [7]),
+    ]
+    project = Cache().get_project_stats(project_id)
+    assert project.area_stats["car"].count == 13
+    assert project.area_stats["car"].total == 5 * (100 + 400) + 3 * 900
+    assert project.label_counts.images_with_class("car") == 8
+
+
+def test_failed_warm_up_leaves_no_statistics(project_id, monkeypatch):
+    api = FakeApi({1: {0: [square(CAR, 10)]}, 2: {1: [square(CAR, 10)]}})
+    api.failing_dataset = 2
+    monkeypatch.setattr(g, "spawn_api", api)
+
+    with pytest.raises(RuntimeError):
+        Cache().cache_annotation_infos(project_id)
+    assert project_id not in Cache().projects
+
+
+def test_concurrent_warm_ups_of_the_project_download_it_once(project_id, monkeypatch):
+    api = FakeApi({1: {image_id: [square(CAR, 10)] for image_id in range(4)}})
+    get_datasets = api.get_datasets
+    listings = []
+
+    def slow_get_datasets(project_id):
+        listings.append(project_id)
+        time.sleep(0.1)
+        return get_datasets(project_id)
+
+    api.dataset.get_list = slow_get_datasets
+    monkeypatch.setattr(g, "spawn_api", api)
+
+    threads = [threading.Thread(target=Cache().cache_annotation_infos, args=(project_id,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+    assert listings == [project_id]
+    assert len(api.batches) == 1
+    assert Cache().get_project_stats(project_id).area_stats["car"].count == 4
+
+
+def test_least_recently_used_projects_are_evicted(monkeypatch):
+    monkeypatch.setattr(g, "spawn_api", FakeApi({1: {0: [square(CAR, 10)]}}))
+    monkeypatch.setattr(g, "cache_max_projects", 2)
+    first, second, third = (next(_project_ids) for _ in range(3))
+    for project_id in (first, second, third):
+        Cache.project_meta[project_id] = META
+        Cache.project_info[project_id] = SimpleNamespace(id=project_id, name="project")
+        Cache().cache_annotation_infos(project_id)
+        if project_id == second:
+            # The first project is used again, the second one becomes the least recently used.
+            Cache().get_project_stats(first)
+
+    assert list(Cache().projects) == [first, third]
+    assert second not in Cache.project_meta
+    assert Cache().metrics()["evictions"] >= 1
+
+
+def test_project_is_restored_from_the_snapshot(project_id, monkeypatch):
+    api = FakeApi({1: {image_id: [square(CAR, 10)] for image_id in range(3)}})
+    monkeypatch.setattr(g, "spawn_api", api)
+    Cache().cache_annotation_infos(project_id)
+    Cache().update_cached_annotation_info(project_id, 0, annotation_info(0, [square(CAR, 20)]))
+
+    # The in-memory copy is lost, as after the restart of the app.
+    Cache.projects.pop(project_id)
+    Cache().cache_annotation_infos(project_id)
+
+    assert len(api.batches) == 1
+    stats = Cache().get_project_stats(project_id).area_stats["car"]
+    assert (stats.count, stats.total) == (3, 400 + 2 * 100)
+
+
+def test_sync_downloads_only_changed_images_and_drops_removed_ones(project_id, monkeypatch):
+    api = FakeApi({1: {image_id: [square(CAR, 10)] for image_id in range(4)}})
+    monkeypatch.setattr(g, "spawn_api", api)
+    Cache().cache_annotation_infos(project_id)
+    # The image is confirmed in the labeling job, its update time is stored with it.
+    Cache().update_cached_annotation_info(
+        project_id, 3, annotation_info(3, [square(CAR, 10)]), updated_at="t0"
+    )
+
+    api.batches.clear()
+    api.datasets[1][1] = [square(CAR, 20)]
+    api.updated_at[1] = "t1"
+    api.datasets[1][4] = [square(CAR, 30)]
+    del api.datasets[1][2]
+    Cache().sync_project(project_id)
+
+    assert api.batches == [(1, [1, 4])]
+    project = Cache().get_project_stats(project_id)
+    assert project.updated_at == {0: "t0", 1: "t1", 3: "t0", 4: "t0"}
+    stats = project.area_stats["car"]
+    assert (stats.count, stats.total) == (4, 100 + 400 + 100 + 900)
+
+
+def test_warm_up_parses_the_batches_in_processes(project_id, monkeypatch):
+    api = FakeApi({1: {image_id: [square(CAR, 10), square(CAR, 20)] for image_id in range(4)}})
+    monkeypatch.setattr(g, "spawn_api", api)
+    monkeypatch.setattr(g, "warmup_parse_processes", 1)
+    monkeypatch.setattr(g, "warmup_parse_min_images", 2)
+    Cache.project_info[project_id].items_count = 4
+    try:
+        Cache().cache_annotation_infos(project_id)
+        assert Cache._parse_pool is not None
+    finally:
+        if Cache._parse_pool is not None:
+            Cache._parse_pool.shutdown()
+            Cache._parse_pool = None
+
+    stats = Cache().get_project_stats(project_id).area_stats["car"]
+    assert (stats.count, stats.total) == (8, 4 * (100 + 400))
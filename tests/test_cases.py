@@ -0,0 +1,215 @@
+import itertools
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+import supervisely as sly
+
+import src.globals as g
+import src.test.cases  # registers the cases
+from helpers import FakeApi, annotation_info, square
+from src.cache import Cache
+from src.test import bases
+
+CAR = sly.ObjClass("car", sly.Rectangle)
+ROAD = sly.ObjClass("road", sly.Rectangle)
+META = sly.ProjectMeta(obj_classes=[CAR, ROAD])
+
+_project_ids = itertools.count(1000)
+
+
+def typical_labels():
+    return [square(CAR, 10), square(CAR, 10), square(ROAD, 30)]
+
+
+def cache_project(monkeypatch, images, meta=META):
+    project_id = next(_project_ids)
+    Cache.project_meta[project_id] = meta
+    Cache.project_info[project_id] = SimpleNamespace(id=project_id, name="project", team_id=1)
+    Cache.issues[1]["Annotation Quality Check: project"] = 1
+    api = FakeApi({1: images})
+    # The images are updated in the order of their IDs.
+    api.updated_at = {image_id: f"{image_id:04d}" for image_id in images}
+    monkeypatch.setattr(g, "spawn_api", api)
+    Cache().cache_annotation_infos(project_id)
+    return project_id
+
+
+@pytest.fixture
+def project_id(monkeypatch):
+    return cache_project(monkeypatch, {image_id: typical_labels() for image_id in range(10)})
+
+
+def run_test(project_id, image_id, labels, meta=META):
+    test = bases.Test(Cache().get_project_info(project_id), meta, annotation_info(image_id, labels))
+    return test, test.run()
+
+
+def test_typical_image_passes(project_id):
+    _, reports = run_test(project_id, 100, typical_labels())
+    assert reports == []
+
+
+def test_outliers_are_reported(project_id):
+    _, reports = run_test(project_id, 100, [square(CAR, 30), square(ROAD, 30)])
+    assert len(reports) == 2
+    assert "area that differs from mean area" in reports[0]
+    assert "number of labels for classes ['car']" in reports[1]
+
+
+def test_annotation_is_parsed_once_per_event(project_id, monkeypatch):
+    from_json = sly.Annotation.from_json
+    calls = []
+
+    def counting_from_json(*args, **kwargs):
+        calls.append(args)
+        return from_json(*args, **kwargs)
+
+    monkeypatch.setattr(sly.Annotation, "from_json", counting_from_json)
+    test, _ = run_test(project_id, 100, [square(CAR, 30), square(ROAD, 30)])
+    assert len(calls) == 1
+
+    # The cache is updated with the already parsed annotation.
+    Cache().update_cached_annotation_info(
+        project_id, 100, test.context.annotation_info, annotation=test.context.annotation
+    )
+    assert len(calls) == 1
+
+
+def test_statistics_snapshot_does_not_change_during_the_event(project_id):
+    test = bases.Test(Cache().get_project_info(project_id), META, annotation_info(100, typical_labels()))
+    stats = test.context.stats
+    car = test.context.compiled_meta.class_id("car")
+    for image_id in range(10):
+        Cache().update_cached_annotation_info(
+            project_id, image_id, annotation_info(image_id, [square(CAR, 50)])
+        )
+    assert stats.get_area_stats(car).mean == 100.0
+    assert stats.average_label_count(car) == 2.0
+    assert test.run() == []
+
+
+def test_median_mode_ignores_the_outliers_of_the_project(monkeypatch):
+    images = {image_id: typical_labels() for image_id in range(9)}
+    images[9] = [square(CAR, 300), square(CAR, 300), square(ROAD, 30)]
+    project_id = cache_project(monkeypatch, images)
+
+    _, reports = run_test(project_id, 100, typical_labels())
+    assert len(reports) == 1
+    assert "area that differs from mean area" in reports[0]
+
+    monkeypatch.setattr(g, "average_label_area_case_mode", g.MEDIAN_MODE)
+    _, reports = run_test(project_id, 100, typical_labels())
+    assert reports == []
+    _, reports = run_test(project_id, 100, [square(CAR, 20), square(CAR, 10), square(ROAD, 30)])
+    assert len(reports) == 1
+    assert "area that differs from median area" in reports[0]
+
+
+def test_recent_mode_follows_the_recent_labeling(monkeypatch):
+    # The labeling guidelines changed: the recent images have bigger cars.
+    images = {image_id: typical_labels() for image_id in range(20)}
+    images.update({image_id: [square(CAR, 20), square(CAR, 20), square(ROAD, 30)] for image_id in range(20, 30)})
+    monkeypatch.setattr(g, "decay_half_life_images", 2)
+    project_id = cache_project(monkeypatch, images)
+    recent_labels = [square(CAR, 20), square(CAR, 20), square(ROAD, 30)]
+
+    _, reports = run_test(project_id, 100, recent_labels)
+    assert len(reports) == 1
+    assert "area that differs from mean area" in reports[0]
+
+    monkeypatch.setattr(g, "average_label_area_case_mode", g.RECENT_MODE)
+    _, reports = run_test(project_id, 100, recent_labels)
+    assert reports == []
+    _, reports = run_test(project_id, 100, typical_labels())
+    assert len(reports) == 1
+    assert "area that differs from recent area" in reports[0]
+
+
+@pytest.mark.parametrize("mode", [g.MEAN_MODE, g.RECENT_MODE])
+def test_zero_average_area_is_not_compared(monkeypatch, mode):
+    # The points have no area, so the average area of their class is zero.
+    sign = sly.ObjClass("sign", sly.Point)
+    meta = sly.ProjectMeta(obj_classes=[sign])
+    signs = [sly.Label(sly.Point(5, 5), sign), sly.Label(sly.Point(7, 7), sign)]
+    project_id = cache_project(monkeypatch, {image_id: signs for image_id in range(10)}, meta)
+    monkeypatch.setattr(g, "average_label_area_case_mode", mode)
+    test = bases.Test(Cache().get_project_info(project_id), meta, annotation_info(100, signs))
+    # The failed case is only logged by the test, so the case is run directly.
+    assert src.test.cases.AverageLabelAreaCase(test.context).run() is None
+
+
+def make_memo_test(image_id, annotation, job_id=None, dataset_id=1):
+    return bases.Test(
+        SimpleNamespace(id=1),
+        None,
+        SimpleNamespace(image_id=image_id, annotation=annotation),
+        job_id,
+        dataset_id=dataset_id,
+    )
+
+
+def test_memo_key_differs_for_images_with_identical_annotations():
+    annotation = {"description": "", "size": {"height": 10, "width": 10}, "tags": [], "objects": []}
+    context = SimpleNamespace(
+        stats=SimpleNamespace(version=3), compiled_meta=SimpleNamespace(version="v1")
+    )
+
+    key = make_memo_test(1, annotation)._memo_key(context)
+    assert make_memo_test(1, dict(annotation))._memo_key(context) == key
+    assert make_memo_test(2, dict(annotation))._memo_key(context) != key
+    assert make_memo_test(1, annotation, job_id=5)._memo_key(context) != key
+    assert make_memo_test(1, annotation, dataset_id=2)._memo_key(context) != key
+    changed = SimpleNamespace(stats=SimpleNamespace(version=4), compiled_meta=context.compiled_meta)
+    assert make_memo_test(1, annotation)._memo_key(changed) != key
+
+
+def test_result_memo_evicts_the_least_recently_used_checks():
+    memo = bases.ResultMemo(2)
+    memo.put("a", ("report a",))
+    memo.put("b", ("report b",))
+    assert memo.get("a") == ("report a",)
+    memo.put("c", ("report c",))
+    assert memo.get("b") is None
+    assert memo.get("a") == ("report a",)
+    assert memo.get("c") == ("report c",)
+
+
+class RecordingDispatcher:
+    """Runs the issue lookup at once and records the requests."""
+
+    def __init__(self):
+        self.requests = []
+
+    def submit(self, endpoint, func, *args, priority=None, **kwargs):
+        future = Future()
+        if endpoint == "issues.get_or_create":
+            future.set_result(func(*args, **kwargs))
+        else:
+            self.requests.append((endpoint, args))
+            future.set_result(None)
+        return future
+
+
+def test_failed_cases_are_reported_in_one_comment_and_subissue(project_id, monkeypatch):
+    dispatcher = RecordingDispatcher()
+    monkeypatch.setattr(bases, "dispatcher", dispatcher)
+    monkeypatch.setattr(g, "create_issues", True)
+    g.spawn_api.issues = SimpleNamespace(add_comment=None, add_subissue=None)
+    labels = [
+        sly.Label(sly.Rectangle(3, 4, 32, 33), CAR, sly_id=11),
+        sly.Label(sly.Rectangle(5, 2, 40, 40), CAR, sly_id=12),
+        sly.Label(sly.Rectangle(50, 50, 59, 59), CAR, sly_id=13),
+        sly.Label(sly.Rectangle(0, 0, 29, 29), ROAD, sly_id=14),
+    ]
+    test, reports = run_test(project_id, 100, labels)
+    assert len(reports) == 2
+    assert test.report == "\n\n".join(reports)
+
+    test.create_issues()
+    assert [endpoint for endpoint, _ in dispatcher.requests] == ["issues.add_comment", "issues.add_subissue"]
+    issue_id, comment = dispatcher.requests[0][1]
+    assert issue_id == 1
+    assert comment.startswith(test.report)
+    assert comment.count("Image ID: 100") == 1
+    assert dispatcher.requests[1][1] == (1, [100], [11, 12], 3, 2)
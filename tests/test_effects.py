@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from src.effects import HIGH_PRIORITY, LOW_PRIORITY, EffectDispatcher, RateLimiter
+
+
+def test_high_priority_effects_are_started_first():
+    dispatcher = EffectDispatcher(max_workers=1, rate_limits={})
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def blocker():
+        started.set()
+        assert release.wait(5)
+
+    dispatcher.submit("blocker", blocker)
+    assert started.wait(5)
+    futures = [
+        dispatcher.submit("issues", calls.append, "comment", priority=LOW_PRIORITY),
+        dispatcher.submit("issues", calls.append, "subissue", priority=LOW_PRIORITY),
+        dispatcher.submit("notification", calls.append, "notification", priority=HIGH_PRIORITY),
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert calls == ["notification", "comment", "subissue"]
+    assert dispatcher.metrics()["succeeded"] == 4
+
+
+def test_failed_requests_are_retried():
+    dispatcher = EffectDispatcher(max_workers=2, rate_limits={}, max_retries=2, backoff=0.0)
+    attempts = []
+
+    def flaky(fail_times):
+        attempts.append(fail_times)
+        if attempts.count(fail_times) <= fail_times:
+            raise ConnectionError("The server is busy.")
+        return fail_times
+
+    assert dispatcher.submit("flaky", flaky, 2).result(5) == 2
+    with pytest.raises(ConnectionError):
+        dispatcher.submit("flaky", flaky, 3).result(5)
+    metrics = dispatcher.metrics()
+    assert (metrics["succeeded"], metrics["failed"], metrics["retried"]) == (1, 1, 4)
+
+
+def test_rate_limiter_spaces_the_requests():
+    limiter = RateLimiter(rate=50.0, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # The first request uses the burst, the next ones wait 20 ms each.
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,172 @@
+import threading
+import time
+
+from src.events import EventQueue
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "The condition was not met in time."
+        time.sleep(0.01)
+
+
+def make_queue(handler, max_size=10, num_workers=1, coalesce_window=0.0):
+    return EventQueue(
+        handler,
+        max_size,
+        num_workers,
+        key=lambda event: event["image_id"],
+        coalesce_window=coalesce_window,
+    )
+
+
+def test_events_are_processed_in_the_background():
+    processed = []
+    events = EventQueue(processed.append, max_size=10, num_workers=1)
+
+    for image_id in range(5):
+        assert events.put({"image_id": image_id})
+    wait_for(lambda: events.metrics()["processed"] == 5)
+    assert [event["image_id"] for event in processed] == [0, 1, 2, 3, 4]
+    metrics = events.metrics()
+    assert metrics["enqueued"] == 5
+    assert metrics["depth"] == 0
+    assert metrics["max_wait"] >= metrics["avg_wait"] >= 0.0
+
+
+def test_full_queue_drops_new_events_and_keeps_the_queued_ones():
+    started, release = threading.Event(), threading.Event()
+    processed = []
+
+    def handler(event):
+        started.set()
+        assert release.wait(5)
+        processed.append(event["image_id"])
+
+    events = EventQueue(handler, max_size=2, num_workers=1)
+    events.put({"image_id": 0})
+    assert started.wait(5)
+    assert events.put({"image_id": 1})
+    assert events.put({"image_id": 2})
+    assert not events.put({"image_id": 3})
+    assert events.depth == 2
+
+    release.set()
+    wait_for(lambda: events.metrics()["processed"] == 3)
+    assert processed == [0, 1, 2]
+    assert events.metrics()["dropped"] == 1
+
+
+def test_failed_event_does_not_stop_the_worker():
+    processed = []
+
+    def handler(event):
+        if event["image_id"] == 1:
+            raise ValueError("The event failed.")
+        processed.append(event["image_id"])
+
+    events = EventQueue(handler, max_size=10, num_workers=1)
+    events.put({"image_id": 1})
+    events.put({"image_id": 2})
+    wait_for(lambda: events.metrics()["processed"] == 1)
+    assert processed == [2]
+    assert events.metrics()["failed"] == 1
+
+
+def test_quick_resubmissions_are_processed_once_with_the_latest_event():
+    processed = []
+    events = make_queue(processed.append, coalesce_window=0.2)
+
+    for version in range(5):
+        assert events.put({"image_id": 1, "version": version})
+    assert events.put({"image_id": 2, "version": 0})
+
+    wait_for(lambda: events.metrics()["processed"] == 2)
+    assert processed == [{"image_id": 1, "version": 4}, {"image_id": 2, "version": 0}]
+    metrics = events.metrics()
+    assert metrics["enqueued"] == 2
+    assert metrics["superseded"] == 4
+    assert metrics["depth"] == 0
+
+
+def test_event_after_the_window_is_processed_again():
+    processed = []
+    events = make_queue(processed.append)
+
+    events.put({"image_id": 1, "version": 0})
+    wait_for(lambda: events.metrics()["processed"] == 1)
+    events.put({"image_id": 1, "version": 1})
+    wait_for(lambda: events.metrics()["processed"] == 2)
+    assert [event["version"] for event in processed] == [0, 1]
+    assert events.metrics()["superseded"] == 0
+
+
+def test_waiting_event_is_superseded_even_if_the_queue_is_full():
+    started, release = threading.Event(), threading.Event()
+    processed = []
+
+    def handler(event):
+        started.set()
+        assert release.wait(5)
+        processed.append((event["image_id"], event["version"]))
+
+    events = make_queue(handler, max_size=1)
+    events.put({"image_id": 0, "version": 0})
+    assert started.wait(5)
+    assert events.put({"image_id": 1, "version": 0})
+    assert not events.put({"image_id": 2, "version": 0})
+    assert events.put({"image_id": 1, "version": 1})
+
+    release.set()
+    wait_for(lambda: events.metrics()["processed"] == 2)
+    assert processed == [(0, 0), (1, 1)]
+    metrics = events.metrics()
+    assert metrics["dropped"] == 1
+    assert metrics["superseded"] == 1
+
+
+def test_events_with_the_same_key_are_not_processed_concurrently():
+    release = threading.Event()
+    lock = threading.Lock()
+    active, max_active, processed = {}, {}, []
+
+    def handler(event):
+        image_id = event["image_id"]
+        with lock:
+            active[image_id] = active.get(image_id, 0) + 1
+            max_active[image_id] = max(max_active.get(image_id, 0), active[image_id])
+        if image_id == 1:
+            assert release.wait(5)
+        with lock:
+            active[image_id] -= 1
+            processed.append((image_id, event["version"]))
+
+    events = make_queue(handler, num_workers=2)
+    events.put({"image_id": 1, "version": 0})
+    wait_for(lambda: active.get(1) == 1)
+    events.put({"image_id": 1, "version": 1})
+    # The other key is processed by the free worker, the key in progress waits.
+    events.put({"image_id": 2, "version": 0})
+    wait_for(lambda: events.metrics()["processed"] == 1)
+    time.sleep(0.1)
+    assert processed == [(2, 0)]
+    assert events.depth == 1
+
+    release.set()
+    wait_for(lambda: events.metrics()["processed"] == 3)
+    assert processed == [(2, 0), (1, 0), (1, 1)]
+    assert max_active == {1: 1, 2: 1}
+
+
+def test_superseded_event_does_not_hold_back_the_ready_events():
+    processed = []
+    events = make_queue(processed.append, coalesce_window=0.3)
+
+    events.put({"image_id": 1, "version": 0})
+    events.put({"image_id": 2, "version": 0})
+    time.sleep(0.1)
+    # The window of the image 1 restarts, the image 2 is ready first.
+    events.put({"image_id": 1, "version": 1})
+    wait_for(lambda: events.metrics()["processed"] == 2)
+    assert processed == [{"image_id": 2, "version": 0}, {"image_id": 1, "version": 1}]
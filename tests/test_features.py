@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import supervisely as sly
+
+from src.features import (
+    BitmapMemo,
+    LabelFeatures,
+    extract_features,
+    extract_features_from_json,
+    extract_packed_features,
+    pack_features,
+    unpack_features,
+)
+
+
+def test_features_of_the_labels():
+    car = sly.ObjClass("car", sly.Rectangle)
+    annotation = sly.Annotation((100, 100)).add_labels(
+        [sly.Label(sly.Rectangle(10, 20, 19, 49), car), sly.Label(sly.Rectangle(0, 0, 0, 0), car)]
+    )
+    assert extract_features(annotation) == [
+        LabelFeatures("car", 300.0, 10, 20, 19, 49, "rectangle", -1),
+        LabelFeatures("car", 1.0, 0, 0, 0, 0, "rectangle", -1),
+    ]
+
+
+def make_mask():
+    mask = np.zeros((20, 30), dtype=bool)
+    mask[3:8, 5:25] = True
+    mask[10, 2] = True
+    return mask
+
+
+def make_annotation():
+    car = sly.ObjClass("car", sly.Rectangle)
+    field = sly.ObjClass("field", sly.Polygon)
+    pole = sly.ObjClass("pole", sly.Point)
+    mask = sly.ObjClass("mask", sly.Bitmap)
+    field_with_hole = sly.Polygon(
+        [sly.PointLocation(5.7, 5.2), sly.PointLocation(5, 80), sly.PointLocation(90.9, 80), sly.PointLocation(90, 5)],
+        interior=[[sly.PointLocation(20, 20), sly.PointLocation(20, 40), sly.PointLocation(40.5, 30)]],
+    )
+    labels = [
+        sly.Label(sly.Rectangle(10, 20, 19, 49), car, sly_id=7),
+        sly.Label(field_with_hole, field),
+        sly.Label(sly.Polygon([sly.PointLocation(1, 1), sly.PointLocation(1, 9), sly.PointLocation(9, 1)]), field),
+        sly.Label(sly.Point(50.6, 60.2), pole),
+        sly.Label(sly.Bitmap(make_mask(), origin=sly.PointLocation(30, 40)), mask),
+    ]
+    meta = sly.ProjectMeta(obj_classes=[car, field, pole, mask])
+    return sly.Annotation((100, 120)).add_labels(labels), meta
+
+
+def test_json_extractor_matches_the_sdk():
+    annotation, meta = make_annotation()
+    annotation_json = annotation.to_json()
+    expected = extract_features(sly.Annotation.from_json(annotation_json, meta))
+
+    assert extract_features_from_json(annotation_json) == expected
+    assert extract_features_from_json(json.dumps(annotation_json)) == expected
+    class_names = {"car", "field", "pole", "mask"}
+    assert extract_features_from_json(annotation_json, class_names=class_names) == expected
+    assert expected[0].label_id == 7
+    assert expected[-1][1:6] == (101.0, 33, 42, 40, 64)
+
+
+def test_json_extractor_falls_back_to_the_sdk():
+    annotation, _ = make_annotation()
+    # A label of the class, which is not in the meta.
+    assert extract_features_from_json(annotation.to_json(), class_names={"car", "field", "pole"}) is None
+
+    # A label outside the image is cropped by the SDK.
+    outside = annotation.to_json()
+    outside["objects"][0]["points"]["exterior"] = [[100, 90], [130, 110]]
+    assert extract_features_from_json(outside) is None
+
+    # The SDK does not allow empty bitmaps.
+    empty = annotation.to_json()
+    empty["objects"][-1]["bitmap"]["data"] = sly.Bitmap.data_2_base64(np.zeros((4, 4), dtype=bool))
+    assert extract_features_from_json(empty) is None
+
+
+def test_bitmaps_are_decoded_once():
+    annotation_json = make_annotation()[0].to_json()
+    expected = extract_features_from_json(annotation_json)
+    memo = BitmapMemo(max_size=1)
+    assert extract_features_from_json(annotation_json, bitmap_memo=memo) == expected
+    assert extract_features_from_json(annotation_json, bitmap_memo=memo) == expected
+    assert (memo.hits, memo.misses) == (1, 1)
+
+    # The least recently used mask is dropped, when the memo is full.
+    other = np.ones((2, 2), dtype=bool)
+    memo.get(sly.Bitmap.data_2_base64(other))
+    assert extract_features_from_json(annotation_json, bitmap_memo=memo) == expected
+    assert (memo.hits, memo.misses) == (1, 3)
+
+
+def test_packed_features_are_unpacked_unchanged():
+    annotation, _ = make_annotation()
+    features = extract_features(annotation)
+    features_per_image = [features, None, [], features[:1]]
+    assert unpack_features(pack_features(features_per_image)) == features_per_image
+    assert unpack_features(pack_features([])) == []
+
+
+def test_worker_extracts_the_batch_with_the_fallback():
+    annotation, meta = make_annotation()
+    unknown = annotation.to_json()
+    unknown["objects"][0]["classTitle"] = "unknown"
+    # The label outside the image goes through sly.Annotation, which crops it.
+    outside = annotation.to_json()
+    outside["objects"][0]["points"]["exterior"] = [[100, 90], [130, 110]]
+
+    packed = extract_packed_features([annotation.to_json(), unknown, outside], meta.to_json(), "v1")
+    features, failed, cropped = unpack_features(packed)
+    assert features == extract_features(annotation)
+    assert failed is None
+    assert cropped[0][1:6] == (200.0, 90, 100, 99, 119)
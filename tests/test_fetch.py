@@ -0,0 +1,49 @@
+import threading
+
+import supervisely as sly
+
+from helpers import FakeApi, square
+from src.fetch import AnnotationFetcher
+
+CAR = sly.ObjClass("car", sly.Rectangle)
+
+
+def test_annotation_is_returned_with_the_update_time_of_the_image():
+    api = FakeApi({1: {1: [square(CAR, 10)], 2: [square(CAR, 20)]}})
+    api.updated_at = {1: "t1", 2: "t2"}
+    fetcher = AnnotationFetcher(api, memo_size=10, window=0.0)
+
+    annotation_info, updated_at = fetcher.fetch(1, 1)
+    assert (annotation_info.image_id, updated_at) == (1, "t1")
+
+    # The image was not updated, the memoized annotation is returned with the same time.
+    assert fetcher.fetch(1, 1) == (annotation_info, "t1")
+    assert api.batches == [(1, [1])]
+
+    api.datasets[1][1] = [square(CAR, 30)]
+    api.updated_at[1] = "t3"
+    new_annotation_info, updated_at = fetcher.fetch(1, 1)
+    assert updated_at == "t3"
+    assert new_annotation_info.annotation != annotation_info.annotation
+    assert api.batches == [(1, [1]), (1, [1])]
+    assert fetcher.metrics()["memo_hits"] == 1
+
+
+def test_requests_within_the_window_share_one_batch():
+    api = FakeApi({1: {image_id: [square(CAR, 10)] for image_id in range(4)}})
+    api.updated_at = {image_id: f"t{image_id}" for image_id in range(4)}
+    fetcher = AnnotationFetcher(api, memo_size=0, window=0.2)
+    results = {}
+
+    def fetch(image_id):
+        results[image_id] = fetcher.fetch(1, image_id)
+
+    threads = [threading.Thread(target=fetch, args=(image_id % 4,)) for image_id in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+    assert {image_id: updated_at for image_id, (_, updated_at) in results.items()} == api.updated_at
+    assert len(api.batches) == 1
+    assert sorted(api.batches[0][1]) == [0, 1, 2, 3]
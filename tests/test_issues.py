@@ -0,0 +1,81 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+import src.globals as g
+from helpers import FakeApi
+from src.cache import Cache
+
+_team_ids = itertools.count(10)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeApi({})
+    monkeypatch.setattr(g, "spawn_api", api)
+    return api
+
+
+def test_issue_is_found_or_created_once(api):
+    team_id = next(_team_ids)
+    api.issue_ids["existing"] = 7
+    assert Cache().get_issued_id("existing", team_id) == 7
+
+    add_issue = api.add_issue
+
+    def slow_add_issue(*args, **kwargs):
+        time.sleep(0.1)
+        return add_issue(*args, **kwargs)
+
+    api.issues.add = slow_add_issue
+    issue_ids = []
+    threads = [
+        threading.Thread(target=lambda: issue_ids.append(Cache().get_issued_id("new", team_id)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(set(issue_ids)) == 1 and len(issue_ids) == 4
+    assert api.issue_requests.count(("add", "new")) == 1
+    assert Cache().get_issued_id("existing", team_id) == 7
+    assert len(api.issue_requests) == 3
+
+
+def test_issue_index_is_restored_from_the_snapshot(api):
+    team_id = next(_team_ids)
+    api.issue_ids["existing"] = 7
+    assert Cache().get_issued_id("existing", team_id) == 7
+    assert Cache().get_issued_id("new", team_id) == 101
+
+    # The index is lost, as after the restart of the app.
+    Cache.issues.pop(team_id)
+    Cache._restored_issue_teams.discard(team_id)
+    api.issue_requests.clear()
+    assert Cache().get_issued_id("existing", team_id) == 7
+    assert Cache().get_issued_id("new", team_id) == 101
+    assert api.issue_requests == []
+
+
+def test_issues_are_listed_once_if_the_server_can_not_filter_them(api):
+    team_id = next(_team_ids)
+    api.filter_issues = False
+    api.issue_ids.update({"first": 7, "second": 8})
+    assert Cache().get_issued_id("first", team_id) == 7
+    assert Cache().get_issued_id("second", team_id) == 8
+    assert Cache().get_issued_id("third", team_id) == 102
+    assert api.issue_requests == [("get_list", True), ("get_list", False), ("add", "third")]
+
+
+def test_forgotten_issue_is_looked_up_again(api):
+    team_id = next(_team_ids)
+    api.issue_ids["deleted"] = 7
+    assert Cache().get_issued_id("deleted", team_id) == 7
+
+    # The issue was deleted and created again on the server.
+    api.issue_ids["deleted"] = 9
+    Cache().forget_issue("deleted", team_id)
+    assert Cache().get_issued_id("deleted", team_id) == 9
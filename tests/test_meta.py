@@ -0,0 +1,131 @@
+import itertools
+import threading
+from types import SimpleNamespace
+
+import pytest
+import supervisely as sly
+
+import src.globals as g
+from helpers import FakeApi, annotation_info, square
+from src.cache import Cache
+from src.utils import diff_project_metas, get_meta_version
+
+CAR = sly.ObjClass("car", sly.Rectangle, sly_id=1)
+ROAD = sly.ObjClass("road", sly.Rectangle, sly_id=2)
+TREE = sly.ObjClass("tree", sly.Rectangle, sly_id=3)
+META = sly.ProjectMeta(obj_classes=[CAR, ROAD, TREE])
+
+_project_ids = itertools.count(3000)
+
+
+@pytest.fixture
+def project_id(monkeypatch):
+    project_id = next(_project_ids)
+    api = FakeApi({1: {0: [square(CAR, 10), square(ROAD, 20), square(TREE, 30)], 1: [square(CAR, 10)]}})
+    monkeypatch.setattr(g, "spawn_api", api)
+    Cache.project_info[project_id] = SimpleNamespace(id=project_id, name="project")
+    api.meta = META
+    Cache().get_project_meta(project_id)
+    Cache().cache_annotation_infos(project_id)
+    return project_id
+
+
+def test_meta_diff_matches_the_classes_by_ids():
+    new_meta = sly.ProjectMeta(
+        obj_classes=[
+            CAR.clone(name="vehicle"),
+            ROAD.clone(geometry_type=sly.Bitmap),
+            sly.ObjClass("person", sly.Rectangle, sly_id=4),
+        ]
+    )
+    assert diff_project_metas(META, new_meta) == ({"car": "vehicle"}, ["road", "tree"])
+    assert diff_project_metas(META, META) == ({}, [])
+    assert get_meta_version(META) == get_meta_version(sly.ProjectMeta.from_json(META.to_json()))
+    assert get_meta_version(META) != get_meta_version(new_meta)
+
+
+def test_changed_meta_updates_the_statistics_without_downloads(project_id):
+    api = g.spawn_api
+    api.batches.clear()
+    # The names of the classes are swapped and one class is removed.
+    api.meta = sly.ProjectMeta(obj_classes=[CAR.clone(name="road"), ROAD.clone(name="car")])
+    Cache().get_project_meta(project_id, force=True)
+
+    assert api.batches == []
+    project = Cache().get_project_stats(project_id)
+    assert (project.area_stats["road"].count, project.area_stats["road"].total) == (2, 200)
+    assert (project.area_stats["car"].count, project.area_stats["car"].total) == (1, 400)
+    assert "tree" not in project.area_stats
+    assert project.label_counts.total("road") == 2
+    assert project.label_counts.images_with_class("car") == 1
+    assert project.label_counts.total("tree") == 0
+    assert sorted(project.store.image_rows(0)["class_idx"].tolist()) == sorted(
+        project.store.class_idx(name) for name in ("road", "car")
+    )
+
+
+def test_stale_meta_is_refetched_once_for_all_annotations(project_id):
+    api = g.spawn_api
+    person = sly.ObjClass("person", sly.Rectangle, sly_id=4)
+    api.meta = META.add_obj_class(person)
+    requests = api.meta_requests
+    stale_meta = Cache().get_project_meta(project_id)
+    project_info = Cache().get_project_info(project_id)
+
+    annotations = []
+    threads = [
+        threading.Thread(
+            target=lambda image_id: annotations.append(
+                Cache().get_annotation(
+                    annotation_info(image_id, [square(person, 10)]), stale_meta, project_info
+                )
+            ),
+            args=(image_id,),
+        )
+        for image_id in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(annotations) == 4
+    assert api.meta_requests == requests + 1
+    assert Cache().get_project_meta(project_id).get_obj_class("person") is not None
+
+    # The annotation, which can not be parsed with the actual meta, is not retried forever.
+    with pytest.raises(Exception):
+        Cache().get_annotation(
+            annotation_info(5, [square(sly.ObjClass("unknown", sly.Rectangle), 10)]),
+            Cache().get_project_meta(project_id),
+            project_info,
+        )
+    assert api.meta_requests == requests + 2
+
+
+def test_compiled_meta_interns_the_classes(project_id):
+    compiled_meta = Cache().get_compiled_meta(project_id)
+    assert compiled_meta.class_names == ("car", "road", "tree")
+    assert compiled_meta.class_id("road") == 1
+    assert compiled_meta.class_id("unknown") == -1
+    assert compiled_meta.required_class_ids == {0, 1, 2}
+    assert compiled_meta.geometry_types == ("rectangle",) * 3
+    labels = [square(TREE, 10), square(sly.ObjClass("unknown", sly.Rectangle), 10), square(CAR, 10)]
+    assert compiled_meta.label_class_ids(labels).tolist() == [2, -1, 0]
+    assert compiled_meta.class_names_of([2, 0]) == ["tree", "car"]
+
+    # The lookup tables are built once per version of the meta.
+    assert Cache().get_compiled_meta(project_id) is compiled_meta
+    g.spawn_api.meta = META.delete_obj_class("tree")
+    Cache().get_project_meta(project_id, force=True)
+    assert Cache().get_compiled_meta(project_id).class_names == ("car", "road")
+
+
+def test_stats_snapshot_is_keyed_by_class_ids(project_id):
+    compiled_meta = Cache().get_compiled_meta(project_id)
+    car, road = compiled_meta.class_id("car"), compiled_meta.class_id("road")
+    stats = Cache().get_stats_snapshot(project_id, compiled_meta, [car, road])
+    assert (stats.get_area_stats(car).count, stats.get_area_stats(car).mean) == (2, 100.0)
+    assert stats.average_label_count(car) == 1.0
+    assert stats.images_with_class(road) == 1
+    assert stats.get_area_stats(compiled_meta.class_id("tree")).count == 0
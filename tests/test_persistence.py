@@ -0,0 +1,77 @@
+import supervisely as sly
+
+from helpers import label, project_state
+from src.persistence import CacheSnapshot, dump_project_data, load_project_data
+from src.stats import ProjectStats
+
+
+def make_project():
+    project = ProjectStats()
+    project.set_image(1, [label("car", 10.0, 1), label("car", 30.0, 2)], "t1", 100, 7)
+    project.set_image(2, [label("road", 500.0, 3)], "t2", 100)
+    project.set_image(3, [], "t3", 200)
+    return project
+
+
+def make_meta():
+    return sly.ProjectMeta(
+        obj_classes=[sly.ObjClass("car", sly.Rectangle), sly.ObjClass("road", sly.Rectangle)]
+    )
+
+
+def test_project_data_round_trip():
+    project = make_project()
+    restored = load_project_data(dump_project_data(project))
+    assert project_state(restored) == project_state(project)
+    assert restored.store.image_rows(1)["label_id"].tolist() == [1, 2]
+
+
+def test_snapshot_replays_the_journal(tmp_path):
+    snapshot = CacheSnapshot(str(tmp_path / "cache.db"), max_journal_entries=10)
+    project = make_project()
+    snapshot.save_project(5, make_meta(), project)
+
+    # The updates after the snapshot are only in the journal.
+    updates = [
+        (2, [label("road", 700.0, 3), label("car", 20.0, 4)], "t4", 100, 8),
+        (3, [label("car", 5.0, 5)], "t5", None, None),
+        (4, [label("road", 1.0, 6)], "t6", 300, None),
+    ]
+    for image_id, features, updated_at, dataset_id, job_id in updates:
+        assert not snapshot.append(5, image_id, features, updated_at, dataset_id, job_id)
+        project.set_image(image_id, features, updated_at, dataset_id, job_id)
+
+    # A new instance, as after the restart of the app.
+    restored_meta, restored = CacheSnapshot(str(tmp_path / "cache.db")).load_project(5)
+    assert restored_meta == make_meta()
+    assert project_state(restored) == project_state(project)
+    assert restored.store.image_rows(1)["label_id"].tolist() == [1, 2]
+    assert restored.image_scopes[2] == (100, 8)
+    assert restored.image_scopes[3] == (200, None)
+
+
+def test_snapshot_reports_the_full_journal_and_truncates_it(tmp_path):
+    snapshot = CacheSnapshot(str(tmp_path / "cache.db"), max_journal_entries=2)
+    project = make_project()
+    snapshot.save_project(5, make_meta(), project)
+
+    assert not snapshot.append(5, 1, [label("car", 1.0)], "a", None, None)
+    assert snapshot.append(5, 1, [label("car", 2.0)], "b", None, None)
+    project.set_image(1, [label("car", 2.0)], "b")
+    snapshot.save_project(5, make_meta(), project)
+    assert not snapshot.append(5, 2, [], "c", None, None)
+
+    _, restored = snapshot.load_project(5)
+    assert restored.updated_at[1] == "b"
+    assert restored.updated_at[2] == "c"
+    assert restored.area_stats["car"].count == 1
+
+
+def test_snapshot_projects(tmp_path):
+    snapshot = CacheSnapshot(str(tmp_path / "cache.db"))
+    assert snapshot.load_project(5) is None
+    snapshot.save_project(5, make_meta(), make_project())
+    snapshot.save_project(6, make_meta(), make_project())
+    assert sorted(snapshot.project_ids()) == [5, 6]
+    snapshot.drop_project(5)
+    assert snapshot.project_ids() == [6]
@@ -0,0 +1,135 @@
+import pytest
+import supervisely as sly
+
+from helpers import label, project_state
+from src.shared import (
+    SharedStats,
+    drop_class_record,
+    remove_image_record,
+    rename_class_record,
+    set_image_record,
+)
+from src.stats import ProjectStats
+
+META = sly.ProjectMeta(obj_classes=[sly.ObjClass("car", sly.Rectangle)])
+
+
+def build():
+    project = ProjectStats()
+    project.set_image(1, [label("car", 10.0, 1), label("car", 30.0, 2)], "t1", 100, 7)
+    project.set_image(2, [label("road", 500.0, 3)], "t2", 100)
+    project.set_image(3, [label("sign", 4.0, 4)], "t3", 200)
+    return META, project
+
+
+def not_built():
+    raise AssertionError("The published project must be loaded, not built.")
+
+
+def decayed_state(project):
+    return project.tick, {
+        name: (stats.tick, stats.area_weight, stats.area_total, stats.count_weight)
+        for name, stats in project.decayed.items()
+    }
+
+
+def test_changes_of_one_worker_are_replayed_by_another(tmp_path):
+    first = SharedStats(str(tmp_path), max_log_bytes=1024**2, half_life=100)
+    second = SharedStats(str(tmp_path), max_log_bytes=1024**2, half_life=100)
+    meta, project = first.load_or_build(5, build)
+    loaded_meta, replica = second.load_or_build(5, not_built)
+    assert loaded_meta == meta
+    assert project_state(replica) == project_state(project)
+
+    records = [
+        set_image_record(2, [label("road", 700.0, 3), label("car", 20.0, 5)], "t4", 100, 8),
+        set_image_record(4, [label("car", 5.0, 6)], "t5", 300),
+        remove_image_record(1),
+        rename_class_record("road", "lane"),
+        drop_class_record("sign"),
+    ]
+    with project.lock.write():
+        assert first.append(5, project, records, META)
+    assert first.is_current(5)
+    assert not second.is_current(5)
+
+    with replica.lock.write():
+        assert second.refresh(5, replica)
+    assert second.is_current(5)
+    assert project_state(replica) == project_state(project)
+    assert replica.image_scopes[2] == (100, 8)
+    assert set(name for name, stats in replica.area_stats.items() if stats.count) == {"car", "lane"}
+    assert second.metrics()["received"] == len(records)
+
+    # The changes of the second worker are visible to the first one.
+    with replica.lock.write():
+        assert second.append(5, replica, [remove_image_record(4)], META)
+    with project.lock.write():
+        assert first.refresh(5, project)
+    assert project_state(project) == project_state(replica)
+
+
+def test_log_is_merged_into_the_base_when_it_exceeds_the_limit(tmp_path):
+    first = SharedStats(str(tmp_path), max_log_bytes=512, half_life=100)
+    second = SharedStats(str(tmp_path), max_log_bytes=512, half_life=100)
+    _, project = first.load_or_build(5, build)
+    _, replica = second.load_or_build(5, not_built)
+
+    with project.lock.write():
+        for image_id in range(10, 20):
+            assert first.append(5, project, [set_image_record(image_id, [label("car", 8.0)], "t")], META)
+    assert first.metrics()["compactions"] >= 1
+    assert (tmp_path / "project_5.log").stat().st_size <= 512
+
+    # The replica of the previous epoch is outdated and its changes are rejected.
+    with replica.lock.write():
+        assert not second.refresh(5, replica)
+        assert not second.append(5, replica, [remove_image_record(10)], META)
+    assert 10 not in replica.updated_at
+
+    # The replica loaded from the merged base is the same, including the recent statistics.
+    _, reloaded = SharedStats(str(tmp_path), 512, 100).load_or_build(5, not_built)
+    assert project_state(reloaded) == project_state(project)
+    assert 10 in reloaded.updated_at
+    tick, decayed = decayed_state(project)
+    reloaded_tick, reloaded_decayed = decayed_state(reloaded)
+    assert reloaded_tick == tick
+    assert reloaded_decayed.keys() == decayed.keys()
+    for name, values in decayed.items():
+        assert reloaded_decayed[name] == pytest.approx(values)
+
+
+def test_merged_base_has_the_current_meta(tmp_path):
+    shared = SharedStats(str(tmp_path), max_log_bytes=256, half_life=100)
+    _, project = shared.load_or_build(5, build)
+    renamed_meta = sly.ProjectMeta(obj_classes=[sly.ObjClass("vehicle", sly.Rectangle)])
+
+    with project.lock.write():
+        assert shared.append(5, project, [rename_class_record("car", "vehicle")], renamed_meta)
+        for image_id in range(10, 20):
+            assert shared.append(5, project, [set_image_record(image_id, [], "t")], renamed_meta)
+    assert shared.metrics()["compactions"] >= 1
+
+    meta, reloaded = SharedStats(str(tmp_path), 256, 100).load_or_build(5, not_built)
+    assert meta == renamed_meta
+    assert reloaded.area_stats["vehicle"].count == 2
+
+
+def test_forced_build_starts_a_new_epoch(tmp_path):
+    first = SharedStats(str(tmp_path), max_log_bytes=1024**2, half_life=100)
+    second = SharedStats(str(tmp_path), max_log_bytes=1024**2, half_life=100)
+    first.load_or_build(5, build)
+    _, replica = second.load_or_build(5, not_built)
+
+    def rebuild():
+        meta, project = build()
+        project.remove_image(3)
+        return meta, project
+
+    _, project = first.load_or_build(5, rebuild, force=True)
+    assert first.metrics()["built"] == 2
+    with replica.lock.write():
+        assert not second.refresh(5, replica)
+    _, reloaded = second.load_or_build(5, not_built)
+    assert project_state(reloaded) == project_state(project)
+    assert 3 not in reloaded.updated_at
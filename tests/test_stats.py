@@ -0,0 +1,245 @@
+import random
+import statistics
+
+import numpy as np
+import pytest
+import supervisely as sly
+
+from helpers import label
+from src.features import LabelFeatures
+from src.meta import CompiledMeta
+from src.stats import (
+    DATASET_SCOPE,
+    JOB_SCOPE,
+    PROJECT_SCOPE,
+    SKETCH_RELATIVE_ACCURACY,
+    ClassAreaStats,
+    LabelCountIndex,
+    ProjectStats,
+    QuantileSketch,
+)
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def assert_close(actual, expected):
+    for a, e in zip(actual, expected):
+        assert a == pytest.approx(e, rel=2 * SKETCH_RELATIVE_ACCURACY)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [random.Random(0).lognormvariate(7, 2) for _ in range(20000)],
+        [random.Random(1).uniform(1, 1000) for _ in range(5000)],
+        [float(random.Random(2).randint(1, 20)) for _ in range(3000)],
+    ],
+)
+def test_quantiles_are_within_the_relative_accuracy(values):
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    assert sketch.count == len(values)
+    expected = np.quantile(values, QUANTILES, method="inverted_cdf")
+    assert_close(sketch.quantiles(QUANTILES), expected)
+    assert sketch.quantile(0.5) == sketch.quantiles(QUANTILES)[2]
+
+
+def test_removed_values_do_not_affect_the_quantiles():
+    rng = random.Random(3)
+    kept = [rng.uniform(10, 100) for _ in range(2000)]
+    removed = [rng.uniform(5000, 9000) for _ in range(2000)]
+    sketch = QuantileSketch()
+    for value in kept + removed:
+        sketch.add(value)
+    for value in removed:
+        sketch.remove(value)
+    assert sketch.count == len(kept)
+    assert_close(sketch.quantiles(QUANTILES), np.quantile(kept, QUANTILES, method="inverted_cdf"))
+
+
+def test_merge_and_copy():
+    rng = random.Random(4)
+    first, second = QuantileSketch(), QuantileSketch()
+    values = [rng.uniform(1, 1e6) for _ in range(4000)]
+    for value in values[:1000]:
+        first.add(value)
+    for value in values[1000:]:
+        second.add(value)
+    merged = first.copy()
+    merged.merge(second)
+    assert first.count == 1000
+    assert merged.count == len(values)
+    assert_close(merged.quantiles(QUANTILES), np.quantile(values, QUANTILES, method="inverted_cdf"))
+
+
+def test_zeros_and_empty_sketch():
+    sketch = QuantileSketch()
+    assert sketch.quantiles((0.25, 0.5)) == (0.0, 0.0)
+    for value in (0.0, 0.0, 0.0, 10.0):
+        sketch.add(value)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(10.0, rel=2 * SKETCH_RELATIVE_ACCURACY)
+    # Removing the value, which was never added, is ignored.
+    sketch.remove(0.0)
+    sketch.remove(0.0)
+    sketch.remove(0.0)
+    sketch.remove(0.0)
+    assert sketch.count == 1
+
+
+def test_area_aggregates_match_the_recomputed_statistics():
+    rng = random.Random(0)
+    areas = [rng.uniform(1.0, 1000.0) for _ in range(200)]
+    stats = ClassAreaStats()
+    for area in areas:
+        stats.add(area)
+    # The removed labels are subtracted, as when the image is updated.
+    for area in areas[:50]:
+        stats.remove(area)
+
+    assert stats.count == 150
+    assert stats.mean == pytest.approx(statistics.fmean(areas[50:]))
+    assert stats.std == pytest.approx(statistics.pstdev(areas[50:]))
+
+
+def test_removing_the_last_label_resets_the_aggregates():
+    stats = ClassAreaStats()
+    stats.add(0.1)
+    stats.add(0.2)
+    stats.remove(0.1)
+    stats.remove(0.2)
+    assert (stats.count, stats.total, stats.total_sq) == (0, 0.0, 0.0)
+    assert stats.mean == 0.0
+    assert stats.std == 0.0
+
+
+def test_label_count_index_replaces_and_removes_images():
+    index = LabelCountIndex()
+    index.set_image(1, {"car": 3, "road": 1})
+    index.set_image(2, {"car": 1})
+    # More classes than the initial size of the arrays.
+    index.set_image(3, {f"class_{idx}": idx + 1 for idx in range(20)})
+    assert (index.total("car"), index.images_with_class("car")) == (4, 2)
+    assert (index.total("class_19"), index.images_with_class("class_19")) == (20, 1)
+
+    # The previous version of the image is replaced.
+    index.set_image(1, {"road": 2})
+    assert (index.total("car"), index.images_with_class("car")) == (1, 1)
+    assert (index.total("road"), index.images_with_class("road")) == (2, 1)
+
+    index.remove_image(2)
+    index.remove_image(100)
+    index.set_image(3, {})
+    assert (index.total("car"), index.images_with_class("car")) == (0, 0)
+    assert (index.total("class_19"), index.images_with_class("class_19")) == (0, 0)
+    assert (index.total("unknown"), index.images_with_class("unknown")) == (0, 0)
+
+
+def test_decayed_statistics_halve_the_weight_every_half_life():
+    project = ProjectStats()
+    project.half_life = 2.0
+    project.set_image(1, [label("car", 100.0)] * 3, "0001")
+    project.set_image(2, [label("road", 1.0)], "0002")
+    project.set_image(3, [label("road", 1.0)], "0003")
+    project.set_image(4, [label("car", 400.0)], "0004")
+
+    car = project.decayed["car"]
+    car.decay_to(project.tick, project.half_life)
+    # The first image is 3 images older than the last one.
+    weight = 0.5 ** 1.5
+    assert car.area_weight == pytest.approx(3 * weight + 1)
+    assert car.area_mean == pytest.approx((300 * weight + 400) / (3 * weight + 1))
+    assert car.count_mean == pytest.approx((3 * weight + 1) / (weight + 1))
+
+
+def test_reset_decayed_matches_the_incremental_updates():
+    rng = random.Random(5)
+    incremental = ProjectStats()
+    incremental.half_life = 7.0
+    images = []
+    for image_id in range(60):
+        features = [label(rng.choice(["car", "road", "tree"]), rng.uniform(1, 100)) for _ in range(rng.randint(0, 4))]
+        images.append((image_id, features, f"{image_id:04d}"))
+        incremental.set_image(image_id, features, f"{image_id:04d}")
+
+    # The warm-up adds the images in an arbitrary order.
+    rebuilt = ProjectStats()
+    for image_id, features, updated_at in rng.sample(images, len(images)):
+        rebuilt.set_image(image_id, features, updated_at)
+    rebuilt.reset_decayed(7.0)
+
+    assert rebuilt.tick == incremental.tick
+    assert set(rebuilt.decayed) == set(incremental.decayed)
+    for class_name, expected in incremental.decayed.items():
+        expected = expected.copy()
+        expected.decay_to(incremental.tick, 7.0)
+        actual = rebuilt.decayed[class_name]
+        assert actual.area_weight == pytest.approx(expected.area_weight)
+        assert actual.area_total == pytest.approx(expected.area_total)
+        assert actual.count_weight == pytest.approx(expected.count_weight)
+        assert actual.count_total == pytest.approx(expected.count_total)
+
+
+def make_scoped_project():
+    """Dataset 1 has many small cars (the last 10 images are in the job 7),
+    dataset 2 has a few huge ones."""
+    project = ProjectStats()
+    for image_id in range(100):
+        features = [LabelFeatures("car", 10.0, 0, 0, 1, 1, "rectangle", image_id)] * 2
+        job_id = 7 if image_id >= 90 else None
+        project.set_image(image_id, features, f"{image_id:04d}", 1, job_id)
+    for image_id in range(100, 140):
+        features = [LabelFeatures("car", 1000.0, 0, 0, 1, 1, "rectangle", image_id)]
+        project.set_image(image_id, features, f"{image_id:04d}", 2)
+    compiled_meta = CompiledMeta(
+        sly.ProjectMeta(obj_classes=[sly.ObjClass("car", sly.Rectangle)]), "v1"
+    )
+    return project, compiled_meta
+
+
+def test_sketches_and_decayed_statistics_follow_the_scope():
+    project, compiled_meta = make_scoped_project()
+    class_id = compiled_meta.class_names.index("car")
+
+    snapshot = project.snapshot(compiled_meta, [class_id], [(DATASET_SCOPE, 2)], 30)
+    assert snapshot.get_scopes(class_id) == (DATASET_SCOPE, DATASET_SCOPE)
+    assert snapshot.area_quantiles(class_id, (0.5,))[0] == pytest.approx(1000.0, rel=0.02)
+    assert snapshot.label_count_quantiles(class_id, (0.5,))[0] == pytest.approx(1.0, rel=0.02)
+    assert snapshot.get_decayed_stats(class_id).area_mean == pytest.approx(1000.0)
+    assert snapshot.get_decayed_stats(class_id).count_mean == pytest.approx(1.0)
+
+    # The job has too few samples, the project statistics are used.
+    snapshot = project.snapshot(compiled_meta, [class_id], [(JOB_SCOPE, 7)], 30)
+    assert snapshot.get_scopes(class_id) == (PROJECT_SCOPE, PROJECT_SCOPE)
+    assert snapshot.area_quantiles(class_id, (0.9,))[0] == pytest.approx(1000.0, rel=0.02)
+    assert 10.0 < snapshot.get_decayed_stats(class_id).area_mean < 1000.0
+
+    # With a lower threshold the job is used for the areas and the counts.
+    snapshot = project.snapshot(compiled_meta, [class_id], [(JOB_SCOPE, 7)], 10)
+    assert snapshot.get_scopes(class_id) == (JOB_SCOPE, JOB_SCOPE)
+    assert snapshot.area_quantiles(class_id, (0.9,))[0] == pytest.approx(10.0, rel=0.02)
+    assert snapshot.get_decayed_stats(class_id).area_mean == pytest.approx(10.0)
+    assert snapshot.get_decayed_stats(class_id).count_mean == pytest.approx(2.0)
+
+
+def test_reset_decayed_rebuilds_the_scoped_statistics():
+    project, _ = make_scoped_project()
+    # The images of the dataset 2 replaced the oldest images of the dataset 1.
+    project.set_image(0, [LabelFeatures("car", 50.0, 0, 0, 1, 1, "rectangle", 0)], "9999")
+
+    def decayed_state():
+        return {
+            scope: (stats.tick, stats.decayed["car"].area_weight, stats.decayed["car"].area_total)
+            for scope, stats in project.scopes.items()
+        }
+
+    # The incremental statistics count the replaced image twice, the rebuilt ones once.
+    incremental = decayed_state()
+    project.reset_decayed(project.half_life)
+    rebuilt = decayed_state()
+    assert rebuilt.keys() == incremental.keys()
+    assert rebuilt[(DATASET_SCOPE, 2)] == pytest.approx(incremental[(DATASET_SCOPE, 2)])
+    assert rebuilt[(JOB_SCOPE, 7)] == pytest.approx(incremental[(JOB_SCOPE, 7)])
+    assert rebuilt[(DATASET_SCOPE, 1)][0] == 100
+    assert incremental[(DATASET_SCOPE, 1)][0] == 101
@@ -0,0 +1,47 @@
+import numpy as np
+
+from helpers import label
+from src.store import MIN_CAPACITY, LabelStore
+
+
+def test_updated_image_replaces_its_rows():
+    store = LabelStore()
+    store.set_image(1, [label("car", 10.0, 1), label("road", 20.0, 2)])
+    store.set_image(2, [label("car", 30.0, 3)])
+    store.set_image(1, [label("sign", 5.0, 4)])
+
+    assert store.num_labels == 2
+    assert store.num_rows == 4
+    assert sorted(store.column("area").tolist()) == [5.0, 30.0]
+    rows = store.image_rows(1)
+    assert rows["label_id"].tolist() == [4]
+    assert store.class_names[rows["class_idx"][0]] == "sign"
+    assert store.class_idx("road") == 1
+    assert store.class_idx("unknown") == -1
+
+    store.remove_image(2)
+    store.remove_image(100)
+    assert store.column("label_id").tolist() == [4]
+    assert store.image_rows(2)["label_id"].tolist() == []
+
+
+def test_store_grows_and_compacts_the_dead_rows():
+    store = LabelStore()
+    num_images = MIN_CAPACITY // 4
+    for version in range(3):
+        for image_id in range(num_images):
+            features = [label("car", float(version * 10 + idx), image_id * 10 + idx) for idx in range(4)]
+            store.set_image(image_id, features)
+
+    # The live rows are compacted instead of growing the arrays with the dead ones.
+    assert store.num_labels == 4 * num_images
+    assert store.num_rows < 3 * 4 * num_images
+    for image_id in (0, num_images // 2, num_images - 1):
+        rows = store.image_rows(image_id)
+        assert rows["image_id"].tolist() == [image_id] * 4
+        assert rows["area"].tolist() == [20.0, 21.0, 22.0, 23.0]
+
+    store.compact()
+    assert store.num_rows == store.num_labels
+    assert np.all(np.diff(store.column("image_id")) >= 0)
+    assert store.image_rows(3)["label_id"].tolist() == [30, 31, 32, 33]
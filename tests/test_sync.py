@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+from src.sync import ReadWriteLock, SingleFlight
+
+
+def test_read_write_lock_allows_concurrent_readers():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            # All the readers must be inside at once, otherwise the barrier breaks.
+            inside.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not inside.broken
+
+
+def test_read_write_lock_writer_is_exclusive():
+    lock = ReadWriteLock()
+    counter = {"value": 0, "readers_saw_partial": False}
+
+    def write():
+        for _ in range(200):
+            with lock.write():
+                counter["value"] += 1
+                time.sleep(0)
+                counter["value"] += 1
+
+    def read():
+        for _ in range(200):
+            with lock.read():
+                if counter["value"] % 2:
+                    counter["readers_saw_partial"] = True
+
+    threads = [threading.Thread(target=write) for _ in range(3)]
+    threads += [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert counter["value"] == 3 * 200 * 2
+    assert not counter["readers_saw_partial"]
+
+
+def test_read_write_lock_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    reader_inside = threading.Event()
+    release_reader = threading.Event()
+
+    def first_reader():
+        with lock.read():
+            reader_inside.set()
+            release_reader.wait(5)
+            events.append("first reader done")
+
+    def writer():
+        with lock.write():
+            events.append("writer")
+
+    def second_reader():
+        with lock.read():
+            events.append("second reader")
+
+    threads = [threading.Thread(target=first_reader)]
+    threads[0].start()
+    reader_inside.wait(5)
+    threads.append(threading.Thread(target=writer))
+    threads[1].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=second_reader))
+    threads[2].start()
+    time.sleep(0.05)
+    assert events == []
+    release_reader.set()
+    for thread in threads:
+        thread.join(5)
+    assert events == ["first reader done", "writer", "second reader"]
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def load(value):
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return value * 2
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", load, 21)))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("key", load, 0)))
+        for _ in range(5)
+    ]
+    for follower in followers:
+        follower.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == [21]
+    assert results == [42] * 6
+
+
+def test_single_flight_shares_the_error_and_forgets_the_call():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("failed")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    # The failed call is not cached, the next call runs the function again.
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_single_flight_does_not_merge_different_keys():
+    flight = SingleFlight()
+    assert flight.do(1, lambda: "a") == "a"
+    assert flight.do(2, lambda: "b") == "b"
+    with pytest.raises(KeyError):
+        flight.do(3, lambda: {}["missing"])